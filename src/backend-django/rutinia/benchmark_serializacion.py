@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Benchmark de serialización de listados: DocumentSerializer + JSONRenderer
+(antes) contra extractores precompilados + ORJSONRenderer (después).
+
+Verifica también que ambos caminos generen exactamente los mismos bytes.
+No necesita MongoDB: los documentos se construyen en memoria.
+
+Uso: python benchmark_serializacion.py [cantidad]   (por defecto 10000)
+"""
+import os
+import sys
+import time
+import django
+from datetime import date, datetime, timedelta
+
+# Setup Django
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rutinia.settings')
+django.setup()
+
+from bson import ObjectId
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Usuario, Habito, RegistroHabito, HistorialNotificacion, Notificacion
+from core.renderers import ORJSONRenderer
+from core.serializers import (
+    RegistroHabitoSerializer, HabitoSerializer, HistorialNotificacionSerializer,
+    EXTRACTORES_RAPIDOS, ListaRapida
+)
+
+cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+usuario = Usuario(id=ObjectId(), nombre='Ana', correo='ana@example.com')
+habitos = [
+    Habito(
+        id=ObjectId(), usuario=usuario, nombre=f'Hábito {i} “leer”', descripcion='Descripción ñ',
+        dificultad='media', fecha_inicio=date(2025, 1, 1), tipo_frecuencia='Semanal',
+        dias=['Lunes', 'mie', 15], icono='fitness_center', color='blue',
+        notificaciones=[Notificacion(hora='09:00', activa=True)]
+    )
+    for i in range(30)
+]
+inicio = date(2020, 1, 1)
+registros = [
+    RegistroHabito(
+        id=ObjectId(), habito=habitos[i % len(habitos)],
+        fecha=inicio + timedelta(days=i // len(habitos)), estado=i % 3 != 0
+    )
+    for i in range(cantidad)
+]
+notificaciones = [
+    HistorialNotificacion(
+        id=ObjectId(), usuario=usuario, habito=habitos[i % len(habitos)],
+        titulo='Recordatorio de hábito', mensaje='Es hora de: leer',
+        fecha_hora=datetime(2025, 10, 1, 9, 0, 0, 123456) + timedelta(minutes=i),
+        leida=i % 2 == 0, fecha_lectura=None
+    )
+    for i in range(cantidad)
+]
+
+
+def medir(nombre, funcion, repeticiones=3):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio_t = time.perf_counter()
+        resultado = funcion()
+        duracion = time.perf_counter() - inicio_t
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    print(f"  {nombre:<10} {mejor * 1000:8.1f} ms  ({cantidad / mejor:,.0f} docs/s)")
+    return resultado, mejor
+
+
+casos = [
+    ('registros', RegistroHabito, RegistroHabitoSerializer, registros),
+    ('habitos', Habito, HabitoSerializer, habitos * (cantidad // len(habitos))),
+    ('notificaciones', HistorialNotificacion, HistorialNotificacionSerializer, notificaciones),
+]
+
+print(f"\n{'='*60}")
+print(f"Serialización de {cantidad} documentos por listado")
+print(f"{'='*60}")
+
+for nombre, modelo, serializer_class, documentos in casos:
+    print(f"\n{nombre}:")
+    antes, t_antes = medir('antes', lambda: JSONRenderer().render(
+        serializer_class(documentos, many=True).data
+    ))
+    despues, t_despues = medir('después', lambda: ORJSONRenderer().render(
+        ListaRapida(documentos, EXTRACTORES_RAPIDOS[modelo]).data
+    ))
+    iguales = '✅ bytes idénticos' if antes == despues else '❌ LA SALIDA DIFIERE'
+    print(f"  {iguales} | {t_antes / t_despues:.1f}x más rápido | {len(despues) / 1024:,.0f} KB")
+    if antes != despues:
+        sys.exit(1)
+
+print()
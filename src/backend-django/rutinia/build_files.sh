@@ -9,3 +9,15 @@ python manage.py collectstatic --noinput
 # Crear migraciones si es necesario
 python manage.py makemigrations --noinput
 python manage.py migrate --noinput
+
+# Completar la programación normalizada de los hábitos existentes
+python manage.py backfill_programacion
+
+# Correos en minúsculas y nombres normalizados de los usuarios existentes
+python manage.py normalizar_usuarios
+
+# Nombres normalizados de las categorías (y unificación de duplicadas)
+python manage.py normalizar_categorias
+
+# Crear índices de MongoDB declarados en core/models.py
+python manage.py ensure_indexes
@@ -4,6 +4,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.hashers import make_password, check_password
+from core.busqueda import normalizar_correo
 from core.models import Usuario
 import mongoengine
 
@@ -27,7 +28,7 @@ def register(request):
                 )
         
         # Verificar si el correo ya existe
-        if Usuario.objects(correo=data['correo']).first():
+        if Usuario.objects(correo=normalizar_correo(data['correo'])).first():
             return Response(
                 {'error': 'El correo ya está registrado'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -65,6 +66,12 @@ def register(request):
             }
         }, status=status.HTTP_201_CREATED)
         
+    except mongoengine.NotUniqueError:
+        # Otro registro con el mismo correo ganó la carrera (índice único)
+        return Response(
+            {'error': 'El correo ya está registrado'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     except Exception as e:
         return Response(
             {'error': str(e)},
@@ -89,7 +96,7 @@ def login(request):
             )
         
         # Buscar usuario
-        usuario = Usuario.objects(correo=data['correo']).first()
+        usuario = Usuario.objects(correo=normalizar_correo(data['correo'])).first()
         
         if not usuario:
             return Response(
@@ -167,26 +174,13 @@ def get_user_info(request):
     Obtener información del usuario autenticado
     """
     try:
-        # El token JWT contiene el user_id
-        user_id = request.user_id if hasattr(request, 'user_id') else None
-        
-        if not user_id:
-            # Intentar extraer del token manualmente
-            auth_header = request.META.get('HTTP_AUTHORIZATION', '')
-            if auth_header.startswith('Bearer '):
-                token = auth_header.split(' ')[1]
-                from rest_framework_simplejwt.tokens import AccessToken
-                access_token = AccessToken(token)
-                user_id = access_token['user_id']
-        
-        if not user_id:
-            return Response(
-                {'error': 'No se pudo identificar al usuario'},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-        
-        usuario = Usuario.objects(id=user_id).first()
-        
+        # request.user ya viene resuelto (y cacheado) por MongoJWTAuthentication
+        usuario = request.user
+
+        if not getattr(usuario, 'completo', True):
+            # Armado solo con los claims del token: faltan apellido y tema
+            usuario = Usuario.objects(id=usuario.id).only('nombre', 'apellido', 'correo', 'tema').first()
+
         if not usuario:
             return Response(
                 {'error': 'Usuario no encontrado'},
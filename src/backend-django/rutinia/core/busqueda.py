@@ -0,0 +1,32 @@
+"""
+Normalización de texto para búsquedas indexadas.
+
+Los filtros `__icontains` se convierten en expresiones regulares sin ancla e
+insensibles a mayúsculas, que MongoDB no puede resolver con un índice. En su
+lugar cada documento guarda una copia normalizada (minúsculas, sin acentos
+ni espacios extremos) de los campos por los que se filtra; el valor buscado
+se normaliza igual y se compara por igualdad o por prefijo anclado, que sí
+usan el índice del campo.
+"""
+import re
+import unicodedata
+
+
+def normalizar(texto):
+    """'  Difícil ' -> 'dificil' (None se mantiene)"""
+    if texto is None:
+        return None
+    descompuesto = unicodedata.normalize('NFKD', str(texto).strip().lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def normalizar_correo(correo):
+    """Los correos se guardan y se buscan en minúsculas: 'Ana@Mail.com ' -> 'ana@mail.com'"""
+    if correo is None:
+        return None
+    return str(correo).strip().lower()
+
+
+def filtro_prefijo(valor, normalizacion=normalizar):
+    """Condición de MongoDB: el campo normalizado empieza por `valor` normalizado"""
+    return {'$regex': '^' + re.escape(normalizacion(valor))}
@@ -0,0 +1,76 @@
+"""
+Cache de las respuestas de progreso (semanal, mensual y por rango).
+
+Usa el cache framework de Django (settings.CACHES; LocMemCache por defecto,
+o cualquier backend compartido). Cada entrada es por (hábito, periodo,
+fecha ancla) e incluye la "generación": la versión de los datos del dueño
+en VersionDatos (core/versiones.py), que el chequeo del ETag ya leyó de
+MongoDB en la misma petición. Toda escritura de sus hábitos o registros
+incrementa esa versión, así las entradas anteriores dejan de leerse en
+todos los workers aunque cada uno tenga su propio cache en memoria.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class CacheProgreso:
+    def __init__(self, alias=None, ttl=None):
+        self.alias = alias or getattr(settings, 'PROGRESO_CACHE_ALIAS', 'default')
+        self.ttl = ttl if ttl is not None else getattr(settings, 'PROGRESO_CACHE_TTL', 300)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def consultar(self, entradas, generacion):
+        """
+        `entradas` es una lista de (habito_id, periodo, ancla) y `generacion`
+        la de `generacion_datos(request)`. Devuelve una Consulta con las
+        encontradas en cache; los valores calculados para el resto se guardan
+        con `consulta.guardar` bajo la misma generación: si los datos cambian
+        mientras se calculaban, nadie vuelve a leerlos. Sin generación no se
+        usa el cache.
+        """
+        if not self.ttl or not entradas or generacion is None:
+            return Consulta(self, {}, {})
+        claves = {
+            entrada: f'progreso:{entrada[0]}:{generacion}:{entrada[1]}:{entrada[2]}'
+            for entrada in entradas
+        }
+        encontradas = self.cache.get_many(list(claves.values()))
+        with self._lock:
+            self.hits += len(encontradas)
+            self.misses += len(claves) - len(encontradas)
+        valores = {entrada: encontradas[clave] for entrada, clave in claves.items() if clave in encontradas}
+        return Consulta(self, claves, valores)
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0,
+                'backend': settings.CACHES[self.alias]['BACKEND'],
+            }
+
+
+class Consulta:
+    def __init__(self, cache_progreso, claves, encontradas):
+        self._cache_progreso = cache_progreso
+        self._claves = claves
+        self.encontradas = encontradas
+
+    def guardar(self, valores):
+        """`valores` es {(habito_id, periodo, ancla): valor}"""
+        valores = {self._claves[entrada]: valor for entrada, valor in valores.items() if entrada in self._claves}
+        if valores:
+            self._cache_progreso.cache.set_many(valores, timeout=self._cache_progreso.ttl)
+
+
+cache_progreso = CacheProgreso()
@@ -0,0 +1,360 @@
+"""
+Estadísticas por hábito: rachas, total de completados y tasa de 30 días.
+
+Se guardan en EstadisticaHabito y se actualizan cada vez que un registro
+cambia de estado (toggle, bulk_toggle y el CRUD de registros), así que
+leerlas es una sola consulta por lista de hábitos, sin recorrer el historial.
+Una actualización solo revisa los días vecinos a la fecha modificada; el
+recálculo completo (`recalcular_estadisticas`) queda para cuando cambia la
+frecuencia del hábito, cuando una racha máxima puede haber bajado y para el
+comando `rebuild_estadisticas`.
+
+Una racha cuenta días programados consecutivos (ver `aplica_en`)
+completados; los días no programados no la cortan ni la alargan.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .models import Habito, RegistroHabito, EstadisticaHabito
+from .programacion import MENSUAL, SEMANAL, programacion
+from .progreso import porcentaje
+from .registros import fecha_a_mongo
+
+# Días hacia atrás que se conservan en EstadisticaHabito.recientes
+VENTANA_RECIENTES = 60
+DIAS_TASA = 30
+# Límite de días para buscar el día programado siguiente o anterior
+MAX_SALTO = 366
+CAMPOS_HABITO = (
+    'id', 'tipo_frecuencia', 'dias', 'fecha_inicio', 'frecuencia', 'mascara_semana', 'mascara_mes',
+)
+
+
+def programado(habito, fecha):
+    """
+    Igual que aplica_en, pero un hábito sin días válidos configurados
+    cuenta como diario para no quedar sin rachas. Usa la programación
+    normalizada del hábito (ver core/programacion.py) en lugar de volver a
+    interpretar tipo_frecuencia y dias en cada día recorrido.
+    """
+    frecuencia, semana, mes = programacion(habito)
+    if frecuencia == SEMANAL and semana:
+        return bool(semana >> fecha.weekday() & 1)
+    if frecuencia == MENSUAL and mes:
+        return bool(mes >> fecha.day & 1)
+    return True
+
+
+def _paso(habito, fecha, sentido):
+    """Día programado siguiente (sentido=1) o anterior (sentido=-1) a `fecha`"""
+    for i in range(1, MAX_SALTO + 1):
+        dia = fecha + timedelta(days=i * sentido)
+        if programado(habito, dia):
+            return dia
+    return None
+
+
+def _fecha(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def _completadas(habito_id, desde, hasta):
+    """Fechas completadas del hábito entre `desde` y `hasta` (ambos incluidos)"""
+    cursor = RegistroHabito._get_collection().find(
+        {
+            'habito': habito_id,
+            'fecha': {'$gte': fecha_a_mongo(desde), '$lte': fecha_a_mongo(hasta)},
+            'estado': True,
+        },
+        projection={'_id': 0, 'fecha': 1}
+    )
+    return {_fecha(registro['fecha']) for registro in cursor}
+
+
+def _anterior_completada(habito, fecha, solo_programados):
+    """Última fecha completada antes de `fecha` (recorre el índice hacia atrás)"""
+    cursor = RegistroHabito._get_collection().find(
+        {'habito': habito.id, 'fecha': {'$lt': fecha_a_mongo(fecha)}, 'estado': True},
+        projection={'_id': 0, 'fecha': 1}
+    ).sort('fecha', -1)
+    for registro in cursor:
+        anterior = _fecha(registro['fecha'])
+        if not solo_programados or programado(habito, anterior):
+            return anterior
+    return None
+
+
+def _extension(habito, fecha, sentido):
+    """
+    Cuántos días programados consecutivos están completados a partir del
+    siguiente (sentido=1) o del anterior (sentido=-1) a `fecha`, sin contarla.
+
+    Devuelve (cantidad, último día del tramo). Las fechas se consultan por
+    ventanas que se duplican, así que el costo depende del largo del tramo
+    y no del historial.
+    """
+    cantidad, extremo = 0, fecha
+    completadas, cubierto, ventana = set(), fecha, 64
+    dia = _paso(habito, fecha, sentido)
+    while dia is not None:
+        if (dia - cubierto).days * sentido > 0:
+            limite = dia + timedelta(days=ventana * sentido)
+            completadas = _completadas(habito.id, min(dia, limite), max(dia, limite))
+            cubierto, ventana = limite, ventana * 2
+        if dia not in completadas:
+            break
+        cantidad += 1
+        extremo = dia
+        dia = _paso(habito, dia, sentido)
+    return cantidad, extremo
+
+
+def _calcular(habito, completadas, hoy):
+    """Estadística completa a partir de todas las fechas completadas del hábito"""
+    fechas = sorted(set(completadas))
+    datos = {
+        'total_completados': len(fechas),
+        'ultima_completada': fechas[-1] if fechas else None,
+        'racha_actual': 0,
+        'inicio_racha': None,
+        'fin_racha': None,
+        'racha_maxima': 0,
+        'recientes': [f for f in fechas if f >= hoy - timedelta(days=VENTANA_RECIENTES)],
+    }
+    for fecha in fechas:
+        if not programado(habito, fecha):
+            continue
+        if datos['fin_racha'] is not None and _paso(habito, datos['fin_racha'], 1) == fecha:
+            datos['racha_actual'] += 1
+        else:
+            datos['racha_actual'] = 1
+            datos['inicio_racha'] = fecha
+        datos['fin_racha'] = fecha
+        datos['racha_maxima'] = max(datos['racha_maxima'], datos['racha_actual'])
+    return datos
+
+
+def _desde_mongo(documento):
+    return {
+        'total_completados': documento.get('total_completados', 0),
+        'ultima_completada': _fecha(documento.get('ultima_completada')),
+        'racha_actual': documento.get('racha_actual', 0),
+        'inicio_racha': _fecha(documento.get('inicio_racha')),
+        'fin_racha': _fecha(documento.get('fin_racha')),
+        'racha_maxima': documento.get('racha_maxima', 0),
+        'recientes': [_fecha(f) for f in documento.get('recientes', [])],
+    }
+
+
+def _operacion(habito_id, datos, hoy, incremento=None):
+    """
+    UpdateOne (upsert) que guarda `datos`. Con `incremento` el total se
+    actualiza con $inc para no perder cambios concurrentes.
+    """
+    limite = hoy - timedelta(days=VENTANA_RECIENTES)
+    campos = {
+        clave: fecha_a_mongo(datos[clave]) if datos[clave] is not None else None
+        for clave in ('ultima_completada', 'inicio_racha', 'fin_racha')
+    }
+    campos.update({
+        'racha_actual': datos['racha_actual'],
+        'racha_maxima': datos['racha_maxima'],
+        'recientes': [fecha_a_mongo(f) for f in sorted(set(datos['recientes'])) if f >= limite],
+        'actualizado': datetime.now(),
+    })
+    cambios = {'$set': campos}
+    if incremento is None:
+        campos['total_completados'] = datos['total_completados']
+    elif incremento:
+        cambios['$inc'] = {'total_completados': incremento}
+    return UpdateOne({'habito': habito_id}, cambios, upsert=True)
+
+
+def _guardar(operaciones):
+    if not operaciones:
+        return
+    try:
+        EstadisticaHabito._get_collection().bulk_write(operaciones, ordered=False)
+    except BulkWriteError as e:
+        # Dos requests crearon la misma estadística a la vez (índice único
+        # por hábito): la que quedó escrita se calculó con los mismos registros.
+        # Cualquier otro error de escritura se propaga.
+        errores = e.details.get('writeErrors', [])
+        if not errores or any(error.get('code') != 11000 for error in errores):
+            raise
+
+
+def _marcar(habito, datos, fecha):
+    """Aplica un registro que pasó a completado. Devuelve True si hay que recalcular todo."""
+    datos['total_completados'] += 1
+    datos['recientes'].append(fecha)
+    if datos['ultima_completada'] is None or fecha > datos['ultima_completada']:
+        datos['ultima_completada'] = fecha
+    if not programado(habito, fecha):
+        return False
+
+    atras, inicio = _extension(habito, fecha, -1)
+    adelante, fin = _extension(habito, fecha, 1)
+    longitud = atras + 1 + adelante
+    datos['racha_maxima'] = max(datos['racha_maxima'], longitud)
+    if datos['fin_racha'] is None or fin >= datos['fin_racha']:
+        datos.update(racha_actual=longitud, inicio_racha=inicio, fin_racha=fin)
+    return False
+
+
+def _desmarcar(habito, datos, fecha):
+    """Aplica un registro que dejó de estar completado. Devuelve True si hay que recalcular todo."""
+    datos['total_completados'] = max(datos['total_completados'] - 1, 0)
+    datos['recientes'] = [f for f in datos['recientes'] if f != fecha]
+    if fecha == datos['ultima_completada']:
+        datos['ultima_completada'] = _anterior_completada(habito, fecha, solo_programados=False)
+    if not programado(habito, fecha):
+        return False
+
+    atras, _ = _extension(habito, fecha, -1)
+    adelante, fin = _extension(habito, fecha, 1)
+
+    inicio_racha, fin_racha = datos['inicio_racha'], datos['fin_racha']
+    if inicio_racha is not None and fin_racha is not None and inicio_racha <= fecha <= fin_racha:
+        if adelante:
+            # La racha más reciente sigue desde el día posterior
+            datos.update(racha_actual=adelante, inicio_racha=_paso(habito, fecha, 1), fin_racha=fin)
+        elif atras:
+            # Se quitó el último día de la racha
+            datos.update(racha_actual=atras, fin_racha=_paso(habito, fecha, -1))
+        else:
+            # Era una racha de un día: pasa a ser la racha anterior
+            anterior = _anterior_completada(habito, fecha, solo_programados=True)
+            if anterior is None:
+                datos.update(racha_actual=0, inicio_racha=None, fin_racha=None)
+            else:
+                cantidad, inicio = _extension(habito, anterior, -1)
+                datos.update(racha_actual=cantidad + 1, inicio_racha=inicio, fin_racha=anterior)
+
+    # Si el tramo cortado era la racha máxima, puede haber bajado
+    return atras + 1 + adelante >= datos['racha_maxima']
+
+
+def actualizar_estadisticas(cambios, hoy=None):
+    """
+    Actualiza las estadísticas después de escribir registros.
+
+    `cambios` es una lista de (habito_id, fecha, anterior, completado), donde
+    `anterior` es el estado previo del registro (None si no existía). Solo se
+    procesan los que cambian de estado. Los hábitos sin estadística todavía
+    (o con varios días desmarcados a la vez) se recalculan completos.
+    """
+    hoy = hoy or date.today()
+    por_habito = defaultdict(list)
+    for habito_id, fecha, anterior, completado in cambios:
+        if habito_id is not None and fecha is not None and bool(anterior) != bool(completado):
+            por_habito[ObjectId(habito_id)].append((fecha, bool(completado)))
+    if not por_habito:
+        return
+
+    ids = list(por_habito)
+    habitos = {habito.id: habito for habito in Habito.objects(id__in=ids).only(*CAMPOS_HABITO)}
+    existentes = {
+        documento['habito']: _desde_mongo(documento)
+        for documento in EstadisticaHabito._get_collection().find({'habito': {'$in': ids}})
+    }
+
+    operaciones = []
+    recalcular = []
+    for habito_id, fechas in por_habito.items():
+        habito = habitos.get(habito_id)
+        if habito is None:
+            continue
+        datos = existentes.get(habito_id)
+        if datos is None or sum(1 for _, completado in fechas if not completado) > 1:
+            recalcular.append(habito)
+            continue
+
+        total_anterior = datos['total_completados']
+        completo = False
+        for fecha, completado in fechas:
+            completo |= (_marcar if completado else _desmarcar)(habito, datos, fecha)
+
+        if completo:
+            recalcular.append(habito)
+        else:
+            incremento = datos['total_completados'] - total_anterior
+            operaciones.append(_operacion(habito_id, datos, hoy, incremento))
+
+    _guardar(operaciones)
+    if recalcular:
+        recalcular_estadisticas(recalcular, hoy)
+
+
+def recalcular_estadisticas(habitos, hoy=None):
+    """
+    Recalcula desde cero las estadísticas de `habitos` (documentos con al
+    menos CAMPOS_HABITO) con una sola consulta de sus registros completados.
+    """
+    hoy = hoy or date.today()
+    completadas = defaultdict(list)
+    cursor = RegistroHabito._get_collection().find(
+        {'habito': {'$in': [habito.id for habito in habitos]}, 'estado': True},
+        projection={'_id': 0, 'habito': 1, 'fecha': 1}
+    )
+    for registro in cursor:
+        if registro.get('fecha') is not None:
+            completadas[registro['habito']].append(_fecha(registro['fecha']))
+
+    _guardar([
+        _operacion(habito.id, _calcular(habito, completadas[habito.id], hoy), hoy)
+        for habito in habitos
+    ])
+    return len(habitos)
+
+
+def leer_estadisticas(habitos, hoy=None):
+    """
+    Estadísticas de `habitos` con una sola consulta a EstadisticaHabito.
+
+    Devuelve {habito_id: {...}}. La racha actual se da por perdida si pasó
+    un día programado (anterior a hoy) sin completar.
+    """
+    hoy = hoy or date.today()
+    guardadas = {
+        documento['habito']: _desde_mongo(documento)
+        for documento in EstadisticaHabito._get_collection().find(
+            {'habito': {'$in': [habito.id for habito in habitos]}}
+        )
+    }
+
+    inicio_tasa = hoy - timedelta(days=DIAS_TASA - 1)
+    resultado = {}
+    for habito in habitos:
+        datos = guardadas.get(habito.id) or _calcular(habito, [], hoy)
+
+        racha_actual = datos['racha_actual']
+        if datos['fin_racha'] is None:
+            racha_actual = 0
+        else:
+            siguiente = _paso(habito, datos['fin_racha'], 1)
+            if siguiente is not None and siguiente < hoy:
+                racha_actual = 0
+
+        desde = max(inicio_tasa, habito.fecha_inicio) if habito.fecha_inicio else inicio_tasa
+        programados = sum(
+            1 for i in range((hoy - desde).days + 1)
+            if programado(habito, desde + timedelta(days=i))
+        )
+        completados = sum(
+            1 for fecha in set(datos['recientes'])
+            if desde <= fecha <= hoy and programado(habito, fecha)
+        )
+
+        resultado[habito.id] = {
+            "racha_actual": racha_actual,
+            "racha_maxima": datos['racha_maxima'],
+            "total_completados": datos['total_completados'],
+            "ultima_completada": str(datos['ultima_completada']) if datos['ultima_completada'] else None,
+            "tasa_30_dias": porcentaje(completados, programados),
+        }
+    return resultado
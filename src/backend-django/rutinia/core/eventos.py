@@ -0,0 +1,268 @@
+"""
+Eventos de notificaciones para el stream SSE (/api/notificaciones/eventos/).
+
+Cada conexión abierta es una cola asyncio suscrita al usuario; publicar un
+evento lo serializa una sola vez y lo encola en todas sus conexiones del
+proceso. Las conexiones ociosas no ocupan hilos ni consultas.
+
+Backends (settings.EVENTOS_BACKEND):
+    PubSubLocal: solo entrega lo que se publica en el mismo proceso.
+    PubSubMongo: además, un hilo por proceso consulta MongoDB cada
+        EVENTOS_INTERVALO segundos (una consulta de notificaciones nuevas
+        y una de contadores para todos los usuarios conectados), así llegan
+        los recordatorios de `manage.py recordatorios` y los cambios hechos
+        en otros workers. Hace de broker local sin infraestructura extra.
+"""
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from django.conf import settings
+from django.core import signing
+from django.utils.module_loading import import_string
+
+from .models import HistorialNotificacion
+from .prefetch import prefetch_referencias
+from .renderers import ORJSONRenderer
+from .serializers import EXTRACTORES_RAPIDOS, ListaRapida
+
+# Mensajes pendientes por conexión; si un cliente no los consume se descartan
+MAXIMO_PENDIENTES = 100
+# Margen para no perder notificaciones insertadas por otros procesos con un
+# ObjectId un poco anterior al último visto
+MARGEN_SEGUNDOS = 10
+
+
+# Los tickets del stream solo sirven para abrirlo (salt propio), no como token de la API
+SALT_TICKET = 'core.eventos.ticket'
+
+
+def emitir_ticket(usuario_id):
+    """
+    Ticket firmado y de corta duración para abrir el stream SSE. EventSource
+    no permite cabeceras, así que va en la URL (y en los logs de acceso del
+    servidor y de los proxies); por eso no se usa el token de acceso.
+    """
+    return signing.TimestampSigner(salt=SALT_TICKET).sign(str(usuario_id))
+
+
+def usuario_de_ticket(ticket):
+    """ObjectId del usuario del ticket; signing.BadSignature si es inválido o expiró"""
+    usuario_id = signing.TimestampSigner(salt=SALT_TICKET).unsign(
+        ticket, max_age=getattr(settings, 'EVENTOS_TICKET_TTL', 60)
+    )
+    if not ObjectId.is_valid(usuario_id):
+        raise signing.BadSignature('Ticket inválido')
+    return ObjectId(usuario_id)
+
+
+def _usuario_de(notificacion):
+    usuario = notificacion._data.get('usuario')
+    return str(getattr(usuario, 'id', usuario))
+
+
+def contar_no_leidas(usuario_id):
+    # El índice (usuario, leida, -fecha_hora) resuelve el conteo sin leer documentos
+    return HistorialNotificacion.objects(usuario=ObjectId(usuario_id), leida=False).count()
+
+
+def datos_notificaciones(notificaciones):
+    """Mismo formato que el listado de /notificaciones/"""
+    notificaciones = prefetch_referencias(list(notificaciones), {'habito': ('nombre', 'icono', 'color')})
+    return ListaRapida(notificaciones, EXTRACTORES_RAPIDOS[HistorialNotificacion]).data
+
+
+class Suscripcion:
+    def __init__(self, usuario_id):
+        self.usuario_id = usuario_id
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=MAXIMO_PENDIENTES)
+
+    def entregar(self, mensaje):
+        # Se ejecuta en el loop de la conexión
+        try:
+            self.cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            pass
+
+
+class PubSubLocal:
+    """Pub/sub en memoria del proceso, indexado por usuario"""
+
+    def __init__(self):
+        self._suscripciones = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def suscribir(self, usuario_id):
+        """Debe llamarse desde el loop asyncio de la conexión"""
+        suscripcion = Suscripcion(str(usuario_id))
+        with self._lock:
+            self._suscripciones[suscripcion.usuario_id].add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            conexiones = self._suscripciones.get(suscripcion.usuario_id)
+            if conexiones is not None:
+                conexiones.discard(suscripcion)
+                if not conexiones:
+                    del self._suscripciones[suscripcion.usuario_id]
+
+    def usuarios(self):
+        with self._lock:
+            return list(self._suscripciones)
+
+    def conexiones(self):
+        with self._lock:
+            return sum(len(conexiones) for conexiones in self._suscripciones.values())
+
+    def publicar(self, usuario_id, evento, datos):
+        """
+        Envía `evento` a las conexiones del usuario. Se puede llamar desde
+        código síncrono (vistas, hilos) o desde el loop.
+        """
+        with self._lock:
+            destinos = list(self._suscripciones.get(str(usuario_id), ()))
+        if not destinos:
+            return
+
+        mensaje = (evento, ORJSONRenderer().render(datos))
+        for suscripcion in destinos:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, mensaje)
+            except RuntimeError:
+                # El loop de la conexión ya se cerró
+                self.desuscribir(suscripcion)
+
+    def escuchando(self, usuario_id):
+        with self._lock:
+            return str(usuario_id) in self._suscripciones
+
+    # --- Eventos de dominio ---
+
+    def notificaciones_creadas(self, notificaciones):
+        """Publica notificaciones nuevas y el contador de no leídas de sus usuarios"""
+        notificaciones = [n for n in notificaciones if self.escuchando(_usuario_de(n))]
+        if not notificaciones:
+            return
+        for datos in datos_notificaciones(notificaciones):
+            self.publicar(datos['usuario'], 'notificacion', datos)
+        for usuario_id in {_usuario_de(n) for n in notificaciones}:
+            self.contador_cambiado(usuario_id)
+
+    def contador_cambiado(self, usuario_id):
+        if self.escuchando(usuario_id):
+            self.publicar(usuario_id, 'contador', {'no_leidas': contar_no_leidas(usuario_id)})
+
+
+class PubSubMongo(PubSubLocal):
+    """PubSubLocal más un sondeo de MongoDB por proceso (no por conexión)"""
+
+    def __init__(self, intervalo=None):
+        super().__init__()
+        self.intervalo = intervalo or getattr(settings, 'EVENTOS_INTERVALO', 2)
+        self._hilo = None
+        self._desde = ObjectId.from_datetime(_ahora_utc())
+        self._publicadas = {}  # id -> instante, para no repetir
+        self._contadores = {}
+
+    def suscribir(self, usuario_id):
+        suscripcion = super().suscribir(usuario_id)
+        if self._hilo is None:
+            with self._lock:
+                if self._hilo is None:
+                    self._hilo = threading.Thread(target=self._sondear, name='eventos-mongo', daemon=True)
+                    self._hilo.start()
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        super().desuscribir(suscripcion)
+        if not self.escuchando(suscripcion.usuario_id):
+            self._contadores.pop(suscripcion.usuario_id, None)
+
+    def notificaciones_creadas(self, notificaciones):
+        ahora = time.monotonic()
+        with self._lock:
+            for notificacion in notificaciones:
+                self._publicadas[notificacion.id] = ahora
+        super().notificaciones_creadas(notificaciones)
+
+    def contador_cambiado(self, usuario_id):
+        self._contadores.pop(str(usuario_id), None)
+        super().contador_cambiado(usuario_id)
+
+    def _sondear(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                self._revisar()
+            except Exception:
+                # Un error de red no debe matar el hilo; se reintenta en el siguiente ciclo
+                pass
+
+    def _revisar(self):
+        usuarios = [ObjectId(usuario_id) for usuario_id in self.usuarios()]
+        if not usuarios:
+            return
+
+        # Notificaciones nuevas de los usuarios conectados (una consulta)
+        siguiente = ObjectId.from_datetime(_ahora_utc(-MARGEN_SEGUNDOS))
+        encontradas = list(
+            HistorialNotificacion.objects(id__gt=self._desde, usuario__in=usuarios).order_by('id')
+        )
+        ahora = time.monotonic()
+        with self._lock:
+            # Se reservan antes de publicar para que notificaciones_creadas no las repita
+            nuevas = [notificacion for notificacion in encontradas if notificacion.id not in self._publicadas]
+            for notificacion in nuevas:
+                self._publicadas[notificacion.id] = ahora
+        if nuevas:
+            try:
+                for datos in datos_notificaciones(nuevas):
+                    self.publicar(datos['usuario'], 'notificacion', datos)
+            except Exception:
+                # Se liberan y _desde no avanza: el siguiente ciclo las vuelve a intentar
+                with self._lock:
+                    for notificacion in nuevas:
+                        self._publicadas.pop(notificacion.id, None)
+                raise
+        with self._lock:
+            self._publicadas = {
+                id_: instante for id_, instante in self._publicadas.items()
+                if ahora - instante < MARGEN_SEGUNDOS * 3
+            }
+        self._desde = siguiente
+
+        # Contadores de no leídas (una agregación); solo se publican los que cambian
+        conteos = {str(usuario_id): 0 for usuario_id in usuarios}
+        for fila in HistorialNotificacion._get_collection().aggregate([
+            {'$match': {'usuario': {'$in': usuarios}, 'leida': False}},
+            {'$group': {'_id': '$usuario', 'n': {'$sum': 1}}},
+        ]):
+            conteos[str(fila['_id'])] = fila['n']
+        for usuario_id, no_leidas in conteos.items():
+            if self._contadores.get(usuario_id) != no_leidas:
+                self._contadores[usuario_id] = no_leidas
+                self.publicar(usuario_id, 'contador', {'no_leidas': no_leidas})
+
+
+def _ahora_utc(segundos=0):
+    return datetime.now(timezone.utc) + timedelta(seconds=segundos)
+
+
+_canal = None
+_canal_lock = threading.Lock()
+
+
+def canal():
+    """Instancia del backend configurado en EVENTOS_BACKEND (una por proceso)"""
+    global _canal
+    if _canal is None:
+        with _canal_lock:
+            if _canal is None:
+                clase = import_string(getattr(settings, 'EVENTOS_BACKEND', 'core.eventos.PubSubLocal'))
+                _canal = clase()
+    return _canal
@@ -0,0 +1,176 @@
+"""
+Exportación de los hábitos y registros de un usuario (GET /api/export/).
+
+Los datos se leen con cursores de pymongo por lotes (batch_size) y con
+proyección, sin instanciar documentos de MongoEngine ni resolver
+referencias fila por fila: el nombre del hábito sale de un dict con los
+hábitos del usuario y el de la categoría del cache de referencias. Cada
+lote se codifica y se envía antes de pedir el siguiente, así la memoria
+no depende del tamaño del historial.
+
+Formatos:
+    ndjson: una línea JSON por hábito ("tipo": "habito") y después una por
+            registro ("tipo": "registro"), ordenados por hábito y fecha.
+    csv:    una fila por registro con los datos de su hábito; los días de
+            la programación van en una celda separados por "|".
+"""
+import csv
+import io
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Habito, RegistroHabito
+from .referencias import categorias
+from .registros import fecha_a_mongo
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+CAMPOS_HABITO = (
+    'nombre', 'descripcion', 'dificultad', 'fecha_inicio', 'tipo_frecuencia', 'dias',
+    'publico', 'activo', 'icono', 'color',
+)
+
+COLUMNAS_CSV = ('habito_id', 'habito', 'categoria', 'tipo_frecuencia', 'dias', 'fecha', 'estado')
+
+# Separador de los días en la celda `dias` del CSV
+SEPARADOR_DIAS = '|'
+
+
+def _fecha(valor):
+    return valor.date().isoformat() if valor is not None else None
+
+
+def _nombre_categoria(valor):
+    categoria = categorias.obtener(valor)
+    return categoria.nombre if categoria is not None else None
+
+
+def _habitos(usuario_id):
+    """Hábitos del usuario como dicts listos para exportar, en orden de _id"""
+    proyeccion = dict.fromkeys(CAMPOS_HABITO + ('categoria',), 1)
+    cursor = Habito._get_collection().find({'usuario': usuario_id}, projection=proyeccion).sort('_id', 1)
+    habitos = []
+    for documento in cursor:
+        habito = {'id': str(documento['_id'])}
+        for campo in CAMPOS_HABITO:
+            habito[campo] = documento.get(campo)
+        habito['fecha_inicio'] = _fecha(habito['fecha_inicio'])
+        habito['categoria'] = _nombre_categoria(documento.get('categoria'))
+        habitos.append((documento['_id'], habito))
+    return habitos
+
+
+def _registros(habito_ids, desde, hasta):
+    """Cursor por lotes de los registros de los hábitos (índice habito, fecha)"""
+    filtro = {'habito': {'$in': habito_ids}}
+    rango = {}
+    if desde:
+        rango['$gte'] = fecha_a_mongo(desde)
+    if hasta:
+        rango['$lte'] = fecha_a_mongo(hasta)
+    if rango:
+        filtro['fecha'] = rango
+    return RegistroHabito._get_collection().find(
+        filtro, projection={'_id': 1, 'habito': 1, 'fecha': 1, 'estado': 1}
+    ).sort([('habito', 1), ('fecha', 1)]).batch_size(getattr(settings, 'EXPORTACION_LOTE', 2000))
+
+
+def _lotes(iterable, tamano):
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def exportar_ndjson(usuario_id, desde=None, hasta=None):
+    """Generador de bloques de bytes en NDJSON"""
+    lote = getattr(settings, 'EXPORTACION_LOTE', 2000)
+    habitos = _habitos(usuario_id)
+    nombres = {}
+    for bloque in _lotes(habitos, lote):
+        lineas = []
+        for habito_id, habito in bloque:
+            nombres[habito_id] = habito['nombre']
+            lineas.append(orjson.dumps({'tipo': 'habito', **habito}))
+        yield b'\n'.join(lineas) + b'\n'
+    if not habitos:
+        return
+
+    for bloque in _lotes(_registros(list(nombres), desde, hasta), lote):
+        yield b'\n'.join(
+            orjson.dumps({
+                'tipo': 'registro',
+                'id': str(registro['_id']),
+                'habito_id': str(registro['habito']),
+                'habito': nombres.get(registro['habito']),
+                'fecha': _fecha(registro.get('fecha')),
+                'estado': bool(registro.get('estado')),
+            })
+            for registro in bloque
+        ) + b'\n'
+
+
+def exportar_csv(usuario_id, desde=None, hasta=None):
+    """Generador de bloques de bytes en CSV (UTF-8 con BOM para que Excel respete los acentos)"""
+    lote = getattr(settings, 'EXPORTACION_LOTE', 2000)
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUMNAS_CSV)
+    yield ('\ufeff' + buffer.getvalue()).encode()
+
+    # Columnas del hábito, calculadas una vez por hábito
+    habitos = {
+        habito_id: (
+            habito['id'], habito['nombre'], habito['categoria'], habito['tipo_frecuencia'],
+            SEPARADOR_DIAS.join(str(dia) for dia in habito['dias'] or []),
+        )
+        for habito_id, habito in _habitos(usuario_id)
+    }
+    if not habitos:
+        return
+
+    for bloque in _lotes(_registros(list(habitos), desde, hasta), lote):
+        buffer.seek(0)
+        buffer.truncate()
+        for registro in bloque:
+            escritor.writerow(habitos[registro['habito']] + (
+                _fecha(registro.get('fecha')), 'true' if registro.get('estado') else 'false',
+            ))
+        yield buffer.getvalue().encode()
+
+
+EXPORTADORES = {
+    'ndjson': exportar_ndjson,
+    'csv': exportar_csv,
+}
+
+
+async def iterar_en_hilo(generador):
+    """
+    Versión asíncrona de un generador bloqueante: cada bloque se pide en un
+    hilo del executor. Con ASGI, Django consume un iterador síncrono entero
+    en memoria antes de enviarlo; así se envía bloque a bloque.
+    """
+    siguiente = sync_to_async(next, thread_sensitive=False)
+    try:
+        while True:
+            bloque = await siguiente(generador, None)
+            if bloque is None:
+                break
+            yield bloque
+    finally:
+        # Si el cliente corta la descarga se cierra el generador (y su cursor)
+        try:
+            await sync_to_async(generador.close, thread_sensitive=False)()
+        except ValueError:
+            # Todavía ejecutándose en el hilo: lo cierra el recolector al terminar
+            pass
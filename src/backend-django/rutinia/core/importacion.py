@@ -0,0 +1,278 @@
+"""
+Importación masiva de hábitos y registros (POST /api/import/).
+
+Acepta los mismos formatos que genera la exportación (core/exportacion.py):
+
+    ndjson: líneas {"tipo": "habito", "id", "nombre", ...} y después
+            {"tipo": "registro", "habito_id" o "habito", "fecha", "estado"}.
+    csv:    columnas habito_id, habito, categoria, tipo_frecuencia, dias,
+            fecha, estado (habito_id o habito, y fecha, son obligatorias);
+            dias separados por "|".
+
+El cuerpo se lee línea a línea sin cargarlo entero. Los hábitos se
+resuelven por el id del archivo (si es de un hábito del usuario o de una
+línea "habito" anterior) o por el nombre normalizado; los que no existen se
+crean, con la categoría resuelta por el cache de referencias. Los registros
+se acumulan por (habito, fecha) y se escriben en lotes de IMPORTACION_LOTE
+con un bulk_write no ordenado de upserts sobre el índice único.
+
+La respuesta es NDJSON en streaming: una línea "error" por fila rechazada
+(hasta IMPORTACION_MAX_ERRORES), una "progreso" por lote escrito y una
+"resumen" al final.
+"""
+import csv
+import time
+from datetime import date
+
+import orjson
+from django.conf import settings
+from mongoengine.errors import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .busqueda import normalizar
+from .estadisticas import CAMPOS_HABITO as CAMPOS_ESTADISTICAS, recalcular_estadisticas
+from .exportacion import CAMPOS_HABITO, SEPARADOR_DIAS
+from .models import Habito, RegistroHabito
+from .referencias import obtener_o_crear_categoria
+from .registros import fecha_a_mongo
+from .versiones import incrementar_version
+
+FORMATOS = {
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'text/csv': 'csv',
+}
+
+VERDADEROS = {'true', '1', 'si', 'sí'}
+FALSOS = {'false', '0', 'no', ''}
+
+# Hábitos por consulta al recalcular las estadísticas al final
+LOTE_ESTADISTICAS = 100
+
+
+class ErrorFila(Exception):
+    pass
+
+
+def leer_ndjson(flujo):
+    """(número de línea, dict) por cada línea no vacía; ErrorFila si no es un objeto JSON"""
+    for numero, linea in enumerate(flujo, 1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            fila = orjson.loads(linea)
+        except orjson.JSONDecodeError:
+            yield numero, ErrorFila('JSON inválido')
+            continue
+        if not isinstance(fila, dict):
+            yield numero, ErrorFila('Se esperaba un objeto JSON')
+            continue
+        yield numero, fila
+
+
+def leer_csv(flujo):
+    """(número de línea, dict) por cada fila; las celdas vacías se toman como ausentes"""
+    lector = csv.DictReader(linea.decode('utf-8-sig', errors='replace') for linea in flujo)
+    columnas = set(lector.fieldnames or ())
+    if not columnas:
+        return
+    if 'fecha' not in columnas or not {'habito_id', 'habito'} & columnas:
+        yield 1, ErrorFila('Se requieren las columnas fecha y habito_id o habito')
+        return
+    for fila in lector:
+        yield lector.line_num, {clave: valor for clave, valor in fila.items() if clave and valor != ''}
+
+
+LECTORES = {
+    'ndjson': leer_ndjson,
+    'csv': leer_csv,
+}
+
+
+def _fecha(valor):
+    try:
+        return date.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise ErrorFila('Formato de fecha inválido. Use YYYY-MM-DD')
+
+
+def _dias(valor):
+    """Días de la celda del CSV ("Lunes|Miércoles", "1|15") como lista; los números como int"""
+    if not isinstance(valor, str):
+        return valor
+    return [
+        int(dia) if dia.isdigit() else dia
+        for dia in (parte.strip() for parte in valor.split(SEPARADOR_DIAS)) if dia
+    ]
+
+
+def _estado(valor):
+    if isinstance(valor, bool) or valor is None:
+        return bool(valor)
+    texto = str(valor).strip().lower()
+    if texto in VERDADEROS:
+        return True
+    if texto in FALSOS:
+        return False
+    raise ErrorFila('Estado inválido. Use true o false')
+
+
+def _linea(datos):
+    return orjson.dumps(datos) + b'\n'
+
+
+class Importacion:
+    def __init__(self, usuario_id):
+        self.usuario_id = usuario_id
+        self.lote = getattr(settings, 'IMPORTACION_LOTE', 5000)
+        self.max_errores = getattr(settings, 'IMPORTACION_MAX_ERRORES', 1000)
+        self.filas = 0
+        self.registros = 0
+        self.registros_creados = 0
+        self.habitos_creados = 0
+        self.errores = 0
+        # {(habito_id, fecha en Mongo): (número de línea, estado)}; la última fila gana
+        self._pendientes = {}
+        self._tocados = set()
+
+        # Hábitos existentes del usuario, por id y por nombre normalizado
+        self._por_id = {}
+        self._por_nombre = {}
+        for habito in Habito._get_collection().find(
+            {'usuario': usuario_id}, projection={'nombre': 1, 'nombre_normalizado': 1}
+        ).sort('_id', 1):
+            self._por_id[str(habito['_id'])] = habito['_id']
+            nombre = habito.get('nombre_normalizado') or normalizar(habito.get('nombre'))
+            self._por_nombre.setdefault(nombre, habito['_id'])
+
+    def procesar(self, filas):
+        """Generador de las líneas NDJSON de la respuesta"""
+        inicio = time.monotonic()
+        for numero, fila in filas:
+            self.filas += 1
+            try:
+                if isinstance(fila, ErrorFila):
+                    raise fila
+                if fila.get('tipo') == 'habito':
+                    self._habito(fila)
+                else:
+                    self._registro(numero, fila)
+            except ErrorFila as e:
+                yield from self._error(numero, str(e))
+
+            if len(self._pendientes) >= self.lote:
+                yield from self._escribir()
+                yield self._progreso('progreso')
+
+        yield from self._escribir()
+        self._finalizar()
+        yield self._progreso(
+            'resumen', registros_creados=self.registros_creados, segundos=round(time.monotonic() - inicio, 2)
+        )
+
+    def _progreso(self, tipo, **extra):
+        return _linea({
+            'tipo': tipo,
+            'filas': self.filas,
+            'registros': self.registros,
+            'habitos_creados': self.habitos_creados,
+            'errores': self.errores,
+            **extra,
+        })
+
+    def _error(self, numero, mensaje):
+        self.errores += 1
+        if self.errores <= self.max_errores:
+            yield _linea({'tipo': 'error', 'fila': numero, 'error': mensaje})
+
+    def _crear_habito(self, datos):
+        campos = {campo: datos[campo] for campo in CAMPOS_HABITO if datos.get(campo) is not None}
+        if 'fecha_inicio' in campos:
+            campos['fecha_inicio'] = _fecha(campos['fecha_inicio'])
+        categoria = datos.get('categoria')
+        if categoria is not None and (not isinstance(categoria, str) or len(categoria.strip()) > 50):
+            raise ErrorFila('Categoría inválida')
+
+        try:
+            habito = Habito(usuario=self.usuario_id, categoria=obtener_o_crear_categoria(categoria), **campos)
+            habito.save()
+        except (ValidationError, TypeError, ValueError) as e:
+            raise ErrorFila(f'Hábito inválido: {e}')
+
+        self.habitos_creados += 1
+        self._por_id[str(habito.id)] = habito.id
+        self._por_nombre[normalizar(habito.nombre)] = habito.id
+        return habito.id
+
+    def _habito(self, fila):
+        nombre = fila.get('nombre')
+        if not isinstance(nombre, str) or not nombre.strip():
+            raise ErrorFila('El hábito no tiene nombre')
+        habito_id = self._por_nombre.get(normalizar(nombre))
+        if habito_id is None:
+            habito_id = self._crear_habito(fila)
+        if fila.get('id') is not None:
+            self._por_id[str(fila['id'])] = habito_id
+
+    def _resolver_habito(self, fila):
+        referencia = fila.get('habito_id')
+        if referencia is not None and str(referencia) in self._por_id:
+            return self._por_id[str(referencia)]
+
+        nombre = fila.get('habito')
+        if not isinstance(nombre, str) or not nombre.strip():
+            raise ErrorFila('Hábito no encontrado')
+        habito_id = self._por_nombre.get(normalizar(nombre))
+        if habito_id is None:
+            habito_id = self._crear_habito({
+                'nombre': nombre,
+                'tipo_frecuencia': fila.get('tipo_frecuencia'),
+                'dias': _dias(fila.get('dias')),
+                'categoria': fila.get('categoria'),
+            })
+        if referencia is not None:
+            self._por_id[str(referencia)] = habito_id
+        return habito_id
+
+    def _registro(self, numero, fila):
+        habito_id = self._resolver_habito(fila)
+        fecha = fecha_a_mongo(_fecha(fila.get('fecha')))
+        self._pendientes[(habito_id, fecha)] = (numero, _estado(fila.get('estado')))
+
+    def _escribir(self):
+        """bulk_write no ordenado de los registros pendientes; genera las líneas de error"""
+        if not self._pendientes:
+            return
+        pendientes = list(self._pendientes.items())
+        self._pendientes = {}
+
+        operaciones = [
+            UpdateOne({'habito': habito_id, 'fecha': fecha}, {'$set': {'estado': estado}}, upsert=True)
+            for (habito_id, fecha), (_, estado) in pendientes
+        ]
+        try:
+            resultado = RegistroHabito._get_collection().bulk_write(operaciones, ordered=False)
+            creados = resultado.upserted_count
+            errores = {}
+        except BulkWriteError as e:
+            # Las operaciones no ordenadas que no fallaron sí se aplicaron
+            creados = len(e.details.get('upserted', []))
+            errores = {err['index']: err.get('errmsg', 'Error de escritura') for err in e.details.get('writeErrors', [])}
+
+        self.registros += len(pendientes) - len(errores)
+        self.registros_creados += creados
+        self._tocados.update(habito_id for (habito_id, _), _ in pendientes)
+        for indice, mensaje in sorted(errores.items()):
+            yield from self._error(pendientes[indice][1][0], mensaje)
+
+    def _finalizar(self):
+        """Estadísticas de los hábitos modificados y versión de datos (ETag y cache de progreso)"""
+        tocados = list(self._tocados)
+        for inicio in range(0, len(tocados), LOTE_ESTADISTICAS):
+            recalcular_estadisticas(list(
+                Habito.objects(id__in=tocados[inicio:inicio + LOTE_ESTADISTICAS]).only(*CAMPOS_ESTADISTICAS)
+            ))
+        if tocados or self.habitos_creados:
+            incrementar_version([self.usuario_id])
@@ -1,43 +1,163 @@
 """
 Autenticador JWT personalizado para MongoDB/MongoEngine.
 """
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
 from bson import ObjectId
 
 
+class UsuarioAutenticado:
+    """
+    Datos mínimos del usuario autenticado (request.user).
+    Se cachean en lugar del documento Usuario completo.
+    """
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, nombre=None, apellido=None, correo=None, tema=None, rol_id=None,
+                 completo=True):
+        self.id = id
+        self.pk = id
+        self.nombre = nombre
+        self.apellido = apellido
+        self.correo = correo
+        self.tema = tema
+        self.rol_id = rol_id
+        # False si se construyó solo con los claims del token (sin apellido/tema/rol)
+        self.completo = completo
+
+    @classmethod
+    def desde_documento(cls, usuario):
+        rol = usuario._data.get('rol')
+        return cls(
+            id=usuario.id,
+            nombre=usuario.nombre,
+            apellido=usuario.apellido,
+            correo=usuario.correo,
+            tema=usuario.tema,
+            rol_id=rol.id if rol is not None else None,
+        )
+
+    def __str__(self):
+        return f"{self.nombre} {self.apellido}"
+
+
+class CacheUsuarios:
+    """
+    Cache LRU con TTL, por proceso, de UsuarioAutenticado por user_id.
+    Se invalida al guardar o eliminar un Usuario (ver core/signals.py);
+    el TTL limita cuánto puede quedar desactualizado en otros procesos.
+    """
+
+    def __init__(self, ttl, maximo):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def obtener(self, user_id):
+        with self._lock:
+            entrada = self._datos.get(user_id)
+            if entrada is None or entrada[0] < time.monotonic():
+                if entrada is not None:
+                    del self._datos[user_id]
+                self.misses += 1
+                return None
+            self._datos.move_to_end(user_id)
+            self.hits += 1
+            return entrada[1]
+
+    def guardar(self, user_id, usuario):
+        if self.ttl <= 0 or self.maximo <= 0:
+            return
+        with self._lock:
+            self._datos[user_id] = (time.monotonic() + self.ttl, usuario)
+            self._datos.move_to_end(user_id)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._datos.pop(str(user_id), None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0,
+                'tamano': len(self._datos),
+            }
+
+
+cache_usuarios = CacheUsuarios(
+    ttl=getattr(settings, 'JWT_CACHE_USUARIOS_TTL', 60),
+    maximo=getattr(settings, 'JWT_CACHE_USUARIOS_MAXIMO', 10000),
+)
+
+
 class MongoJWTAuthentication(JWTAuthentication):
     """
     Autenticador JWT personalizado para MongoDB/MongoEngine.
     Simple JWT espera un modelo Django User con ID numérico,
     pero nosotros usamos Usuario de MongoDB con ObjectId.
     """
-    
+
+    def authenticate(self, request):
+        # Se guarda el método para decidir si se puede confiar solo en el token
+        self.metodo = request.method
+        return super().authenticate(request)
+
     def get_user(self, validated_token):
         """
-        Obtiene el usuario desde MongoDB usando el ObjectId del token.
+        Obtiene el usuario del cache o, si no está, desde MongoDB usando
+        el ObjectId del token.
         """
+        user_id = validated_token.get('user_id')
+        if not user_id:
+            raise InvalidToken('Token no contiene user_id')
+
+        usuario = cache_usuarios.obtener(user_id)
+        if usuario is not None:
+            return usuario
+
+        # En peticiones de solo lectura se puede evitar la consulta usando los claims
+        if (getattr(settings, 'JWT_CONFIAR_EN_TOKEN_LECTURA', False)
+                and getattr(self, 'metodo', None) in SAFE_METHODS
+                and ObjectId.is_valid(user_id)):
+            return UsuarioAutenticado(
+                id=ObjectId(user_id),
+                nombre=validated_token.get('nombre'),
+                correo=validated_token.get('correo'),
+                completo=False,
+            )
+
         try:
             # Importar aquí para evitar circular imports
             from core.models import Usuario
-            
-            user_id = validated_token.get('user_id')
-            if not user_id:
-                raise InvalidToken('Token no contiene user_id')
-            
+
             # Buscar usuario en MongoDB
-            usuario = Usuario.objects(id=ObjectId(user_id)).first()
-            
-            if not usuario:
-                raise InvalidToken('Usuario no encontrado')
-            
-            # Retornar el usuario de MongoDB
-            # Simple JWT espera un objeto con ciertos atributos
-            # Agregar atributos necesarios para compatibilidad
-            usuario.is_authenticated = True
-            usuario.is_active = True
-            
-            return usuario
-            
+            documento = Usuario.objects(id=ObjectId(user_id)).first()
         except Exception as e:
             raise InvalidToken(f'Error al obtener usuario: {str(e)}')
+
+        if not documento:
+            raise InvalidToken('Usuario no encontrado')
+
+        usuario = UsuarioAutenticado.desde_documento(documento)
+        cache_usuarios.guardar(user_id, usuario)
+        return usuario
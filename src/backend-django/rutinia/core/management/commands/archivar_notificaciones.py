@@ -0,0 +1,68 @@
+"""
+Archiva las notificaciones fuera del periodo de retención.
+
+Uso:
+    python manage.py archivar_notificaciones              # mueve al archivo las vencidas
+    python manage.py archivar_notificaciones --dry-run    # solo cuenta cuántas vencieron
+    python manage.py archivar_notificaciones --lote 500 --pausa 0.2
+
+Pensado para ejecutarse periódicamente (cron, scheduler) con
+NOTIFICACIONES_RETENCION_MODO = 'archivo'. Trabaja por lotes pequeños con
+una pausa entre ellos para no competir con el tráfico de la aplicación; si
+se interrumpe, la siguiente ejecución continúa sin duplicar.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.retencion import filtro_vencidas, contar_vencidas, archivar_lote
+
+
+class Command(BaseCommand):
+    help = 'Mueve a historial_notificacion_archivada las notificaciones fuera del periodo de retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Solo reporta cuántas notificaciones se archivarían')
+        parser.add_argument('--lote', type=int, default=1000,
+                            help='Notificaciones por lote (por defecto 1000)')
+        parser.add_argument('--pausa', type=float, default=0.1,
+                            help='Segundos de espera entre lotes (por defecto 0.1)')
+        parser.add_argument('--dias-leidas', type=int,
+                            help='Sobrescribe NOTIFICACIONES_RETENCION_LEIDAS_DIAS')
+        parser.add_argument('--dias-no-leidas', type=int,
+                            help='Sobrescribe NOTIFICACIONES_RETENCION_NO_LEIDAS_DIAS')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1 or options['pausa'] < 0:
+            raise CommandError('--lote debe ser mayor que 0 y --pausa no negativa')
+
+        modo = getattr(settings, 'NOTIFICACIONES_RETENCION_MODO', '')
+        if modo != 'archivo':
+            self.stdout.write(self.style.WARNING(
+                f"NOTIFICACIONES_RETENCION_MODO es '{modo}'; "
+                "el archivo solo se usa con el modo 'archivo'"
+            ))
+            if not options['dry_run']:
+                return
+
+        filtro = filtro_vencidas(dias_leidas=options['dias_leidas'], dias_no_leidas=options['dias_no_leidas'])
+        if filtro is None:
+            self.stdout.write('Retención desactivada (0 días): no hay nada que archivar')
+            return
+
+        if options['dry_run']:
+            self.stdout.write(f'Notificaciones para archivar: {contar_vencidas(filtro)}')
+            return
+
+        total = 0
+        while True:
+            movidas = archivar_lote(filtro, options['lote'])
+            if not movidas:
+                break
+            total += movidas
+            self.stdout.write(f'  {total} notificaciones archivadas')
+            time.sleep(options['pausa'])
+
+        self.stdout.write(self.style.SUCCESS(f'Notificaciones archivadas: {total}'))
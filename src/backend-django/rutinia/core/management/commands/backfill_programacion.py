@@ -0,0 +1,86 @@
+"""
+Completa la programación normalizada (frecuencia, mascara_semana,
+mascara_mes y el minuto del día de cada recordatorio) y las copias
+normalizadas para búsqueda (nombre, dificultad, tipo_frecuencia) de los
+hábitos guardados antes de que existieran, o corrige las que quedaron
+desactualizadas.
+
+Uso:
+    python manage.py backfill_programacion            # actualiza los hábitos
+    python manage.py backfill_programacion --dry-run  # solo cuenta cuántos cambian
+
+Lee solo los campos de origen y los calculados, y escribe por lotes
+con bulk_write, solo en los hábitos cuyo valor cambia. Se puede ejecutar
+varias veces.
+"""
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from core.models import Habito
+from core.busqueda import normalizar
+from core.programacion import calcular_programacion, minuto_del_dia
+
+
+class Command(BaseCommand):
+    help = 'Calcula la programación y los campos normalizados de los hábitos existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo reporta cuántos hábitos cambiarían, sin escribir',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Cantidad de actualizaciones por bulk_write (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        coleccion = Habito._get_collection()
+        proyeccion = {
+            'tipo_frecuencia': 1, 'dias': 1, 'notificaciones': 1,
+            'frecuencia': 1, 'mascara_semana': 1, 'mascara_mes': 1,
+        }
+        for campo, normalizado in Habito.CAMPOS_NORMALIZADOS.items():
+            proyeccion[campo] = proyeccion[normalizado] = 1
+        cursor = coleccion.find({}, projection=proyeccion)
+
+        revisados = 0
+        actualizados = 0
+        operaciones = []
+        for habito in cursor:
+            revisados += 1
+            frecuencia, semana, mes = calcular_programacion(habito.get('tipo_frecuencia'), habito.get('dias'))
+            cambios = {
+                campo: valor
+                for campo, valor in (('frecuencia', frecuencia), ('mascara_semana', semana), ('mascara_mes', mes))
+                if habito.get(campo) != valor
+            }
+            for campo, normalizado in Habito.CAMPOS_NORMALIZADOS.items():
+                valor = normalizar(habito.get(campo))
+                if habito.get(normalizado) != valor:
+                    cambios[normalizado] = valor
+            notificaciones = habito.get('notificaciones') or []
+            minutos = [minuto_del_dia(n.get('hora')) for n in notificaciones]
+            if any(n.get('minuto') != m for n, m in zip(notificaciones, minutos)):
+                cambios['notificaciones'] = [{**n, 'minuto': m} for n, m in zip(notificaciones, minutos)]
+            if not cambios:
+                continue
+
+            actualizados += 1
+            operaciones.append(UpdateOne({'_id': habito['_id']}, {'$set': cambios}))
+            if len(operaciones) >= options['lote']:
+                if not dry_run:
+                    coleccion.bulk_write(operaciones, ordered=False)
+                operaciones = []
+
+        if operaciones and not dry_run:
+            coleccion.bulk_write(operaciones, ordered=False)
+
+        accion = 'cambiarían' if dry_run else 'actualizados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{revisados} hábitos revisados, {actualizados} {accion}'
+        ))
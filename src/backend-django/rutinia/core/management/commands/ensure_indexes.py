@@ -0,0 +1,156 @@
+"""
+Crea los índices declarados en el `meta` de los documentos de MongoEngine.
+
+Uso:
+    python manage.py ensure_indexes            # crea los índices faltantes
+    python manage.py ensure_indexes --dry-run  # solo reporta el estado
+
+Los índices se construyen en línea (la colección sigue aceptando lecturas
+y escrituras). Antes de crear un índice único se buscan duplicados; si
+existen, el comando falla indicando cuáles son en lugar de dejar el índice
+a medias.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from pymongo.errors import OperationFailure
+
+from core.models import (
+    Usuario, Categoria, Habito, RegistroHabito, EstadisticaHabito, HistorialNotificacion, HistorialNotificacionArchivada
+)
+
+
+DOCUMENTOS = [
+    Usuario, Categoria, Habito, RegistroHabito, EstadisticaHabito, HistorialNotificacion, HistorialNotificacionArchivada
+]
+
+# Opciones que deben coincidir para considerar que un índice ya existe
+OPCIONES_COMPARADAS = (
+    'unique', 'sparse', 'expireAfterSeconds', 'partialFilterExpression', 'weights', 'default_language',
+)
+
+
+def _clave(campos, pesos=None):
+    """
+    Clave comparable de un índice. MongoDB guarda los índices de texto como
+    (_fts, _ftsx) con los campos en `weights`; se reemplazan por los campos
+    de texto en orden alfabético, igual que los declarados.
+    """
+    campos = [tuple(campo) for campo in campos]
+    if pesos is not None:
+        campos = [campo for campo in campos if campo[0] not in ('_fts', '_ftsx')]
+        campos += [(campo, 'text') for campo in pesos]
+    normales = [campo for campo in campos if campo[1] != 'text']
+    return tuple(normales + sorted(campo for campo in campos if campo[1] == 'text'))
+
+
+def _normalizar_opciones(opciones):
+    return {
+        clave: dict(opciones[clave]) if clave == 'weights' else opciones[clave]
+        for clave in OPCIONES_COMPARADAS
+        if opciones.get(clave) not in (None, False)
+    }
+
+
+class Command(BaseCommand):
+    help = 'Crea los índices de MongoDB declarados en core.models y reporta los existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo reporta qué índices existen y cuáles faltan, sin crearlos',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        errores = []
+        creados = 0
+
+        for documento in DOCUMENTOS:
+            coleccion = documento._get_collection()
+            existentes = {
+                _clave(info['key'], info.get('weights')): (nombre, _normalizar_opciones(info))
+                for nombre, info in coleccion.index_information().items()
+            }
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{documento.__name__} ({coleccion.name})'))
+
+            for spec in documento._meta.get('index_specs') or []:
+                spec = spec.copy()
+                campos = [tuple(campo) for campo in spec.pop('fields')]
+                spec.pop('cls', None)
+                deseadas = _normalizar_opciones(spec)
+                descripcion = self._describir(campos, deseadas)
+
+                if _clave(campos) in existentes:
+                    nombre, actuales = existentes[_clave(campos)]
+                    if actuales == deseadas:
+                        self.stdout.write(f'  - Ya existe: {descripcion} ({nombre})')
+                    else:
+                        errores.append(
+                            f'{documento.__name__}: el índice {nombre} existe con opciones '
+                            f'{actuales or "{}"} pero se esperaba {deseadas or "{}"}'
+                        )
+                        self.stdout.write(self.style.ERROR(f'  ✗ Conflicto: {descripcion} ({nombre})'))
+                    continue
+
+                if deseadas.get('unique'):
+                    duplicados = self._buscar_duplicados(coleccion, campos, spec)
+                    if duplicados:
+                        errores.append(self._reportar_duplicados(documento, campos, duplicados))
+                        self.stdout.write(self.style.ERROR(f'  ✗ Duplicados: {descripcion}'))
+                        continue
+
+                if dry_run:
+                    self.stdout.write(self.style.WARNING(f'  + Falta: {descripcion}'))
+                    continue
+
+                try:
+                    nombre = coleccion.create_index(campos, background=True, **spec)
+                except OperationFailure as e:
+                    errores.append(f'{documento.__name__}: no se pudo crear {descripcion}: {e}')
+                    self.stdout.write(self.style.ERROR(f'  ✗ Error: {descripcion}'))
+                    continue
+
+                creados += 1
+                self.stdout.write(self.style.SUCCESS(f'  ✓ Creado: {descripcion} ({nombre})'))
+
+        if errores:
+            raise CommandError('\n'.join(['No se pudieron crear todos los índices:'] + errores))
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS('Revisión completada (sin cambios)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Índices creados: {creados}'))
+
+    def _describir(self, campos, opciones):
+        claves = ', '.join(f'{campo}:{direccion}' for campo, direccion in campos)
+        extras = ' '.join(sorted(opciones))
+        return f'({claves}) {extras}'.strip()
+
+    def _buscar_duplicados(self, coleccion, campos, spec, limite=5):
+        """Devuelve hasta `limite` grupos de documentos que violarían el índice único"""
+        # Solo cuentan los documentos que el índice incluye: los que cumplen el
+        # filtro parcial y, si es sparse, los que tienen alguno de los campos
+        pipeline = []
+        if spec.get('partialFilterExpression'):
+            pipeline.append({'$match': spec['partialFilterExpression']})
+        if spec.get('sparse'):
+            pipeline.append({'$match': {'$or': [{campo: {'$exists': True}} for campo, _ in campos]}})
+        pipeline += [
+            {'$group': {
+                '_id': {campo: f'${campo}' for campo, _ in campos},
+                'ids': {'$push': '$_id'},
+                'cantidad': {'$sum': 1},
+            }},
+            {'$match': {'cantidad': {'$gt': 1}}},
+            {'$limit': limite},
+        ]
+        return list(coleccion.aggregate(pipeline, allowDiskUse=True))
+
+    def _reportar_duplicados(self, documento, campos, duplicados):
+        nombres = ', '.join(campo for campo, _ in campos)
+        lineas = [f'{documento.__name__}: hay documentos duplicados para ({nombres}):']
+        for grupo in duplicados:
+            ids = ', '.join(str(i) for i in grupo['ids'])
+            lineas.append(f'  {grupo["_id"]} -> {grupo["cantidad"]} documentos [{ids}]')
+        lineas.append('  Elimine los duplicados (ver delete_duplicates.py) y vuelva a ejecutar el comando.')
+        return '\n'.join(lineas)
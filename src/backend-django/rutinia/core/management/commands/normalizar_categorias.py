@@ -0,0 +1,77 @@
+"""
+Completa nombre_normalizado en las categorías existentes y unifica las que
+tienen el mismo nombre con distintas mayúsculas o acentos ("Salud" y
+"salud"), que el índice único de nombre_normalizado ya no admite.
+
+Uso:
+    python manage.py normalizar_categorias            # actualiza las categorías
+    python manage.py normalizar_categorias --dry-run  # solo reporta los cambios
+
+De cada grupo de duplicadas se conserva la más antigua; los hábitos que
+apuntaban a las demás pasan a apuntar a ella y las demás se borran. Se
+puede ejecutar varias veces.
+"""
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from core.busqueda import normalizar
+from core.models import Categoria, Habito
+from core.referencias import categorias
+
+
+class Command(BaseCommand):
+    help = 'Normaliza los nombres de las categorías existentes y unifica las duplicadas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo reporta los cambios, sin escribir',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        coleccion = Categoria._get_collection()
+        existentes = list(coleccion.find({}, projection={'nombre': 1, 'nombre_normalizado': 1}).sort('_id', 1))
+
+        por_nombre = defaultdict(list)
+        for categoria in existentes:
+            por_nombre[normalizar(categoria.get('nombre'))].append(categoria)
+
+        operaciones = []
+        duplicadas = {}
+        for nombre, grupo in por_nombre.items():
+            conservada = grupo[0]
+            if conservada.get('nombre_normalizado') != nombre:
+                operaciones.append(UpdateOne({'_id': conservada['_id']}, {'$set': {'nombre_normalizado': nombre}}))
+            for categoria in grupo[1:]:
+                duplicadas[categoria['_id']] = conservada['_id']
+
+        for categoria_id, conservada_id in duplicadas.items():
+            self.stdout.write(f'  {categoria_id} se unifica con {conservada_id}')
+
+        if not dry_run:
+            # Las duplicadas se borran antes de completar los nombres normalizados,
+            # así el índice único (si ya existe) no rechaza la actualización
+            if duplicadas:
+                hacia = defaultdict(list)
+                for categoria_id, conservada_id in duplicadas.items():
+                    hacia[conservada_id].append(categoria_id)
+                for conservada_id, categoria_ids in hacia.items():
+                    Habito._get_collection().update_many(
+                        {'categoria': {'$in': categoria_ids}}, {'$set': {'categoria': conservada_id}}
+                    )
+                coleccion.delete_many({'_id': {'$in': list(duplicadas)}})
+            if operaciones:
+                coleccion.bulk_write(operaciones, ordered=False)
+            if duplicadas or operaciones:
+                categorias.invalidar()
+
+        accion = 'cambiarían' if dry_run else 'actualizadas'
+        unificadas = 'se unificarían' if dry_run else 'unificadas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(existentes)} categorías revisadas, {len(operaciones)} {accion}, '
+            f'{len(duplicadas)} duplicadas {unificadas}'
+        ))
@@ -0,0 +1,86 @@
+"""
+Pasa a minúsculas el correo de los usuarios existentes y completa
+nombre_normalizado y apellido_normalizado.
+
+Uso:
+    python manage.py normalizar_usuarios            # actualiza los usuarios
+    python manage.py normalizar_usuarios --dry-run  # solo cuenta cuántos cambian
+
+Si dos cuentas tienen el mismo correo con distintas mayúsculas
+(Ana@x.com y ana@x.com) no se modifica el correo de ninguna: pasarlas a
+minúsculas violaría el índice único. El comando las lista como advertencia
+para que se resuelvan a mano. Se puede ejecutar varias veces.
+"""
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from pymongo import UpdateOne
+
+from core.busqueda import normalizar, normalizar_correo
+from core.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Normaliza el correo y los nombres de los usuarios existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo reporta cuántos usuarios cambiarían, sin escribir',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Cantidad de actualizaciones por bulk_write (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        coleccion = Usuario._get_collection()
+        proyeccion = {'correo': 1}
+        for campo, normalizado in Usuario.CAMPOS_NORMALIZADOS.items():
+            proyeccion[campo] = proyeccion[normalizado] = 1
+        usuarios = list(coleccion.find({}, projection=proyeccion))
+
+        por_correo = defaultdict(list)
+        for usuario in usuarios:
+            if usuario.get('correo'):
+                por_correo[normalizar_correo(usuario['correo'])].append(usuario)
+        duplicados = {correo: grupo for correo, grupo in por_correo.items() if len(grupo) > 1}
+
+        actualizados = 0
+        operaciones = []
+        for usuario in usuarios:
+            cambios = {}
+            correo = normalizar_correo(usuario.get('correo'))
+            if correo is not None and correo != usuario['correo'] and correo not in duplicados:
+                cambios['correo'] = correo
+            for campo, normalizado in Usuario.CAMPOS_NORMALIZADOS.items():
+                valor = normalizar(usuario.get(campo))
+                if usuario.get(normalizado) != valor:
+                    cambios[normalizado] = valor
+            if not cambios:
+                continue
+
+            actualizados += 1
+            operaciones.append(UpdateOne({'_id': usuario['_id']}, {'$set': cambios}))
+            if len(operaciones) >= options['lote']:
+                if not dry_run:
+                    coleccion.bulk_write(operaciones, ordered=False)
+                operaciones = []
+
+        if operaciones and not dry_run:
+            coleccion.bulk_write(operaciones, ordered=False)
+
+        accion = 'cambiarían' if dry_run else 'actualizados'
+        self.stdout.write(self.style.SUCCESS(f'{len(usuarios)} usuarios revisados, {actualizados} {accion}'))
+
+        if duplicados:
+            lineas = ['Hay cuentas con el mismo correo en distintas mayúsculas (no se modificaron):']
+            for correo, grupo in duplicados.items():
+                ids = ', '.join(f"{u['_id']} ({u['correo']})" for u in grupo)
+                lineas.append(f'  {correo}: {ids}')
+            lineas.append('  Unifique o cambie esas cuentas y vuelva a ejecutar el comando.')
+            self.stderr.write(self.style.WARNING('\n'.join(lineas)))
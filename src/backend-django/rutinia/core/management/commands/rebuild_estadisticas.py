@@ -0,0 +1,60 @@
+"""
+Recalcula desde cero EstadisticaHabito a partir de los registros.
+
+Uso:
+    python manage.py rebuild_estadisticas                  # todos los hábitos
+    python manage.py rebuild_estadisticas --usuario <id>   # solo los de un usuario
+    python manage.py rebuild_estadisticas --lote 200
+
+Procesa los hábitos por lotes: una consulta de registros completados y un
+bulk_write de estadísticas por lote, sin cargar toda la colección en memoria.
+Se puede ejecutar con la aplicación funcionando; las actualizaciones
+incrementales siguen aplicándose sobre el resultado.
+"""
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.core.management.base import BaseCommand, CommandError
+
+from core.estadisticas import CAMPOS_HABITO, recalcular_estadisticas
+from core.models import Habito
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las rachas y totales de EstadisticaHabito desde RegistroHabito'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            help='ID del usuario cuyos hábitos se recalculan (por defecto, todos)',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=500,
+            help='Cantidad de hábitos por lote (por defecto 500)',
+        )
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        if lote < 1:
+            raise CommandError('--lote debe ser mayor que 0')
+
+        habitos = Habito.objects.only(*CAMPOS_HABITO).order_by('id')
+        if options['usuario']:
+            try:
+                habitos = habitos.filter(usuario=ObjectId(options['usuario']))
+            except InvalidId:
+                raise CommandError(f"ID de usuario inválido: {options['usuario']}")
+
+        total = 0
+        pendientes = []
+        for habito in habitos.no_cache():
+            pendientes.append(habito)
+            if len(pendientes) >= lote:
+                total += recalcular_estadisticas(pendientes)
+                self.stdout.write(f'  {total} hábitos procesados')
+                pendientes = []
+        if pendientes:
+            total += recalcular_estadisticas(pendientes)
+
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas recalculadas para {total} hábitos'))
@@ -0,0 +1,74 @@
+"""
+Proceso que genera los recordatorios de hábitos en HistorialNotificacion.
+
+Uso:
+    python manage.py recordatorios             # proceso continuo (worker)
+    python manage.py recordatorios --una-vez   # genera los vencidos y termina (cron)
+
+Carga los recordatorios de los próximos `--horizonte` minutos en un heap y
+duerme hasta el siguiente; cada `--recarga` minutos vuelve a leer la
+ventana para tomar los hábitos creados o editados. Al arrancar recupera
+los recordatorios de los últimos `--atraso` minutos; los que ya se habían
+generado no se repiten.
+"""
+import time as reloj
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.recordatorios import zona_horaria, recordatorios_entre, vencidos, materializar
+
+
+class Command(BaseCommand):
+    help = 'Genera en el servidor los recordatorios de hábitos a su hora'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Genera los recordatorios vencidos y termina')
+        parser.add_argument('--atraso', type=int, default=10,
+                            help='Minutos hacia atrás que se recuperan al arrancar (por defecto 10)')
+        parser.add_argument('--horizonte', type=int, default=60,
+                            help='Minutos hacia adelante que se cargan en memoria (por defecto 60)')
+        parser.add_argument('--recarga', type=int, default=5,
+                            help='Cada cuántos minutos se vuelve a leer la ventana (por defecto 5)')
+
+    def handle(self, *args, **options):
+        if min(options['horizonte'], options['recarga']) < 1 or options['atraso'] < 0:
+            raise CommandError('--horizonte y --recarga deben ser mayores que 0 y --atraso no negativo')
+
+        zona = zona_horaria()
+        # Todo lo anterior a `procesado_hasta` ya se generó
+        procesado_hasta = self._minuto(datetime.now(zona)) - timedelta(minutes=options['atraso'])
+
+        if options['una_vez']:
+            ahora = datetime.now(zona)
+            heap = recordatorios_entre(procesado_hasta, self._minuto(ahora) + timedelta(minutes=1))
+            self._generar(vencidos(heap, ahora))
+            return
+
+        self.stdout.write(f'Programador de recordatorios iniciado ({zona.key})')
+        heap, proxima_recarga = [], None
+        while True:
+            ahora = datetime.now(zona)
+            if proxima_recarga is None or ahora >= proxima_recarga:
+                heap = recordatorios_entre(procesado_hasta, self._minuto(ahora) + timedelta(minutes=options['horizonte']))
+                proxima_recarga = ahora + timedelta(minutes=options['recarga'])
+
+            self._generar(vencidos(heap, ahora))
+            procesado_hasta = self._minuto(ahora) + timedelta(minutes=1)
+
+            siguiente = min(heap[0][0], proxima_recarga) if heap else proxima_recarga
+            reloj.sleep(max(1.0, min(60.0, (siguiente - datetime.now(zona)).total_seconds())))
+
+    @staticmethod
+    def _minuto(momento):
+        return momento.replace(second=0, microsecond=0)
+
+    def _generar(self, recordatorios):
+        if not recordatorios:
+            return
+        insertados = materializar(recordatorios)
+        self.stdout.write(
+            f'{datetime.now(zona_horaria()):%Y-%m-%d %H:%M} '
+            f'{len(insertados)} recordatorios generados ({len(recordatorios) - len(insertados)} ya existían)'
+        )
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 # Create your models here.
@@ -5,6 +6,9 @@ from mongoengine import (
     Document, EmbeddedDocument, fields, CASCADE, NULLIFY
 )
 
+from .busqueda import normalizar, normalizar_correo
+from .programacion import FRECUENCIAS, calcular_programacion, minuto_del_dia
+
 
 # --- Rol ---
 class Rol(Document):
@@ -21,18 +25,61 @@ class Usuario(Document):
     clave = fields.StringField(max_length=100)
     tema = fields.StringField(max_length=20)
     rol = fields.ReferenceField(Rol)
+    # Copias en minúsculas y sin acentos para filtrar por prefijo (ver core/busqueda.py)
+    nombre_normalizado = fields.StringField()
+    apellido_normalizado = fields.StringField()
+
+    meta = {
+        # Los índices se crean con `python manage.py ensure_indexes`
+        'auto_create_index': False,
+        'indexes': [
+            'rol',
+            'nombre_normalizado',
+            'apellido_normalizado',
+        ],
+    }
+
+    # Campo original -> copia normalizada
+    CAMPOS_NORMALIZADOS = {
+        'nombre': 'nombre_normalizado',
+        'apellido': 'apellido_normalizado',
+    }
 
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
 
+    def clean(self):
+        # El correo se guarda en minúsculas: el índice único impide variantes
+        # de mayúsculas y el login lo busca por igualdad
+        if self.correo:
+            self.correo = normalizar_correo(self.correo)
+        for campo, normalizado in self.CAMPOS_NORMALIZADOS.items():
+            if self.pk is None or campo in self._changed_fields:
+                setattr(self, normalizado, normalizar(getattr(self, campo)))
+
 # --- Categoría ---
 class Categoria(Document):
     nombre = fields.StringField(max_length=50)
+    # Nombre en minúsculas y sin acentos: clave única del get-or-create por
+    # nombre (ver core/referencias.py)
+    nombre_normalizado = fields.StringField()
+
+    meta = {
+        # Los índices se crean con `python manage.py ensure_indexes`
+        'auto_create_index': False,
+        'indexes': [
+            {'fields': ['nombre_normalizado'], 'unique': True, 'sparse': True},
+        ],
+    }
+
+    def clean(self):
+        self.nombre_normalizado = normalizar(self.nombre)
 
 # --- Notificación (configuración de hora en hábito) ---
 class Notificacion(EmbeddedDocument):
     hora = fields.StringField(max_length=5)  # Formato: "HH:MM" (ej: "09:00", "14:30")
     activa = fields.BooleanField(default=True)
+    minuto = fields.IntField(null=True)  # `hora` en minutos desde medianoche (ver Habito.clean)
 
 # --- Hábito ---
 class Habito(Document):
@@ -50,6 +97,56 @@ class Habito(Document):
     notificaciones = fields.EmbeddedDocumentListField(Notificacion)
     icono = fields.StringField(max_length=50)
     color = fields.StringField(max_length=20)
+    # Programación normalizada a partir de tipo_frecuencia y dias (ver clean)
+    frecuencia = fields.StringField(choices=FRECUENCIAS, null=True)
+    mascara_semana = fields.IntField(default=0)  # bit 0 = lunes ... bit 6 = domingo
+    mascara_mes = fields.IntField(default=0)     # bit d = día d del mes
+    # Copias en minúsculas y sin acentos para filtrar por igualdad o prefijo (ver core/busqueda.py)
+    nombre_normalizado = fields.StringField()
+    dificultad_normalizada = fields.StringField()
+    tipo_frecuencia_normalizado = fields.StringField()
+
+    meta = {
+        'auto_create_index': False,
+        'indexes': [
+            # Habito.objects.filter(usuario=...), filtros por activo y los
+            # hábitos que aplican en una fecha (las máscaras se evalúan en el índice)
+            {'fields': ['usuario', 'activo', 'frecuencia', 'mascara_semana', 'mascara_mes']},
+            'categoria',
+            # Recordatorios que vencen en un rango de minutos (core/recordatorios.py)
+            'notificaciones.minuto',
+            # Búsqueda ?q= por relevancia (nombre pesa más que la descripción)
+            {
+                'fields': ['$nombre', '$descripcion'],
+                'default_language': 'spanish',
+                'weights': {'nombre': 3, 'descripcion': 1},
+            },
+            # Filtros por prefijo sobre los campos normalizados
+            {'fields': ['usuario', 'nombre_normalizado']},
+            'dificultad_normalizada',
+            'tipo_frecuencia_normalizado',
+        ],
+    }
+
+    # Campo original -> copia normalizada
+    CAMPOS_NORMALIZADOS = {
+        'nombre': 'nombre_normalizado',
+        'dificultad': 'dificultad_normalizada',
+        'tipo_frecuencia': 'tipo_frecuencia_normalizado',
+    }
+
+    def clean(self):
+        # Se recalcula al crear o al cambiar la frecuencia/días; un documento
+        # cargado con only() sin esos campos no los pisa
+        if self.pk is None or {'tipo_frecuencia', 'dias'} & set(self._changed_fields):
+            self.frecuencia, self.mascara_semana, self.mascara_mes = calcular_programacion(
+                self.tipo_frecuencia, self.dias
+            )
+        for notificacion in self.notificaciones or []:
+            notificacion.minuto = minuto_del_dia(notificacion.hora)
+        for campo, normalizado in self.CAMPOS_NORMALIZADOS.items():
+            if self.pk is None or campo in self._changed_fields:
+                setattr(self, normalizado, normalizar(getattr(self, campo)))
 
 
 # --- Registro de Hábito ---
@@ -58,6 +155,33 @@ class RegistroHabito(Document):
     fecha = fields.DateField()
     estado = fields.BooleanField()
 
+    meta = {
+        'auto_create_index': False,
+        'indexes': [
+            # Un solo registro por hábito y día; también sirve los rangos de fecha
+            {'fields': ['habito', 'fecha'], 'unique': True},
+        ],
+    }
+
+
+# --- Estadísticas de Hábito (rachas y completados, mantenidas en cada cambio) ---
+class EstadisticaHabito(Document):
+    habito = fields.ReferenceField(Habito, reverse_delete_rule=CASCADE, unique=True)
+    total_completados = fields.IntField(default=0)
+    ultima_completada = fields.DateField()
+    # Racha más reciente: días programados consecutivos completados entre inicio y fin
+    racha_actual = fields.IntField(default=0)
+    inicio_racha = fields.DateField()
+    fin_racha = fields.DateField()
+    racha_maxima = fields.IntField(default=0)
+    # Días completados dentro de la ventana reciente (para la tasa de 30 días)
+    recientes = fields.ListField(fields.DateField())
+    actualizado = fields.DateTimeField()
+
+    meta = {
+        'auto_create_index': False,
+    }
+
 
 class ToolInput(EmbeddedDocument):
     name = fields.StringField(required=True)
@@ -71,6 +195,29 @@ class Tool(Document):
 
 
 
+def _indices_retencion():
+    """
+    Índices para la retención de notificaciones (ver NOTIFICACIONES_RETENCION_*):
+    leídas por fecha_lectura y no leídas por fecha_hora. En modo 'ttl' son
+    índices TTL; en modo 'archivo' los usa `manage.py archivar_notificaciones`.
+    """
+    modo = getattr(settings, 'NOTIFICACIONES_RETENCION_MODO', '')
+    if modo not in ('ttl', 'archivo'):
+        return []
+    indices = []
+    for campo, leida, dias in (
+        ('fecha_lectura', True, getattr(settings, 'NOTIFICACIONES_RETENCION_LEIDAS_DIAS', 0)),
+        ('fecha_hora', False, getattr(settings, 'NOTIFICACIONES_RETENCION_NO_LEIDAS_DIAS', 0)),
+    ):
+        if dias <= 0:
+            continue
+        indice = {'fields': [campo], 'partialFilterExpression': {'leida': leida}}
+        if modo == 'ttl':
+            indice['expireAfterSeconds'] = dias * 24 * 60 * 60
+        indices.append(indice)
+    return indices
+
+
 # --- Historial de Notificaciones (notificaciones enviadas) ---
 class HistorialNotificacion(Document):
     usuario = fields.ReferenceField(Usuario, reverse_delete_rule=CASCADE)
@@ -79,4 +226,63 @@ class HistorialNotificacion(Document):
     mensaje = fields.StringField(max_length=200)
     fecha_hora = fields.DateTimeField()
     leida = fields.BooleanField(default=False)
-    fecha_lectura = fields.DateTimeField(required=False)
\ No newline at end of file
+    fecha_lectura = fields.DateTimeField(required=False)
+    # Recordatorio que la generó (solo las creadas por `manage.py recordatorios`)
+    fecha_recordatorio = fields.DateField(required=False)
+    hora = fields.StringField(max_length=5, required=False)
+
+    meta = {
+        'auto_create_index': False,
+        'indexes': [
+            # Listado del historial ordenado por fecha
+            {'fields': ['usuario', '-fecha_hora']},
+            # Notificaciones no leídas ordenadas por fecha
+            {'fields': ['usuario', 'leida', '-fecha_hora']},
+            # Un solo recordatorio por (hábito, fecha, hora)
+            {
+                'fields': ['habito', 'fecha_recordatorio', 'hora'],
+                'unique': True,
+                'partialFilterExpression': {'hora': {'$exists': True}},
+            },
+        ] + _indices_retencion(),
+    }
+
+
+# --- Versión de los datos de cada usuario (ETag de los listados, ver core/versiones.py) ---
+class VersionDatos(Document):
+    usuario = fields.ObjectIdField(primary_key=True)
+    version = fields.IntField(default=0)
+
+    meta = {
+        'auto_create_index': False,
+    }
+
+
+# --- Versión de las colecciones de referencia (Categoria, Rol, Tool; ver core/referencias.py) ---
+class VersionColeccion(Document):
+    coleccion = fields.StringField(primary_key=True)
+    version = fields.IntField(default=0)
+
+    meta = {
+        'auto_create_index': False,
+    }
+
+
+# --- Notificaciones archivadas por `manage.py archivar_notificaciones` ---
+class HistorialNotificacionArchivada(Document):
+    """
+    Mismo documento que HistorialNotificacion (con el mismo _id) más la fecha
+    en que se archivó. Solo se declaran los campos que se consultan.
+    """
+    usuario = fields.ObjectIdField()
+    fecha_hora = fields.DateTimeField()
+    fecha_archivo = fields.DateTimeField()
+
+    meta = {
+        'collection': 'historial_notificacion_archivada',
+        'strict': False,
+        'auto_create_index': False,
+        'indexes': [
+            {'fields': ['usuario', '-fecha_hora']},
+        ],
+    }
@@ -1,7 +1,162 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+from collections import OrderedDict
+
+from bson import json_util
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
 
 class HabitoPagination(PageNumberPagination):
     page_size = 20 #Este atributo me indica el numero de habitos que voy a obtener por pagina
     page_size_query_param = 'page_size' #Con este atributo puedo cambiar la cantidad de habitos que veo en lugar de los por defecto 
     page_query_param = 'page' #en la url puedo pasar a otra pagina por ejemplo ?page_size=2
-    max_page_size = 50
\ No newline at end of file
+    max_page_size = 50
+
+
+class CursorPaginacion(BasePagination):
+    """
+    Paginación por cursor (keyset) para querysets de MongoEngine.
+
+    En lugar de skip() (que recorre todos los documentos anteriores) cada
+    página continúa desde los valores de orden del último documento:
+    _id por defecto, o (campo, _id) si la vista define otro orden, por
+    ejemplo (fecha_hora, _id) en las notificaciones. Los cursores next y
+    previous son opacos (base64).
+
+    Query params: ?page_size=N y ?cursor=<cursor devuelto en next/previous>.
+    Con PAGINACION_COMPATIBLE = True, las peticiones que no envían ninguno de
+    los dos reciben la lista completa, como antes.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def pagina_solicitada(self, request):
+        """False si la petición recibe la lista completa (ver PAGINACION_COMPATIBLE)"""
+        params = request.query_params
+        return not (getattr(settings, 'PAGINACION_COMPATIBLE', True)
+                    and self.cursor_query_param not in params
+                    and self.page_size_query_param not in params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        params = request.query_params
+
+        if not self.pagina_solicitada(request):
+            return None
+
+        self.page_size = self._tamano_pagina(params)
+        self.orden = self._orden(view, params)
+        modelo = queryset._document
+
+        cursor = self._decodificar(params.get(self.cursor_query_param))
+        hacia_atras = cursor is not None and cursor.get('d') == 'p'
+        orden = [(campo, -direccion) for campo, direccion in self.orden] if hacia_atras else self.orden
+
+        if cursor is not None:
+            queryset = queryset.filter(__raw__=self._filtro_keyset(orden, cursor['v']))
+        queryset = queryset.order_by(*[('-' if d < 0 else '') + campo for campo, d in orden])
+
+        documentos = list(queryset.limit(self.page_size + 1))
+        hay_mas = len(documentos) > self.page_size
+        documentos = documentos[:self.page_size]
+        if hacia_atras:
+            documentos.reverse()
+
+        self.cursor_siguiente = None
+        self.cursor_anterior = None
+        if documentos:
+            primero = self._valores(modelo, documentos[0])
+            ultimo = self._valores(modelo, documentos[-1])
+            if hacia_atras:
+                self.cursor_siguiente = {'d': 'n', 'v': ultimo}
+                self.cursor_anterior = {'d': 'p', 'v': primero} if hay_mas else None
+            else:
+                self.cursor_siguiente = {'d': 'n', 'v': ultimo} if hay_mas else None
+                self.cursor_anterior = {'d': 'p', 'v': primero} if cursor is not None else None
+
+        return documentos
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self._enlace(self.cursor_siguiente)),
+            ('previous', self._enlace(self.cursor_anterior)),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def _tamano_pagina(self, params):
+        tamano = getattr(settings, 'PAGINACION_TAMANO', 50)
+        maximo = getattr(settings, 'PAGINACION_TAMANO_MAXIMO', 200)
+        try:
+            tamano = int(params.get(self.page_size_query_param, tamano))
+        except (TypeError, ValueError):
+            pass
+        return max(1, min(tamano, maximo))
+
+    def _orden(self, view, params):
+        """
+        [(campo, dirección)] terminando siempre en id para que el orden sea total.
+        Usa ?ordering= si el campo está en `campos_ordenables` de la vista.
+        """
+        ordering = params.get('ordering')
+        if ordering and ordering.lstrip('-') in getattr(view, 'campos_ordenables', ()):
+            direccion = -1 if ordering.startswith('-') else 1
+            return [(ordering.lstrip('-'), direccion), ('id', direccion)]
+        return list(getattr(view, 'orden_paginacion', [('id', 1)]))
+
+    def _valores(self, modelo, documento):
+        return [
+            modelo._fields[campo].to_mongo(documento._data.get(campo))
+            if documento._data.get(campo) is not None else None
+            for campo, _ in self.orden
+        ]
+
+    def _filtro_keyset(self, orden, valores):
+        """Documentos que van después de `valores` en `orden` (los nulos van primero en orden ascendente)"""
+        condiciones = []
+        iguales = {}
+        for (campo, direccion), valor in zip(orden, valores):
+            campo_db = '_id' if campo == 'id' else campo
+            if valor is None:
+                if direccion > 0:
+                    condiciones.append({**iguales, campo_db: {'$ne': None}})
+            else:
+                condiciones.append({**iguales, campo_db: {'$gt' if direccion > 0 else '$lt': valor}})
+                if direccion < 0:
+                    condiciones.append({**iguales, campo_db: None})
+            iguales[campo_db] = valor
+        return {'$or': condiciones} if condiciones else {'_id': {'$exists': False}}
+
+    def _codificar(self, cursor):
+        return base64.urlsafe_b64encode(json_util.dumps(cursor).encode()).decode()
+
+    def _decodificar(self, cursor):
+        if not cursor:
+            return None
+        try:
+            datos = json_util.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if datos.get('d') not in ('n', 'p') or len(datos['v']) != len(self.orden):
+                raise ValueError
+            return datos
+        except Exception:
+            raise NotFound('Cursor inválido')
+
+    def _enlace(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.cursor_query_param, self._codificar(cursor))
+        return replace_query_param(url, self.page_size_query_param, self.page_size)
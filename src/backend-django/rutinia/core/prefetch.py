@@ -0,0 +1,91 @@
+"""
+Carga por lotes de referencias (estilo select_related) y serialización
+rápida para los listados.
+
+Al serializar una lista, cada acceso a un ReferenceField (registro.habito,
+habito.categoria, usuario.rol, ...) hace una consulta a MongoDB por fila.
+Aquí se juntan los ids referenciados de toda la página, se trae cada
+colección una sola vez con $in y se dejan los documentos ya cargados en
+cada instancia, de modo que el serializer no vuelve a consultar.
+"""
+from bson import DBRef
+from django.conf import settings
+
+from .serializers import EXTRACTORES_RAPIDOS, ListaRapida
+
+
+def prefetch_referencias(documentos, referencias):
+    """
+    `referencias` es un dict {campo: (campos a cargar del documento referenciado)}.
+    Hace una consulta por campo, sin importar cuántos documentos haya.
+    """
+    if not documentos or not referencias:
+        return documentos
+
+    modelo = type(documentos[0])
+
+    for campo, campos_referencia in referencias.items():
+        ids = {
+            valor.id
+            for valor in (documento._data.get(campo) for documento in documentos)
+            if isinstance(valor, DBRef)
+        }
+        if not ids:
+            continue
+
+        referenciado = modelo._fields[campo].document_type
+        cargados = {
+            documento.pk: documento
+            for documento in referenciado.objects(pk__in=list(ids)).only(*campos_referencia)
+        }
+
+        for documento in documentos:
+            valor = documento._data.get(campo)
+            if isinstance(valor, DBRef) and valor.id in cargados:
+                documento._data[campo] = cargados[valor.id]
+
+    return documentos
+
+
+class PrefetchReferenciasMixin:
+    """
+    Mixin para los ViewSets: antes de serializar una lista (many=True)
+    precarga las referencias declaradas en `prefetch_referencias`.
+    """
+    prefetch_referencias = {}
+
+    def get_serializer(self, *args, **kwargs):
+        if kwargs.get('many') and args and self.prefetch_referencias:
+            documentos = prefetch_referencias(list(args[0]), self.prefetch_referencias)
+            args = (documentos,) + args[1:]
+        return super().get_serializer(*args, **kwargs)
+
+
+class SerializacionRapidaMixin:
+    """
+    Mixin para los ViewSets de listados grandes: al leer una lista usa el
+    extractor precompilado del modelo (ver EXTRACTORES_RAPIDOS) en lugar del
+    DocumentSerializer. Se desactiva con SERIALIZACION_RAPIDA = False.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        extractor = EXTRACTORES_RAPIDOS.get(getattr(self, 'modelo_rapido', None))
+        usar_rapida = (
+            extractor is not None
+            and getattr(settings, 'SERIALIZACION_RAPIDA', False)
+            and kwargs.get('many')
+            and args
+            and 'data' not in kwargs
+        )
+        if not usar_rapida:
+            return super().get_serializer(*args, **kwargs)
+
+        # Las referencias de las que solo se usa el id no se cargan: el
+        # extractor lo lee del DBRef guardado en el documento
+        referencias = {
+            campo: campos
+            for campo, campos in getattr(self, 'prefetch_referencias', {}).items()
+            if tuple(campos) != ('id',)
+        }
+        documentos = prefetch_referencias(list(args[0]), referencias)
+        return ListaRapida(documentos, extractor)
@@ -0,0 +1,99 @@
+"""
+Programación normalizada de los hábitos.
+
+`Habito.dias` mezcla nombres de días ('Lunes', 'lun', ...) y días del mes
+(enteros o texto), y `tipo_frecuencia` llega como 'Diario', 'diaria', ...
+Al guardar, cada hábito guarda además una frecuencia normalizada y dos
+máscaras de bits; con ellas se sabe si aplica en una fecha sin volver a
+interpretar `dias`, y MongoDB puede responderlo con una sola consulta
+(ver `filtro_aplica_en`). De la misma forma, cada recordatorio guarda su
+hora como minuto del día para que el programador de recordatorios los
+busque por rango.
+"""
+DIARIA = 'diaria'
+SEMANAL = 'semanal'
+MENSUAL = 'mensual'
+FRECUENCIAS = (DIARIA, SEMANAL, MENSUAL)
+
+_ALIAS_FRECUENCIA = {
+    'diario': DIARIA, 'diaria': DIARIA,
+    'semanal': SEMANAL,
+    'mensual': MENSUAL,
+}
+
+# Nombres de días aceptados en Habito.dias -> date.weekday()
+DIAS_SEMANA = {
+    'lunes': 0, 'lun': 0,
+    'martes': 1, 'mar': 1,
+    'miercoles': 2, 'miércoles': 2, 'mie': 2, 'mié': 2,
+    'jueves': 3, 'jue': 3,
+    'viernes': 4, 'vie': 4,
+    'sabado': 5, 'sábado': 5, 'sab': 5, 'sáb': 5,
+    'domingo': 6, 'dom': 6,
+}
+
+
+def normalizar_frecuencia(tipo_frecuencia):
+    """'Diario', 'diaria', 'Semanal', ... -> una de FRECUENCIAS (o None)"""
+    return _ALIAS_FRECUENCIA.get((tipo_frecuencia or '').strip().lower())
+
+
+def mascara_semana(dias):
+    """Bit d encendido si el día de la semana d (0 = lunes) está en `dias`"""
+    mascara = 0
+    for dia in dias or []:
+        if isinstance(dia, str) and dia.strip().lower() in DIAS_SEMANA:
+            mascara |= 1 << DIAS_SEMANA[dia.strip().lower()]
+    return mascara
+
+
+def mascara_mes(dias):
+    """Bit d encendido si el día del mes d (1-31) está en `dias`"""
+    mascara = 0
+    for dia in dias or []:
+        if isinstance(dia, str) and dia.strip().isdigit():
+            dia = int(dia)
+        if isinstance(dia, int) and not isinstance(dia, bool) and 1 <= dia <= 31:
+            mascara |= 1 << dia
+    return mascara
+
+
+def calcular_programacion(tipo_frecuencia, dias):
+    """Devuelve (frecuencia, mascara_semana, mascara_mes)"""
+    return normalizar_frecuencia(tipo_frecuencia), mascara_semana(dias), mascara_mes(dias)
+
+
+def programacion(habito):
+    """
+    (frecuencia, mascara_semana, mascara_mes) del hábito: los campos guardados
+    o, si el documento todavía no los tiene (o no se cargaron), calculados
+    a partir de tipo_frecuencia y dias.
+    """
+    if getattr(habito, 'frecuencia', None):
+        return habito.frecuencia, habito.mascara_semana or 0, habito.mascara_mes or 0
+    return calcular_programacion(habito.tipo_frecuencia, habito.dias)
+
+
+def bits(mascara):
+    """Posiciones de los bits encendidos de `mascara`"""
+    return {i for i in range(mascara.bit_length()) if mascara >> i & 1}
+
+
+def minuto_del_dia(hora):
+    """'HH:MM' -> minutos desde medianoche (None si la hora no es válida)"""
+    try:
+        horas, minutos = (int(parte) for parte in (hora or '').strip().split(':'))
+    except ValueError:
+        return None
+    if 0 <= horas < 24 and 0 <= minutos < 60:
+        return horas * 60 + minutos
+    return None
+
+
+def filtro_aplica_en(fecha):
+    """Filtro de MongoDB para los hábitos que aplican en `fecha`"""
+    return {'$or': [
+        {'frecuencia': DIARIA},
+        {'frecuencia': SEMANAL, 'mascara_semana': {'$bitsAllSet': 1 << fecha.weekday()}},
+        {'frecuencia': MENSUAL, 'mascara_mes': {'$bitsAllSet': 1 << fecha.day}},
+    ]}
@@ -0,0 +1,286 @@
+"""
+Cálculo del progreso de los hábitos.
+
+Reúne las reglas de frecuencia (diaria/semanal/mensual, ver
+core/programacion.py) y el conteo de
+registros completados. `calcular_progreso` obtiene completados y esperados
+de uno o varios hábitos para cualquier rango de fechas con una sola
+agregación ($match/$group) sobre RegistroHabito.
+"""
+import base64
+import calendar
+from datetime import date, datetime, time, timedelta
+
+from .models import RegistroHabito
+from .programacion import DIARIA, SEMANAL, MENSUAL, bits, programacion
+
+
+def rango_semana(hoy):
+    """Devuelve (lunes, domingo) de la semana que contiene `hoy`"""
+    inicio_semana = hoy - timedelta(days=hoy.weekday())
+    fin_semana = inicio_semana + timedelta(days=6)
+    return inicio_semana, fin_semana
+
+
+def rango_mes(hoy):
+    """Devuelve (primer día, último día) del mes que contiene `hoy`"""
+    _, ultimo_dia = calendar.monthrange(hoy.year, hoy.month)
+    return hoy.replace(day=1), hoy.replace(day=ultimo_dia)
+
+
+def rango_trimestre(hoy):
+    """Devuelve (primer día, último día) del trimestre que contiene `hoy`"""
+    mes_inicio = 3 * ((hoy.month - 1) // 3) + 1
+    _, ultimo_dia = calendar.monthrange(hoy.year, mes_inicio + 2)
+    return date(hoy.year, mes_inicio, 1), date(hoy.year, mes_inicio + 2, ultimo_dia)
+
+
+RANGOS = {
+    'semana': rango_semana,
+    'mes': rango_mes,
+    'trimestre': rango_trimestre,
+}
+
+
+def rango_periodo(periodo, ancla):
+    """Rango (desde, hasta) del periodo ('semana', 'mes', 'trimestre') que contiene `ancla`"""
+    if periodo not in RANGOS:
+        raise ValueError(f"Periodo inválido: {periodo}")
+    return RANGOS[periodo](ancla)
+
+
+def dias_semana(habito):
+    """Conjunto de días de la semana (0 = lunes) configurados en el hábito"""
+    return bits(programacion(habito)[1])
+
+
+def dias_mes(habito):
+    """Conjunto de días del mes (1-31) configurados en el hábito"""
+    return bits(programacion(habito)[2])
+
+
+def aplica_en(habito, fecha):
+    """
+    Indica si el hábito debe cumplirse en `fecha` (misma regla que usa el
+    frontend para los hábitos del día).
+    """
+    frecuencia, semana, mes = programacion(habito)
+
+    if frecuencia == DIARIA:
+        return True
+    if frecuencia == SEMANAL:
+        return bool(semana >> fecha.weekday() & 1)
+    if frecuencia == MENSUAL:
+        return bool(mes >> fecha.day & 1)
+    return False
+
+
+def _frecuencia(habito):
+    return programacion(habito)[0]
+
+
+def total_semanal(habito, inicio_semana, fin_semana):
+    """Cantidad de veces que el hábito debería cumplirse en la semana"""
+    frecuencia = _frecuencia(habito)
+
+    if frecuencia == DIARIA:
+        return 7
+
+    if frecuencia == SEMANAL:
+        return len(dias_semana(habito))
+
+    if frecuencia == MENSUAL:
+        # Días configurados que caen en la semana
+        return total_rango(habito, inicio_semana, fin_semana)
+
+    return 0
+
+
+def total_mensual(habito, hoy):
+    """Cantidad de veces que el hábito debería cumplirse en el mes de `hoy`"""
+    frecuencia = _frecuencia(habito)
+    _, ultimo_dia = calendar.monthrange(hoy.year, hoy.month)
+
+    if frecuencia == DIARIA:
+        return ultimo_dia
+
+    if frecuencia == SEMANAL:
+        semanas_mes = calendar.monthcalendar(hoy.year, hoy.month)
+        return len(dias_semana(habito)) * len(semanas_mes)
+
+    if frecuencia == MENSUAL:
+        # Días configurados que son válidos para el mes
+        dias = dias_mes(habito)
+        if not dias:
+            return 1  # Fallback si no hay días configurados
+        return len([dia for dia in dias if dia <= ultimo_dia])
+
+    return 0
+
+
+def total_rango(habito, desde, hasta):
+    """
+    Cantidad de veces que el hábito debería cumplirse entre `desde` y `hasta`
+    (ambos incluidos), para cualquier rango de fechas.
+    """
+    if hasta < desde:
+        return 0
+
+    frecuencia = _frecuencia(habito)
+    dias_rango = (hasta - desde).days + 1
+
+    if frecuencia == DIARIA:
+        return dias_rango
+
+    if frecuencia == SEMANAL:
+        semana = dias_semana(habito)
+        semanas_completas, resto = divmod(dias_rango, 7)
+        total = semanas_completas * len(semana)
+        total += sum(1 for i in range(resto) if (desde.weekday() + i) % 7 in semana)
+        return total
+
+    if frecuencia == MENSUAL:
+        dias = dias_mes(habito)
+        total = 0
+        anio, mes = desde.year, desde.month
+        while (anio, mes) <= (hasta.year, hasta.month):
+            _, ultimo_dia = calendar.monthrange(anio, mes)
+            primero = desde.day if (anio, mes) == (desde.year, desde.month) else 1
+            ultimo = hasta.day if (anio, mes) == (hasta.year, hasta.month) else ultimo_dia
+            total += sum(1 for dia in dias if primero <= dia <= min(ultimo, ultimo_dia))
+            anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+        return total
+
+    return 0
+
+
+def porcentaje(completados, total):
+    return round(completados / total * 100, 2) if total > 0 else 0
+
+
+def completados_por_habito(habito_ids, rangos):
+    """
+    Cuenta los registros completados de cada hábito en varios rangos de fechas
+    con una sola agregación sobre RegistroHabito.
+
+    `rangos` es un dict {nombre: (desde, hasta)}. Devuelve
+    {habito_id: {nombre: completados}} (los hábitos sin registros no aparecen).
+    """
+    if not habito_ids or not rangos:
+        return {}
+
+    limites = {
+        nombre: (datetime.combine(desde, time.min), datetime.combine(hasta, time.min))
+        for nombre, (desde, hasta) in rangos.items()
+    }
+    desde = min(inicio for inicio, _ in limites.values())
+    hasta = max(fin for _, fin in limites.values())
+
+    grupo = {'_id': '$habito'}
+    for nombre, (inicio, fin) in limites.items():
+        grupo[nombre] = {'$sum': {'$cond': [
+            {'$and': [{'$gte': ['$fecha', inicio]}, {'$lte': ['$fecha', fin]}]}, 1, 0
+        ]}}
+
+    pipeline = [
+        {'$match': {
+            'habito': {'$in': list(habito_ids)},
+            'fecha': {'$gte': desde, '$lte': hasta},
+            'estado': True,
+        }},
+        {'$group': grupo},
+    ]
+
+    resultado = {}
+    for fila in RegistroHabito._get_collection().aggregate(pipeline):
+        habito_id = fila.pop('_id')
+        resultado[habito_id] = fila
+    return resultado
+
+
+def dias_completados(habito_ids, desde, hasta):
+    """
+    Días completados de cada hábito entre `desde` y `hasta`, como desplazamiento
+    en días desde `desde`, con una sola agregación.
+
+    Devuelve {habito_id: [desplazamientos]}.
+    """
+    if not habito_ids:
+        return {}
+
+    inicio = datetime.combine(desde, time.min)
+    pipeline = [
+        {'$match': {
+            'habito': {'$in': list(habito_ids)},
+            'fecha': {'$gte': inicio, '$lte': datetime.combine(hasta, time.min)},
+            'estado': True,
+        }},
+        # Las fechas se guardan a medianoche: la resta es un múltiplo exacto de un día
+        {'$group': {
+            '_id': '$habito',
+            'dias': {'$push': {'$divide': [{'$subtract': ['$fecha', inicio]}, 86400000]}},
+        }},
+    ]
+    return {
+        fila['_id']: [int(dia) for dia in fila['dias']]
+        for fila in RegistroHabito._get_collection().aggregate(pipeline)
+    }
+
+
+def bitset(indices, cantidad):
+    """
+    Codifica en base64 un conjunto de bits de largo `cantidad`: el bit i es el
+    bit (i % 8) del byte i // 8 (el menos significativo primero).
+    """
+    datos = bytearray((cantidad + 7) // 8)
+    for i in indices:
+        if 0 <= i < cantidad:
+            datos[i // 8] |= 1 << (i % 8)
+    return base64.b64encode(bytes(datos)).decode('ascii')
+
+
+def calendario(habitos, desde, hasta):
+    """
+    Mapa de bits por hábito de los días completados y de los días en que
+    aplica (ver `aplica_en`) entre `desde` y `hasta`.
+    """
+    cantidad = (hasta - desde).days + 1
+    fechas = [desde + timedelta(days=i) for i in range(cantidad)]
+    completados = dias_completados([h.id for h in habitos], desde, hasta)
+
+    return [
+        {
+            "habito_id": str(habito.id),
+            "completados": bitset(completados.get(habito.id, []), cantidad),
+            "programados": bitset([i for i, fecha in enumerate(fechas) if aplica_en(habito, fecha)], cantidad),
+        }
+        for habito in habitos
+    ]
+
+
+def calcular_progreso(habitos, desde, hasta, total=None):
+    """
+    Progreso de cada hábito entre `desde` y `hasta` (ambos incluidos).
+
+    Los completados salen de una sola agregación sobre RegistroHabito.
+    `total` es una función habito -> esperados; por defecto `total_rango`,
+    pero las acciones semanal y mensual pasan sus propias reglas.
+
+    Devuelve {habito_id: {"completados", "total", "progreso"}}.
+    """
+    if total is None:
+        def total(habito):
+            return total_rango(habito, desde, hasta)
+
+    conteos = completados_por_habito([h.id for h in habitos], {'rango': (desde, hasta)})
+
+    resultado = {}
+    for habito in habitos:
+        completados = conteos.get(habito.id, {}).get('rango', 0)
+        esperados = total(habito)
+        resultado[habito.id] = {
+            "completados": completados,
+            "total": esperados,
+            "progreso": porcentaje(completados, esperados),
+        }
+    return resultado
@@ -0,0 +1,134 @@
+"""
+Programador de recordatorios de hábitos (lado servidor).
+
+Cada Notificacion de un hábito guarda su hora como minuto del día
+(`notificaciones.minuto`, indexado), así que los recordatorios que vencen
+en una ventana de tiempo salen de una consulta por rango. Se ordenan en un
+heap por hora de disparo y, al vencer, se insertan en HistorialNotificacion
+con un upsert por (habito, fecha, hora): reiniciar el proceso o tener dos
+instancias no duplica recordatorios.
+
+Las horas se interpretan en RECORDATORIOS_ZONA_HORARIA.
+"""
+import heapq
+from datetime import datetime, time, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from .models import Habito, HistorialNotificacion
+from .progreso import aplica_en
+from .registros import fecha_a_mongo
+from .versiones import incrementar_version
+
+TITULO = 'Recordatorio de hábito'
+CAMPOS_HABITO = (
+    'id', 'usuario', 'nombre', 'activo', 'fecha_inicio', 'notificaciones',
+    'tipo_frecuencia', 'dias', 'frecuencia', 'mascara_semana', 'mascara_mes',
+)
+
+
+def zona_horaria():
+    return ZoneInfo(getattr(settings, 'RECORDATORIOS_ZONA_HORARIA', settings.TIME_ZONE))
+
+
+def _tramos_por_dia(desde, hasta):
+    """Divide [desde, hasta) en tramos (fecha, minuto_inicial, minuto_final) de un mismo día"""
+    actual = desde
+    while actual < hasta:
+        medianoche = datetime.combine(actual.date() + timedelta(days=1), time.min, tzinfo=actual.tzinfo)
+        fin = min(hasta, medianoche)
+        inicio_min = actual.hour * 60 + actual.minute
+        fin_min = 24 * 60 if fin == medianoche else fin.hour * 60 + fin.minute
+        yield actual.date(), inicio_min, fin_min
+        actual = fin
+
+
+def recordatorios_entre(desde, hasta):
+    """
+    Recordatorios activos que vencen en [desde, hasta) (datetimes con zona,
+    a minuto exacto), ya filtrados por los días en que aplica cada hábito.
+
+    Devuelve un heap de (disparo, habito_id, hora, usuario_id, nombre, fecha).
+    """
+    heap = []
+    for fecha, inicio_min, fin_min in _tramos_por_dia(desde, hasta):
+        habitos = Habito.objects(
+            activo__ne=False,
+            notificaciones__match={'activa': True, 'minuto__gte': inicio_min, 'minuto__lt': fin_min},
+        ).only(*CAMPOS_HABITO)
+
+        for habito in habitos:
+            if habito.fecha_inicio and habito.fecha_inicio > fecha:
+                continue
+            if not aplica_en(habito, fecha):
+                continue
+            usuario = habito._data.get('usuario')
+            for notificacion in habito.notificaciones:
+                minuto = notificacion.minuto
+                if not notificacion.activa or minuto is None or not inicio_min <= minuto < fin_min:
+                    continue
+                disparo = datetime.combine(fecha, time(minuto // 60, minuto % 60), tzinfo=desde.tzinfo)
+                heapq.heappush(heap, (
+                    disparo, habito.id, notificacion.hora, getattr(usuario, 'id', usuario), habito.nombre, fecha
+                ))
+    return heap
+
+
+def vencidos(heap, ahora):
+    """Saca del heap los recordatorios con disparo <= ahora"""
+    resultado = []
+    while heap and heap[0][0] <= ahora:
+        resultado.append(heapq.heappop(heap))
+    return resultado
+
+
+def materializar(recordatorios):
+    """
+    Inserta en HistorialNotificacion los recordatorios que todavía no existen
+    (un upsert por (habito, fecha, hora) en un solo bulk_write).
+
+    Devuelve los recordatorios efectivamente insertados.
+    """
+    if not recordatorios:
+        return []
+
+    operaciones = [
+        UpdateOne(
+            {'habito': habito_id, 'fecha_recordatorio': fecha_a_mongo(fecha), 'hora': hora},
+            {'$setOnInsert': {
+                'usuario': usuario_id,
+                'titulo': TITULO,
+                'mensaje': f'Es hora de: {nombre}',
+                # Mismo criterio que el resto de DateTimeField: UTC sin zona
+                'fecha_hora': disparo.astimezone(timezone.utc).replace(tzinfo=None),
+                'leida': False,
+            }},
+            upsert=True
+        )
+        for disparo, habito_id, hora, usuario_id, nombre, fecha in recordatorios
+    ]
+
+    error = None
+    try:
+        insertados = HistorialNotificacion._get_collection().bulk_write(operaciones, ordered=False).upserted_ids
+    except BulkWriteError as e:
+        insertados = {u['index']: u['_id'] for u in e.details.get('upserted', [])}
+        # Otra instancia insertó algunos al mismo tiempo (índice único): se
+        # ignora. Cualquier otro error de escritura se propaga.
+        errores = e.details.get('writeErrors', [])
+        if not errores or any(err.get('code') != 11000 for err in errores):
+            error = e
+
+    generados = [
+        (insertados[indice],) + tuple(recordatorio)
+        for indice, recordatorio in enumerate(recordatorios)
+        if indice in insertados
+    ]
+    # Los que sí se insertaron cuentan aunque otros hayan fallado
+    incrementar_version(usuario_id for _, _, _, _, usuario_id, _, _ in generados)
+    if error is not None:
+        raise error
+    return generados
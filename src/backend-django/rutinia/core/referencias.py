@@ -0,0 +1,197 @@
+"""
+Cache en memoria de las colecciones de referencia (Categoria, Rol, Tool).
+
+Son colecciones pequeñas que casi no cambian, pero se leían en cada alta o
+edición de hábito (la categoría por nombre, con una regex que no usa
+índice), en cada usuario serializado (su rol) y en cada listado. Cada
+proceso guarda la colección completa (id -> documento y nombre
+normalizado -> id) y la vuelve a cargar cuando cambia su versión en
+VersionColeccion. Las escrituras incrementan esa versión (señales en
+core/signals.py), así los demás workers de gunicorn ven el cambio.
+
+La versión se consulta como mucho cada REFERENCIAS_CACHE_VERIFICACION
+segundos, y siempre que se busca un id o un nombre que no está en el
+cache (por ejemplo, una categoría recién creada en otro proceso).
+"""
+import threading
+import time
+
+from bson import ObjectId
+from django.conf import settings
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from rest_framework.response import Response
+
+from .busqueda import normalizar
+from .models import Categoria, Rol, Tool, VersionColeccion
+
+
+def incrementar_version_coleccion(coleccion):
+    """Marca como modificada la colección en todos los procesos"""
+    versiones = VersionColeccion._get_collection()
+    try:
+        versiones.update_one({'_id': coleccion}, {'$inc': {'version': 1}}, upsert=True)
+    except DuplicateKeyError:
+        # Dos upserts simultáneos del primer cambio: el otro ya creó el documento
+        versiones.update_one({'_id': coleccion}, {'$inc': {'version': 1}})
+
+
+class CacheReferencias:
+    def __init__(self, modelo, campo_nombre):
+        self.modelo = modelo
+        self.coleccion = modelo._get_collection_name()
+        self.campo_nombre = campo_nombre
+        self._lock = threading.Lock()
+        self._version = None
+        self._verificado = 0
+        self._por_id = None
+        self._por_nombre = {}
+        self._serializados = {}
+        self.hits = 0
+        self.misses = 0
+        self.cargas = 0
+
+    def _vigente(self, forzar=False):
+        """(por_id, por_nombre) de la versión actual; recarga la colección si cambió"""
+        with self._lock:
+            ahora = time.monotonic()
+            intervalo = getattr(settings, 'REFERENCIAS_CACHE_VERIFICACION', 2)
+            if self._por_id is not None and not forzar and ahora - self._verificado < intervalo:
+                return self._por_id, self._por_nombre
+
+            documento = VersionColeccion._get_collection().find_one({'_id': self.coleccion})
+            version = documento['version'] if documento else 0
+            if self._por_id is None or version != self._version:
+                # La versión se lee antes que los documentos: un cambio
+                # intermedio deja una versión vieja y se recarga otra vez
+                documentos = list(self.modelo.objects.order_by('id'))
+                por_nombre = {}
+                for doc in documentos:
+                    por_nombre.setdefault(normalizar(getattr(doc, self.campo_nombre)), doc.pk)
+                self._por_id = {doc.pk: doc for doc in documentos}
+                self._por_nombre = por_nombre
+                self._serializados = {}
+                self._version = version
+                self.cargas += 1
+            self._verificado = ahora
+            return self._por_id, self._por_nombre
+
+    def _buscar(self, indice, clave):
+        encontrado = self._vigente()[indice].get(clave)
+        if encontrado is None:
+            # Puede haberse creado en otro proceso después de la última verificación
+            encontrado = self._vigente(forzar=True)[indice].get(clave)
+        with self._lock:
+            if encontrado is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return encontrado
+
+    def obtener(self, valor):
+        """Documento por id (str, ObjectId, DBRef o el propio documento), o None"""
+        valor = getattr(valor, 'id', valor)
+        if valor is None or not ObjectId.is_valid(valor):
+            return None
+        return self._buscar(0, ObjectId(valor))
+
+    def id_por_nombre(self, nombre):
+        """Id del documento con ese nombre (sin distinguir mayúsculas ni acentos), o None"""
+        clave = normalizar(nombre)
+        if not clave:
+            return None
+        return self._buscar(1, clave)
+
+    def documentos(self):
+        return list(self._vigente()[0].values())
+
+    def serializar(self, serializer_class):
+        """Lista serializada de toda la colección, calculada una vez por versión"""
+        por_id, _ = self._vigente()
+        with self._lock:
+            if self._por_id is por_id and serializer_class in self._serializados:
+                return self._serializados[serializer_class]
+        datos = serializer_class(list(por_id.values()), many=True).data
+        with self._lock:
+            if self._por_id is por_id:
+                self._serializados[serializer_class] = datos
+        return datos
+
+    def version(self):
+        self._vigente()
+        return self._version
+
+    def invalidar(self):
+        """Tras una escritura: la incrementa para todos y descarta la copia local"""
+        incrementar_version_coleccion(self.coleccion)
+        self.descartar()
+
+    def descartar(self):
+        """Descarta la copia local; la siguiente lectura vuelve a cargar la colección"""
+        with self._lock:
+            self._por_id = None
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0,
+                'cargas': self.cargas,
+                'tamano': len(self._por_id or {}),
+            }
+
+
+categorias = CacheReferencias(Categoria, 'nombre')
+roles = CacheReferencias(Rol, 'nombre')
+tools = CacheReferencias(Tool, 'label')
+
+CACHES_REFERENCIAS = {Categoria: categorias, Rol: roles, Tool: tools}
+
+
+def obtener_o_crear_categoria(nombre):
+    """
+    Categoría con ese nombre (sin distinguir mayúsculas ni acentos). Si no
+    existe se crea con un único upsert sobre el índice único de
+    nombre_normalizado, así dos altas simultáneas no la duplican.
+    """
+    if not nombre or not nombre.strip():
+        return None
+
+    categoria_id = categorias.id_por_nombre(nombre)
+    if categoria_id is None:
+        nuevo_id = ObjectId()
+        filtro = {'nombre_normalizado': normalizar(nombre)}
+        cambios = {'$setOnInsert': {'_id': nuevo_id, 'nombre': nombre.strip().lower()}}
+        coleccion = Categoria._get_collection()
+        try:
+            anterior = coleccion.find_one_and_update(
+                filtro, cambios, projection={'_id': 1}, upsert=True, return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # Otro request la creó al mismo tiempo: el reintento la encuentra
+            anterior = coleccion.find_one_and_update(
+                filtro, cambios, projection={'_id': 1}, upsert=True, return_document=ReturnDocument.BEFORE
+            )
+
+        if anterior is None:
+            categorias.invalidar()
+            categoria_id = nuevo_id
+        else:
+            categoria_id = anterior['_id']
+
+    return categorias.obtener(categoria_id)
+
+
+class ListadoReferenciasMixin:
+    """
+    Mixin para los ViewSets de colecciones de referencia: el listado completo
+    (sin ?cursor= ni ?page_size=) se sirve desde `cache_referencias`.
+    """
+    cache_referencias = None
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None and self.paginator.pagina_solicitada(request):
+            return super().list(request, *args, **kwargs)
+        return Response(self.cache_referencias.serializar(self.get_serializer_class()))
@@ -0,0 +1,133 @@
+"""
+Escritura de registros de hábitos.
+
+Un registro es único por (habito, fecha) (ver el índice de RegistroHabito),
+así que marcar o desmarcar un día es un upsert atómico en lugar de
+buscar-y-guardar, que con clics concurrentes creaba duplicados.
+"""
+from datetime import datetime, time
+
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from .models import RegistroHabito
+
+
+def fecha_a_mongo(fecha):
+    """MongoEngine guarda los DateField como datetime a medianoche"""
+    return datetime.combine(fecha, time.min)
+
+
+def marcar_registro(habito_id, fecha, estado):
+    """
+    Crea o actualiza el registro del hábito para la fecha con un solo
+    findAndModify atómico.
+
+    Devuelve (registro_id, creado, estado_anterior); estado_anterior es None
+    si el registro no existía.
+    """
+    nuevo_id = ObjectId()
+    filtro = {'habito': ObjectId(habito_id), 'fecha': fecha_a_mongo(fecha)}
+    cambios = {
+        '$set': {'estado': bool(estado)},
+        '$setOnInsert': {'_id': nuevo_id},
+    }
+    coleccion = RegistroHabito._get_collection()
+
+    try:
+        anterior = coleccion.find_one_and_update(
+            filtro, cambios, projection={'_id': 1, 'estado': 1},
+            upsert=True, return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        # Otro request insertó el mismo (habito, fecha) al mismo tiempo:
+        # el reintento encuentra ese documento y lo actualiza.
+        anterior = coleccion.find_one_and_update(
+            filtro, cambios, projection={'_id': 1, 'estado': 1},
+            upsert=True, return_document=ReturnDocument.BEFORE
+        )
+
+    if anterior is None:
+        return nuevo_id, True, None
+    return anterior['_id'], False, anterior.get('estado')
+
+
+def marcar_registros(cambios):
+    """
+    Aplica varios upserts (habito_id, fecha, estado) con un único bulk_write
+    no ordenado.
+
+    Devuelve una lista paralela a `cambios` con
+    {"creado": bool, "id": ObjectId | None, "error": str | None,
+    "anterior": estado previo o None}.
+    """
+    if not cambios:
+        return []
+
+    # Estados previos (para las estadísticas) con una sola consulta
+    anteriores = {
+        (registro['habito'], registro['fecha']): registro.get('estado')
+        for registro in RegistroHabito._get_collection().find(
+            {
+                'habito': {'$in': list({ObjectId(habito_id) for habito_id, _, _ in cambios})},
+                'fecha': {'$in': list({fecha_a_mongo(fecha) for _, fecha, _ in cambios})},
+            },
+            projection={'_id': 0, 'habito': 1, 'fecha': 1, 'estado': 1}
+        )
+    }
+
+    operaciones = [
+        UpdateOne(
+            {'habito': ObjectId(habito_id), 'fecha': fecha_a_mongo(fecha)},
+            {'$set': {'estado': bool(estado)}},
+            upsert=True
+        )
+        for habito_id, fecha, estado in cambios
+    ]
+
+    try:
+        resultado = RegistroHabito._get_collection().bulk_write(operaciones, ordered=False)
+        insertados = resultado.upserted_ids
+        errores = {}
+    except BulkWriteError as e:
+        # Las operaciones no ordenadas que no fallaron sí se aplicaron
+        insertados = {u['index']: u['_id'] for u in e.details.get('upserted', [])}
+        errores = {err['index']: err.get('errmsg', 'Error de escritura') for err in e.details.get('writeErrors', [])}
+
+    return [
+        {
+            "creado": indice in insertados,
+            "id": insertados.get(indice),
+            "error": errores.get(indice),
+            "anterior": anteriores.get((ObjectId(habito_id), fecha_a_mongo(fecha))),
+        }
+        for indice, (habito_id, fecha, _) in enumerate(cambios)
+    ]
+
+
+def inicializar_registros(habito_ids, fecha):
+    """
+    Crea en estado False los registros de `fecha` que falten para los hábitos
+    (un solo bulk_write de upserts que no modifican los existentes).
+    Devuelve el estado del día, {habito_id: estado}, y cuántos registros se crearon.
+    """
+    if not habito_ids:
+        return {}, 0
+
+    fecha_mongo = fecha_a_mongo(fecha)
+    coleccion = RegistroHabito._get_collection()
+    resultado = coleccion.bulk_write([
+        UpdateOne(
+            {'habito': habito_id, 'fecha': fecha_mongo},
+            {'$setOnInsert': {'estado': False}},
+            upsert=True
+        )
+        for habito_id in habito_ids
+    ], ordered=False)
+
+    registros = coleccion.find(
+        {'habito': {'$in': list(habito_ids)}, 'fecha': fecha_mongo},
+        projection={'_id': 0, 'habito': 1, 'estado': 1}
+    )
+    return {registro['habito']: bool(registro.get('estado')) for registro in registros}, resultado.upserted_count
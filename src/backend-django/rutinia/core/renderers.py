@@ -0,0 +1,37 @@
+"""
+Renderer JSON basado en orjson.
+
+Produce exactamente los mismos bytes que rest_framework.renderers.JSONRenderer
+con la configuración por defecto (JSON compacto, UTF-8 sin escapar), pero
+varias veces más rápido en listas grandes. Si la petición pide indentación
+o los datos tienen algo que orjson no sabe serializar, se usa el renderer
+de DRF.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+
+# Las fechas se delegan al encoder de DRF para conservar su formato
+# (milisegundos, sufijo "Z" para UTC)
+ORJSON_OPCIONES = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if indent or self.ensure_ascii or not self.compact or not self.strict:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=encoders.JSONEncoder().default, option=ORJSON_OPCIONES)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Igual que JSONRenderer: escapar separadores de línea/párrafo para JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
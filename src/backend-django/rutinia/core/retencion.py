@@ -0,0 +1,70 @@
+"""
+Retención de HistorialNotificacion.
+
+Cada recordatorio agrega una notificación, así que sin límite la colección
+(y el historial de cada usuario) crece indefinidamente. Vencen las leídas
+con más de NOTIFICACIONES_RETENCION_LEIDAS_DIAS desde su lectura y las no
+leídas con más de NOTIFICACIONES_RETENCION_NO_LEIDAS_DIAS desde su creación.
+
+En modo 'archivo' se copian por lotes a historial_notificacion_archivada
+(con el mismo _id, así que repetir un lote interrumpido no duplica nada) y
+luego se borran; en modo 'ttl' las borra MongoDB con los índices TTL
+declarados en el modelo.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from pymongo import ReplaceOne
+
+from .models import HistorialNotificacion, HistorialNotificacionArchivada
+from .versiones import incrementar_version
+
+
+def filtro_vencidas(ahora=None, dias_leidas=None, dias_no_leidas=None):
+    """Filtro de MongoDB para las notificaciones fuera del periodo de retención (o None)"""
+    ahora = ahora or datetime.now()
+    if dias_leidas is None:
+        dias_leidas = getattr(settings, 'NOTIFICACIONES_RETENCION_LEIDAS_DIAS', 0)
+    if dias_no_leidas is None:
+        dias_no_leidas = getattr(settings, 'NOTIFICACIONES_RETENCION_NO_LEIDAS_DIAS', 0)
+
+    # Los mismos campos que los índices parciales de HistorialNotificacion
+    condiciones = []
+    if dias_leidas > 0:
+        condiciones.append({'leida': True, 'fecha_lectura': {'$lt': ahora - timedelta(days=dias_leidas)}})
+    if dias_no_leidas > 0:
+        condiciones.append({'leida': False, 'fecha_hora': {'$lt': ahora - timedelta(days=dias_no_leidas)}})
+    if not condiciones:
+        return None
+    return condiciones[0] if len(condiciones) == 1 else {'$or': condiciones}
+
+
+def contar_vencidas(filtro):
+    return HistorialNotificacion._get_collection().count_documents(filtro)
+
+
+def archivar_lote(filtro, lote):
+    """
+    Mueve hasta `lote` notificaciones vencidas al archivo. Devuelve cuántas
+    se movieron (0 cuando ya no quedan).
+    """
+    origen = HistorialNotificacion._get_collection()
+    documentos = list(origen.find(filtro).limit(lote))
+    if not documentos:
+        return 0
+
+    fecha_archivo = datetime.now()
+    for documento in documentos:
+        documento['fecha_archivo'] = fecha_archivo
+    # Reemplazo por _id: si un intento anterior ya copió el documento, se sobrescribe
+    HistorialNotificacionArchivada._get_collection().bulk_write([
+        ReplaceOne({'_id': documento['_id']}, documento, upsert=True)
+        for documento in documentos
+    ], ordered=False)
+
+    # Se vuelve a aplicar el filtro: si una notificación cambió mientras tanto
+    # (p. ej. se marcó como leída) se queda en la colección principal
+    ids = [documento['_id'] for documento in documentos]
+    origen.delete_many({'$and': [{'_id': {'$in': ids}}, filtro]})
+    incrementar_version(documento.get('usuario') for documento in documentos)
+    return len(ids)
@@ -1,6 +1,9 @@
 from rest_framework import serializers
 from rest_framework_mongoengine import serializers as mon
+from mongoengine import Document
 
+from .busqueda import normalizar_correo
+from .referencias import categorias, roles, obtener_o_crear_categoria
 from .models import Usuario, Habito, RegistroHabito, Rol, Categoria, Notificacion, HistorialNotificacion, Tool
 
 class ToolSerializer(mon.DocumentSerializer):
@@ -19,9 +22,24 @@ class UsuarioSerializer(mon.DocumentSerializer):
 
     class Meta:
         model = Usuario
-        fields = '__all__'
+        # Se calculan en Usuario.clean
+        exclude = ('nombre_normalizado', 'apellido_normalizado')
+
+    def validate_correo(self, value):
+        """El correo se compara sin distinguir mayúsculas (se guarda en minúsculas)"""
+        value = normalizar_correo(value)
+        existentes = Usuario.objects(correo=value)
+        if self.instance is not None:
+            existentes = existentes.filter(id__ne=self.instance.id)
+        if existentes.first() is not None:
+            raise serializers.ValidationError('El correo ya está registrado')
+        return value
 
     def to_representation(self, instance):
+        # El rol sale del cache de referencias en lugar de una consulta por usuario
+        rol = roles.obtener(instance._data.get('rol'))
+        if rol is not None:
+            instance._data['rol'] = rol
         # Muestra el rol completo al hacer GET
         data = super().to_representation(instance)
         if instance.rol:
@@ -37,11 +55,10 @@ class UsuarioSerializer(mon.DocumentSerializer):
 
         # Si se envía un rol, busca el objeto correspondiente
         if rol_id:
-            try:
-                rol_obj = Rol.objects.get(id=rol_id)
-                instance.rol = rol_obj
-            except Rol.DoesNotExist:
+            rol_obj = roles.obtener(rol_id)
+            if rol_obj is None:
                 raise serializers.ValidationError({'rol': 'El rol especificado no existe.'})
+            instance.rol = rol_obj
 
         # Actualiza los demás campos normalmente
         for attr, value in validated_data.items():
@@ -86,7 +103,8 @@ class NotificacionSerializer(mon.EmbeddedDocumentSerializer):
 class HistorialNotificacionSerializer(mon.DocumentSerializer):
     class Meta:
         model = HistorialNotificacion
-        fields = '__all__'
+        # La clave del recordatorio es interna del programador
+        exclude = ('fecha_recordatorio', 'hora')
     
     def to_representation(self, instance):
         """Incluye información básica del hábito"""
@@ -108,30 +126,31 @@ class HistorialNotificacionSerializer(mon.DocumentSerializer):
 class CategoriaSerializer(mon.DocumentSerializer):
     class Meta:
         model = Categoria
-        fields = '__all__'
+        # Se calcula en Categoria.clean
+        exclude = ('nombre_normalizado',)
+
+    def validate_nombre(self, value):
+        """Los nombres se comparan sin distinguir mayúsculas ni acentos (índice único)"""
+        existente = categorias.id_por_nombre(value)
+        if existente is not None and (self.instance is None or existente != self.instance.pk):
+            raise serializers.ValidationError('La categoría ya existe')
+        return value
 
 class HabitoSerializer(mon.DocumentSerializer):
     notificaciones = NotificacionSerializer(many=True, required=False)
-    categoria = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    categoria = serializers.CharField(required=False, allow_blank=True, allow_null=True, max_length=50)
     
     class Meta:
         model = Habito
-        fields = '__all__'
+        # La programación y los campos normalizados se calculan en Habito.clean
+        exclude = (
+            'frecuencia', 'mascara_semana', 'mascara_mes',
+            'nombre_normalizado', 'dificultad_normalizada', 'tipo_frecuencia_normalizado',
+        )
 
     def _get_or_create_categoria(self, categoria_nombre):
-        """Buscar o crear categoría por nombre"""
-        if not categoria_nombre or categoria_nombre.strip() == '':
-            return None
-        
-        # Buscar categoría existente (insensible a mayúsculas/minúsculas)
-        try:
-            categoria = Categoria.objects.get(nombre__iexact=categoria_nombre)
-            return categoria
-        except Categoria.DoesNotExist:
-            # Crear nueva categoría si no existe
-            categoria = Categoria(nombre=categoria_nombre.lower())
-            categoria.save()
-            return categoria
+        """Buscar o crear categoría por nombre (ver core/referencias.py)"""
+        return obtener_o_crear_categoria(categoria_nombre)
 
     def create(self, validated_data):
         """Crear hábito con notificaciones embebidas y categoría"""
@@ -181,6 +200,10 @@ class HabitoSerializer(mon.DocumentSerializer):
         Muestra información básica de usuario y categoría.
         Evita serialización circular que causa error 500.
         """
+        # La categoría sale del cache de referencias en lugar de una consulta por hábito
+        categoria = categorias.obtener(instance._data.get('categoria'))
+        if categoria is not None:
+            instance._data['categoria'] = categoria
         data = super().to_representation(instance)
         
         # Solo incluir ID del usuario (no el objeto completo)
@@ -220,4 +243,143 @@ class RegistroHabitoSerializer(mon.DocumentSerializer):
                 'icono': instance.habito.icono if hasattr(instance.habito, 'icono') else 'fitness_center',
                 'color': instance.habito.color if hasattr(instance.habito, 'color') else 'blue'
             }
-        return data
\ No newline at end of file
+        return data
+
+# --- Serialización rápida para listados grandes ---
+#
+# Extractores precompilados por modelo que generan los mismos dicts (mismas
+# claves, mismo orden y mismos formatos) que los DocumentSerializer de arriba,
+# leyendo directamente de `_data` sin la introspección de campos de DRF.
+# Se usan solo para leer listas (ver SerializacionRapidaMixin en views).
+
+_fecha_hora_field = serializers.DateTimeField()
+_booleano_field = serializers.BooleanField()
+
+
+def _texto(valor):
+    return None if valor is None else str(valor)
+
+
+def _booleano(valor):
+    return None if valor is None else _booleano_field.to_representation(valor)
+
+
+def _fecha(valor):
+    if not valor:
+        return None
+    return valor if isinstance(valor, str) else valor.isoformat()
+
+
+def _fecha_hora(valor):
+    return None if valor is None else _fecha_hora_field.to_representation(valor)
+
+
+def _referencia(documento, campo):
+    """Documento referenciado (ya precargado) o None, sin consultas extra si está precargado"""
+    valor = documento._data.get(campo)
+    if valor is None or isinstance(valor, Document):
+        return valor
+    # DBRef no precargado: mismo comportamiento que el serializer normal
+    return getattr(documento, campo)
+
+
+def _id_referencia(documento, campo):
+    valor = documento._data.get(campo)
+    return None if valor is None else str(valor.id)
+
+
+def _habito_basico(documento):
+    habito = _referencia(documento, 'habito')
+    if not habito:
+        return None
+    return {
+        'id': str(habito.id),
+        'nombre': habito.nombre,
+        'icono': habito.icono if hasattr(habito, 'icono') else 'fitness_center',
+        'color': habito.color if hasattr(habito, 'color') else 'blue'
+    }
+
+
+def _notificaciones(documento):
+    return [
+        {'hora': _texto(n.hora), 'activa': _booleano(n.activa)}
+        for n in documento._data.get('notificaciones') or []
+    ]
+
+
+def _categoria(documento):
+    valor = documento._data.get('categoria')
+    if valor is None:
+        return None
+    categoria = categorias.obtener(valor)
+    if categoria is None:
+        # Referencia a una categoría borrada: mismo comportamiento que el serializer normal
+        categoria = _referencia(documento, 'categoria')
+    return categoria.nombre if categoria else None
+
+
+def _dias(documento):
+    dias = documento._data.get('dias')
+    return None if dias is None else list(dias)
+
+
+def _campo(nombre, conversion):
+    def extraer(documento):
+        return conversion(documento._data.get(nombre))
+    return extraer
+
+
+def _extractor(campos):
+    campos = tuple(campos)
+
+    def extraer(documento):
+        return {clave: obtener(documento) for clave, obtener in campos}
+    return extraer
+
+
+EXTRACTORES_RAPIDOS = {
+    RegistroHabito: _extractor([
+        ('id', _campo('id', _texto)),
+        ('fecha', _campo('fecha', _fecha)),
+        ('estado', _campo('estado', _booleano)),
+        ('habito', _habito_basico),
+    ]),
+    Habito: _extractor([
+        ('id', _campo('id', _texto)),
+        ('notificaciones', _notificaciones),
+        ('categoria', _categoria),
+        ('nombre', _campo('nombre', _texto)),
+        ('descripcion', _campo('descripcion', _texto)),
+        ('dificultad', _campo('dificultad', _texto)),
+        ('fecha_inicio', _campo('fecha_inicio', _fecha)),
+        ('tipo_frecuencia', _campo('tipo_frecuencia', _texto)),
+        ('dias', _dias),
+        ('publico', _campo('publico', _booleano)),
+        ('activo', _campo('activo', _booleano)),
+        ('icono', _campo('icono', _texto)),
+        ('color', _campo('color', _texto)),
+        ('usuario', lambda documento: _id_referencia(documento, 'usuario')),
+    ]),
+    HistorialNotificacion: _extractor([
+        ('id', _campo('id', _texto)),
+        ('titulo', _campo('titulo', _texto)),
+        ('mensaje', _campo('mensaje', _texto)),
+        ('fecha_hora', _campo('fecha_hora', _fecha_hora)),
+        ('leida', _campo('leida', _booleano)),
+        ('fecha_lectura', _campo('fecha_lectura', _fecha_hora)),
+        ('usuario', lambda documento: _id_referencia(documento, 'usuario')),
+        ('habito', _habito_basico),
+    ]),
+}
+
+
+class ListaRapida:
+    """Sustituto de `Serializer(many=True)` de solo lectura: expone `.data`"""
+
+    def __init__(self, documentos, extractor):
+        self.documentos = documentos
+        self.extractor = extractor
+
+    @property
+    def data(self):
+        return [self.extractor(documento) for documento in self.documentos]
@@ -0,0 +1,55 @@
+"""
+Señales de MongoEngine para mantener coherentes los caches en memoria
+y los datos derivados.
+"""
+from mongoengine import signals
+
+from .estadisticas import recalcular_estadisticas
+from .jwt_auth import cache_usuarios
+from .models import Usuario, Habito, HistorialNotificacion
+from .referencias import CACHES_REFERENCIAS
+from .versiones import incrementar_version, incrementar_version_habitos
+
+
+def invalidar_usuario(sender, document, **kwargs):
+    if document.pk is not None:
+        cache_usuarios.invalidar(document.pk)
+
+
+signals.post_save.connect(invalidar_usuario, sender=Usuario)
+signals.post_delete.connect(invalidar_usuario, sender=Usuario)
+
+
+def recalcular_estadistica_habito(sender, document, created=False, **kwargs):
+    # Las rachas dependen de los días programados del hábito
+    if not created and {'tipo_frecuencia', 'dias'} & set(document._changed_fields):
+        recalcular_estadisticas([document])
+
+
+signals.post_save.connect(recalcular_estadistica_habito, sender=Habito)
+
+
+def incrementar_version_usuario(sender, document, **kwargs):
+    # Invalida los ETag de los listados del dueño (ver core/versiones.py). Las
+    # escrituras masivas y los borrados de notificaciones lo hacen explícitamente
+    usuario = document._data.get('usuario')
+    if usuario is None and sender is Habito and document.pk is not None:
+        # Documento cargado con only() sin el usuario
+        incrementar_version_habitos([document.pk])
+    else:
+        incrementar_version([usuario])
+
+
+signals.post_save.connect(incrementar_version_usuario, sender=Habito)
+signals.post_delete.connect(incrementar_version_usuario, sender=Habito)
+signals.post_save.connect(incrementar_version_usuario, sender=HistorialNotificacion)
+
+
+def invalidar_referencias(sender, document, **kwargs):
+    # Nueva versión de la colección: cada proceso recarga su copia (core/referencias.py)
+    CACHES_REFERENCIAS[sender].invalidar()
+
+
+for modelo in CACHES_REFERENCIAS:
+    signals.post_save.connect(invalidar_referencias, sender=modelo)
+    signals.post_delete.connect(invalidar_referencias, sender=modelo)
@@ -1,3 +1,405 @@
-from django.test import TestCase
+"""
+Pruebas contra MongoDB:
 
-# Create your tests here.
+- Número de consultas de los listados: las referencias de cada página se
+  cargan con un $in por colección (core/prefetch.py), así que una página
+  de 50 filas hace las mismas consultas que una de 5.
+- Búsqueda de hábitos con ?q=: ordenada por relevancia y sin paginar.
+- Paginación por cursor con valores de orden repetidos: sin duplicados ni
+  omisiones, hacia adelante y hacia atrás.
+- Estadísticas: la actualización incremental de las rachas coincide con el
+  recálculo completo.
+- Exportación e importación: lo exportado en NDJSON o CSV e importado en
+  otro usuario se vuelve a exportar igual (salvo los ids).
+
+Necesitan un MongoDB accesible en DATABASE_URL (sin base de datos en la
+URL). Usan la base MONGO_DB con el sufijo _test, que se borra al terminar:
+
+    python manage.py test core
+"""
+import csv
+import io
+import random
+from datetime import date, datetime, timedelta
+from unittest import SkipTest
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import orjson
+from decouple import config
+from django.test import SimpleTestCase, override_settings
+from mongoengine import connect, disconnect
+from mongoengine.connection import get_db
+from pymongo import monitoring
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .estadisticas import VENTANA_RECIENTES, _calcular, _desde_mongo, actualizar_estadisticas, recalcular_estadisticas
+from .exportacion import EXPORTADORES
+from .importacion import LECTORES, Importacion
+from .jwt_auth import UsuarioAutenticado
+from .models import Categoria, EstadisticaHabito, Habito, HistorialNotificacion, RegistroHabito, Usuario
+from .registros import marcar_registro, marcar_registros
+from .referencias import categorias
+from .views import HabitoViewSet, HistorialNotificacionViewSet, RegistroHabitoViewSet
+
+FILAS = 50
+
+# Comandos del driver que no son consultas de la aplicación
+COMANDOS_IGNORADOS = {
+    'hello', 'ismaster', 'isMaster', 'ping', 'buildInfo', 'endSessions',
+    'saslStart', 'saslContinue', 'killCursors',
+}
+
+
+class ContadorComandos(monitoring.CommandListener):
+    """Cuenta los comandos enviados a la base de datos de pruebas"""
+
+    def __init__(self):
+        self.base = None
+        self.comandos = []
+
+    def started(self, event):
+        if event.database_name == self.base and event.command_name not in COMANDOS_IGNORADOS:
+            self.comandos.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+class MongoTestCase(SimpleTestCase):
+    """
+    Conecta a la base MONGO_DB_test, vacía, durante la clase; las
+    subclases crean sus documentos en crear_datos()
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.contador = ContadorComandos()
+        nombre = f"{config('MONGO_DB')}_test"
+        disconnect()
+        connect(db=nombre, host=config('DATABASE_URL'), event_listeners=[cls.contador])
+        if get_db().name != nombre:
+            # La base de la URL tiene prioridad: no se escribe en ella
+            cls._restaurar_conexion()
+            raise SkipTest('DATABASE_URL incluye una base de datos; use una URL sin base para las pruebas')
+        cls.contador.base = nombre
+        get_db().client.drop_database(nombre)
+        categorias.descartar()
+        cls.usuario = Usuario(nombre='Prueba', correo='consultas@rutinia.test').save()
+        cls.crear_datos()
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls.contador.base:
+            get_db().client.drop_database(cls.contador.base)
+            cls._restaurar_conexion()
+        super().tearDownClass()
+
+    @classmethod
+    def _restaurar_conexion(cls):
+        disconnect()
+        connect(db=config('MONGO_DB'), host=config('DATABASE_URL'))
+        categorias.descartar()
+
+    @classmethod
+    def crear_datos(cls):
+        pass
+
+    def _respuesta(self, viewset, accion, params, metodo='get', datos=None):
+        factory = APIRequestFactory()
+        if metodo == 'get':
+            request = factory.get('/', params)
+        else:
+            request = getattr(factory, metodo)(f'/?{urlencode(params)}', datos, format='json')
+        force_authenticate(request, user=UsuarioAutenticado.desde_documento(self.usuario))
+        respuesta = viewset.as_view({metodo: accion})(request)
+        respuesta.render()
+        return respuesta
+
+    def _listar(self, viewset, accion, params):
+        respuesta = self._respuesta(viewset, accion, params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.data['results']
+
+
+@override_settings(REFERENCIAS_CACHE_VERIFICACION=3600)
+class ConsultasListadosTests(MongoTestCase):
+    @classmethod
+    def crear_datos(cls):
+        salud = Categoria(nombre='salud').save()
+        deporte = Categoria(nombre='deporte').save()
+        hoy = date.today()
+        for i in range(FILAS):
+            habito = Habito(
+                usuario=cls.usuario, nombre=f'Hábito {i}', tipo_frecuencia='Diario',
+                categoria=salud if i % 2 else deporte,
+            ).save()
+            RegistroHabito(habito=habito, fecha=hoy - timedelta(days=i), estado=True).save()
+            HistorialNotificacion(
+                usuario=cls.usuario, habito=habito, titulo='Recordatorio', mensaje=f'Mensaje {i}',
+                fecha_hora=datetime.now() - timedelta(minutes=i),
+            ).save()
+
+    def _consultas(self, viewset, accion, params, page_size):
+        self.contador.comandos = []
+        resultados = self._listar(viewset, accion, {**params, 'page_size': page_size})
+        self.assertEqual(len(resultados), page_size)
+        return list(self.contador.comandos)
+
+    def assertConsultasConstantes(self, viewset, accion, params, esperadas):
+        # La primera petición carga los caches de referencias del proceso
+        self._listar(viewset, accion, {**params, 'page_size': 1})
+        pocas = self._consultas(viewset, accion, params, 5)
+        muchas = self._consultas(viewset, accion, params, FILAS)
+        self.assertEqual(len(pocas), len(muchas), f'5 filas: {pocas}; {FILAS} filas: {muchas}')
+        self.assertEqual(len(muchas), esperadas, f'{FILAS} filas: {muchas}')
+
+    @override_settings(SERIALIZACION_RAPIDA=True)
+    def test_habitos(self):
+        # Versión de datos (ETag), usuario del filtro y la página; la categoría
+        # sale del cache y el id del usuario del DBRef, sin cargarlo
+        self.assertConsultasConstantes(HabitoViewSet, 'list', {'usuario': str(self.usuario.id)}, 3)
+
+    @override_settings(SERIALIZACION_RAPIDA=True)
+    def test_registros(self):
+        # Versión de datos, hábitos del usuario, la página y sus hábitos ($in)
+        self.assertConsultasConstantes(RegistroHabitoViewSet, 'list', {'usuario': str(self.usuario.id)}, 4)
+
+    @override_settings(SERIALIZACION_RAPIDA=True)
+    def test_historial_notificaciones(self):
+        # Versión de datos, la página y sus hábitos ($in)
+        self.assertConsultasConstantes(HistorialNotificacionViewSet, 'list', {}, 3)
+
+    @override_settings(SERIALIZACION_RAPIDA=True)
+    def test_notificaciones_no_leidas(self):
+        self.assertConsultasConstantes(
+            HistorialNotificacionViewSet, 'no_leidas', {'usuario': str(self.usuario.id)}, 3
+        )
+
+
+class BusquedaHabitosTests(MongoTestCase):
+    @classmethod
+    def crear_datos(cls):
+        # 'correr' pesa 3 en el nombre y 1 en la descripción (índice de texto)
+        Habito(usuario=cls.usuario, nombre='Leer', descripcion='Leer antes de correr',
+               tipo_frecuencia='Diario').save()
+        Habito(usuario=cls.usuario, nombre='Correr', descripcion='Correr por el parque',
+               tipo_frecuencia='Diario').save()
+        Habito(usuario=cls.usuario, nombre='Correr', descripcion='Salir a la pista',
+               tipo_frecuencia='Diario').save()
+        Habito(usuario=cls.usuario, nombre='Meditar', tipo_frecuencia='Diario').save()
+
+    def _buscar(self, params):
+        respuesta = self._respuesta(HabitoViewSet, 'list', {'usuario': str(self.usuario.id), **params})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.data
+
+    def test_busqueda_ordenada_por_relevancia_sin_paginar(self):
+        # Aunque se pida una página, ?q= devuelve la lista por relevancia sin cursor
+        resultados = self._buscar({'q': 'correr', 'page_size': 1})
+        self.assertIsInstance(resultados, list)
+        self.assertEqual(
+            [(h['nombre'], h['descripcion']) for h in resultados],
+            [('Correr', 'Correr por el parque'), ('Correr', 'Salir a la pista'), ('Leer', 'Leer antes de correr')],
+        )
+
+    def test_busqueda_con_ordering_paginada(self):
+        # Con un ?ordering= válido el cursor vuelve a aplicarse
+        pagina = self._buscar({'q': 'correr', 'ordering': 'nombre', 'page_size': 2})
+        self.assertEqual([h['nombre'] for h in pagina['results']], ['Correr', 'Correr'])
+        self.assertIsNotNone(pagina['next'])
+
+
+class CursorEmpatesTests(MongoTestCase):
+    HABITOS = 23
+    NOTIFICACIONES = 17
+
+    @classmethod
+    def crear_datos(cls):
+        # Solo dos valores de dificultad y una única fecha_hora: el orden
+        # depende del desempate por id
+        cls.habitos = [
+            Habito(usuario=cls.usuario, nombre=f'Hábito {i}', tipo_frecuencia='Diario',
+                   dificultad='Alta' if i % 3 else 'Baja').save()
+            for i in range(cls.HABITOS)
+        ]
+        momento = datetime(2025, 3, 1, 8, 0)
+        for i in range(cls.NOTIFICACIONES):
+            HistorialNotificacion(
+                usuario=cls.usuario, habito=cls.habitos[i], titulo='Recordatorio',
+                mensaje=f'Mensaje {i}', fecha_hora=momento,
+            ).save()
+
+    def _pagina(self, viewset, params):
+        respuesta = self._respuesta(viewset, 'list', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.data
+
+    @staticmethod
+    def _cursor(enlace):
+        return parse_qs(urlsplit(enlace).query)['cursor'][0] if enlace else None
+
+    def assertRecorridoCompleto(self, viewset, params, esperados):
+        """Recorre las páginas con next y vuelve con previous"""
+        params = {**params, 'page_size': 4}
+        maximo = len(esperados) // 4 + 1  # un cursor que no avanza no cuelga la prueba
+        paginas, pagina = [], self._pagina(viewset, params)
+        paginas.append([fila['id'] for fila in pagina['results']])
+        while pagina['next'] and len(paginas) <= maximo:
+            pagina = self._pagina(viewset, {**params, 'cursor': self._cursor(pagina['next'])})
+            paginas.append([fila['id'] for fila in pagina['results']])
+        self.assertEqual([i for ids in paginas for i in ids], esperados)
+
+        anteriores = [paginas[-1]]
+        while pagina['previous'] and len(anteriores) <= maximo:
+            pagina = self._pagina(viewset, {**params, 'cursor': self._cursor(pagina['previous'])})
+            anteriores.append([fila['id'] for fila in pagina['results']])
+        self.assertEqual(anteriores[::-1], paginas)
+
+    def test_empates_ascendentes(self):
+        esperados = [
+            str(habito.id)
+            for habito in sorted(self.habitos, key=lambda habito: (habito.dificultad, habito.id))
+        ]
+        self.assertRecorridoCompleto(
+            HabitoViewSet, {'usuario': str(self.usuario.id), 'ordering': 'dificultad'}, esperados
+        )
+
+    def test_empates_descendentes(self):
+        # Mismo fecha_hora en todas: (fecha_hora, id) descendente
+        esperados = [
+            str(notificacion.id)
+            for notificacion in sorted(HistorialNotificacion.objects(usuario=self.usuario),
+                                       key=lambda notificacion: notificacion.id, reverse=True)
+        ]
+        self.assertRecorridoCompleto(HistorialNotificacionViewSet, {}, esperados)
+
+
+class EstadisticasIncrementalesTests(MongoTestCase):
+    HOY = date(2025, 3, 31)
+    PASOS = 200
+
+    @classmethod
+    def crear_datos(cls):
+        cls.habitos = [
+            Habito(usuario=cls.usuario, nombre='Diario', tipo_frecuencia='Diario').save(),
+            Habito(usuario=cls.usuario, nombre='Semanal', tipo_frecuencia='Semanal',
+                   dias=['Lunes', 'Miércoles', 'Viernes']).save(),
+            Habito(usuario=cls.usuario, nombre='Mensual', tipo_frecuencia='Mensual', dias=[1, 10, 20]).save(),
+        ]
+
+    def _guardada(self, habito):
+        documento = EstadisticaHabito._get_collection().find_one({'habito': habito.id})
+        datos = _desde_mongo(documento or {})
+        datos['recientes'] = sorted(set(datos['recientes']))
+        return datos
+
+    def _esperada(self, habito, completadas):
+        datos = _calcular(habito, completadas, self.HOY)
+        limite = self.HOY - timedelta(days=VENTANA_RECIENTES)
+        datos['recientes'] = sorted(f for f in set(datos['recientes']) if f >= limite)
+        return datos
+
+    def test_incremental_igual_a_recalculo(self):
+        # Marcas y desmarcas al azar (a veces varias a la vez, como bulk_toggle)
+        # sobre 30 días: después de cada paso la estadística guardada es la
+        # del recálculo completo
+        azar = random.Random(2025)
+        dias = [self.HOY - timedelta(days=i) for i in range(30)]
+        for habito in self.habitos:
+            completadas = set()
+            for paso in range(self.PASOS):
+                cambios = [(habito.id, azar.choice(dias), azar.random() < 0.7)
+                           for _ in range(azar.choice((1, 1, 1, 3)))]
+                if len(cambios) == 1:
+                    _, fecha, completado = cambios[0]
+                    anteriores = [marcar_registro(habito.id, fecha, completado)[2]]
+                else:
+                    cambios = list({(h, f): (h, f, c) for h, f, c in cambios}.values())
+                    anteriores = [escrito['anterior'] for escrito in marcar_registros(cambios)]
+                actualizar_estadisticas([
+                    (habito_id, fecha, anterior, completado)
+                    for (habito_id, fecha, completado), anterior in zip(cambios, anteriores)
+                ], self.HOY)
+                for _, fecha, completado in cambios:
+                    (completadas.add if completado else completadas.discard)(fecha)
+
+                self.assertEqual(
+                    self._guardada(habito), self._esperada(habito, completadas),
+                    f'{habito.nombre}, paso {paso}: {cambios}'
+                )
+
+            recalcular_estadisticas([habito], self.HOY)
+            self.assertEqual(self._guardada(habito), self._esperada(habito, completadas))
+
+
+class ExportacionImportacionTests(MongoTestCase):
+    @classmethod
+    def crear_datos(cls):
+        salud = Categoria(nombre='salud').save()
+        habitos = [
+            Habito(usuario=cls.usuario, nombre='Caminar', tipo_frecuencia='Diario', categoria=salud,
+                   descripcion='30 minutos', dificultad='Baja', fecha_inicio=date(2025, 1, 1)),
+            Habito(usuario=cls.usuario, nombre='Gimnasio', tipo_frecuencia='Semanal',
+                   dias=['Lunes', 'Miércoles', 'Viernes'], color='#ff0000'),
+            Habito(usuario=cls.usuario, nombre='Pagar cuentas', tipo_frecuencia='Mensual', dias=[1, 15]),
+        ]
+        inicio = date(2025, 3, 1)
+        for i, habito in enumerate(habitos):
+            habito.save()
+            for dia in range(10):
+                RegistroHabito(habito=habito, fecha=inicio + timedelta(days=dia), estado=(dia + i) % 3 != 0).save()
+
+    def _exportar(self, formato, usuario):
+        return b''.join(EXPORTADORES[formato](usuario.id))
+
+    def _importar(self, formato, contenido):
+        usuario = Usuario(nombre='Destino', correo=f'{formato}@rutinia.test').save()
+        lineas = list(Importacion(usuario.id).procesar(LECTORES[formato](io.BytesIO(contenido))))
+        resumen = orjson.loads(lineas[-1])
+        self.assertEqual((resumen['tipo'], resumen['errores']), ('resumen', 0), lineas)
+        return usuario
+
+    def _programacion(self, usuario):
+        return {
+            habito.nombre: (habito.tipo_frecuencia, habito.dias, habito.frecuencia,
+                            habito.mascara_semana, habito.mascara_mes)
+            for habito in Habito.objects(usuario=usuario)
+        }
+
+    def test_ndjson(self):
+        exportado = self._exportar('ndjson', self.usuario)
+        destino = self._importar('ndjson', exportado)
+        reexportado = self._exportar('ndjson', destino)
+
+        def sin_ids(contenido):
+            filas = [orjson.loads(linea) for linea in contenido.splitlines()]
+            for fila in filas:
+                fila.pop('id', None)
+                fila.pop('habito_id', None)
+            return filas
+
+        self.assertEqual(len(sin_ids(exportado)), 3 + 30)
+        self.assertEqual(sin_ids(reexportado), sin_ids(exportado))
+        self.assertEqual(self._programacion(destino), self._programacion(self.usuario))
+
+    def test_csv(self):
+        exportado = self._exportar('csv', self.usuario)
+        destino = self._importar('csv', exportado)
+        reexportado = self._exportar('csv', destino)
+
+        def sin_ids(contenido):
+            filas = list(csv.DictReader(io.StringIO(contenido.decode('utf-8-sig'))))
+            for fila in filas:
+                del fila['habito_id']
+            return filas
+
+        filas = sin_ids(exportado)
+        self.assertEqual(len(filas), 30)
+        self.assertEqual({fila['dias'] for fila in filas}, {'', 'Lunes|Miércoles|Viernes', '1|15'})
+        self.assertEqual(sin_ids(reexportado), filas)
+        # Los días vuelven como lista (no como la celda "Lunes|Miércoles|Viernes")
+        self.assertEqual(self._programacion(destino), self._programacion(self.usuario))
@@ -1,5 +1,5 @@
 from rest_framework.routers import DefaultRouter
-from .views import UsuarioViewSet, ToolViewSet, RolViewSet, HabitoViewSet, CategoriaViewSet, RegistroHabitoViewSet, HistorialNotificacionViewSet
+from .views import UsuarioViewSet, ToolViewSet, RolViewSet, HabitoViewSet, CategoriaViewSet, RegistroHabitoViewSet, HistorialNotificacionViewSet, eventos_notificaciones, ticket_eventos, estadisticas_cache, exportar, importar
 from .authentication import register, login, refresh_token, get_user_info, logout
 from django.urls import path, include
 
@@ -13,7 +13,13 @@ router.register(r'registros', RegistroHabitoViewSet, basename='registro')
 router.register(r'notificaciones', HistorialNotificacionViewSet, basename='notificacion')
 
 urlpatterns = [
+    # Antes del router: si no, 'eventos' se toma como id de una notificación
+    path('notificaciones/eventos/', eventos_notificaciones, name='eventos_notificaciones'),
+    path('notificaciones/eventos/ticket/', ticket_eventos, name='ticket_eventos'),
     path('', include(router.urls)),
+    path('cache/estadisticas/', estadisticas_cache, name='estadisticas_cache'),
+    path('export/', exportar, name='exportar'),
+    path('import/', importar, name='importar'),
     # Endpoints de autenticación
     path('auth/register/', register, name='register'),
     path('auth/login/', login, name='login'),
@@ -0,0 +1,138 @@
+"""
+Versión de los datos de cada usuario y GET condicional (ETag / If-None-Match).
+
+Cada escritura en los Habito, RegistroHabito o HistorialNotificacion de un
+usuario incrementa su contador en VersionDatos ($inc atómico, un documento
+por usuario). Los listados y el progreso derivan su ETag de esa versión,
+de la de las categorías (ver core/referencias.py), del día actual (el
+progreso depende de hoy) y de la URL; si el cliente envía el mismo ETag en
+If-None-Match la respuesta es 304 sin ejecutar la consulta ni el
+serializer. Comprobarlo cuesta una lectura por _id.
+"""
+import hashlib
+from datetime import date
+from functools import wraps
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Habito, VersionDatos
+from .referencias import categorias
+
+
+def _ids(valores):
+    return {ObjectId(getattr(valor, 'id', valor)) for valor in valores if valor is not None}
+
+
+def incrementar_version(usuario_ids):
+    """Marca como modificados los datos de los usuarios indicados"""
+    coleccion = VersionDatos._get_collection()
+    for usuario_id in _ids(usuario_ids):
+        try:
+            coleccion.update_one({'_id': usuario_id}, {'$inc': {'version': 1}}, upsert=True)
+        except DuplicateKeyError:
+            # Dos upserts simultáneos del primer cambio: el otro ya creó el documento
+            coleccion.update_one({'_id': usuario_id}, {'$inc': {'version': 1}})
+
+
+def usuarios_de_habitos(habito_ids):
+    """Dueños de los hábitos indicados (una consulta)"""
+    habito_ids = list(_ids(habito_ids))
+    if not habito_ids:
+        return []
+    return Habito.objects(id__in=habito_ids).distinct('usuario')
+
+
+def incrementar_version_habitos(habito_ids):
+    incrementar_version(usuarios_de_habitos(habito_ids))
+
+
+def versiones(usuario_ids):
+    """{usuario_id: version} (0 si el usuario todavía no tiene cambios)"""
+    usuario_ids = _ids(usuario_ids)
+    encontradas = {
+        documento['_id']: documento['version']
+        for documento in VersionDatos._get_collection().find({'_id': {'$in': list(usuario_ids)}})
+    }
+    return {usuario_id: encontradas.get(usuario_id, 0) for usuario_id in usuario_ids}
+
+
+def usuarios_de_peticion(vista, request, kwargs):
+    """
+    Usuarios cuyos datos determinan la respuesta: ?usuario=, los dueños de
+    ?habito=/?habitos= o del hábito de la URL, o el usuario autenticado.
+    None si no se puede determinar (la respuesta se sirve sin ETag).
+
+    Un listado sin filtro de usuario solo se limita al usuario autenticado
+    si la vista lo declara con `listado_del_usuario`; los demás devuelven
+    documentos de todos los usuarios y no tienen una versión que los cubra.
+    """
+    params = request.query_params
+    if params.get('usuario'):
+        return [params['usuario']] if ObjectId.is_valid(params['usuario']) else None
+
+    habito_ids = [i.strip() for i in params.get('habitos', '').split(',') if i.strip()]
+    if params.get('habito'):
+        habito_ids.append(params['habito'])
+    if kwargs.get('id') and getattr(vista, 'modelo_rapido', None) is Habito:
+        habito_ids.append(kwargs['id'])
+    if habito_ids:
+        if not all(ObjectId.is_valid(i) for i in habito_ids):
+            return None
+        return usuarios_de_habitos(habito_ids) or None
+
+    if getattr(vista, 'action', None) == 'list' and not getattr(vista, 'listado_del_usuario', False):
+        return None
+    return [request.user.id] if getattr(request.user, 'id', None) else None
+
+
+def _firma(versiones_usuarios):
+    return ','.join(f'{usuario_id}:{version}' for usuario_id, version in sorted(versiones_usuarios.items()))
+
+
+def generacion_datos(request):
+    """
+    Firma de las versiones que leyó con_etag en esta petición, o None si la
+    vista no las leyó. Es la generación del cache de progreso
+    (core/cache_progreso.py): cambia en todos los procesos con cada escritura.
+    """
+    versiones_usuarios = getattr(request, 'versiones_datos', None)
+    return _firma(versiones_usuarios) if versiones_usuarios else None
+
+
+def calcular_etag(request, versiones_usuarios):
+    firma = _firma(versiones_usuarios)
+    # Los hábitos muestran el nombre de su categoría, que es compartida entre usuarios
+    firma += f'|categorias:{categorias.version()}'
+    clave = f'{firma}|{date.today()}|{request.get_full_path()}|{request.accepted_media_type}'
+    return 'W/"' + hashlib.sha1(clave.encode()).hexdigest()[:20] + '"'
+
+
+def con_etag(metodo):
+    """
+    Decorador para acciones GET de los ViewSets: responde 304 si el ETag
+    enviado en If-None-Match coincide con la versión actual de los datos.
+    """
+    @wraps(metodo)
+    def envoltura(self, request, *args, **kwargs):
+        usuario_ids = usuarios_de_peticion(self, request, kwargs)
+        if not usuario_ids:
+            return metodo(self, request, *args, **kwargs)
+
+        # La vista puede reutilizarlas (generacion_datos) sin volver a leerlas
+        request.versiones_datos = versiones(usuario_ids)
+        etag = calcular_etag(request, request.versiones_datos)
+        enviados = [valor.strip() for valor in request.headers.get('If-None-Match', '').split(',')]
+        if etag in enviados:
+            respuesta = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            respuesta = metodo(self, request, *args, **kwargs)
+            if respuesta.status_code != status.HTTP_200_OK:
+                return respuesta
+        respuesta['ETag'] = etag
+        # El navegador guarda la respuesta pero la revalida siempre
+        respuesta['Cache-Control'] = 'private, no-cache'
+        return respuesta
+    return envoltura
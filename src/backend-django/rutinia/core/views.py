@@ -3,34 +3,74 @@ from django.shortcuts import render
 #Librerias para el manejo de timepo y fechas
 from datetime import datetime, timedelta, date
 import calendar
+import asyncio
 
 # MongoDB ObjectId
 from bson import ObjectId
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
 # Create your views here.
 #from rest_framework import viewsets, status
 from rest_framework_mongoengine import viewsets
-from rest_framework import status
+from rest_framework import serializers, status
 
 #Librerias rest
 from rest_framework.response import Response
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from .models import Usuario, Habito, RegistroHabito, Rol, Categoria, Notificacion, HistorialNotificacion, Tool
 from .serializers import UsuarioSerializer, RolSerializer, HabitoSerializer, CategoriaSerializer, RegistroHabitoSerializer, ToolSerializer, NotificacionSerializer, HistorialNotificacionSerializer
 
 from .pagination import HabitoPagination
+from .prefetch import PrefetchReferenciasMixin, SerializacionRapidaMixin
+from .registros import marcar_registro, marcar_registros, inicializar_registros
+from .estadisticas import actualizar_estadisticas, leer_estadisticas
+from .programacion import filtro_aplica_en
+from .busqueda import filtro_prefijo, normalizar_correo
+from .versiones import con_etag, generacion_datos, incrementar_version, incrementar_version_habitos
+from .cache_progreso import cache_progreso
+from .referencias import ListadoReferenciasMixin, categorias, roles, tools
+from .eventos import canal, contar_no_leidas, emitir_ticket, usuario_de_ticket
+from .exportacion import EXPORTADORES, FORMATOS, iterar_en_hilo
+from .importacion import Importacion, LECTORES, FORMATOS as FORMATOS_IMPORTACION
+from .jwt_auth import MongoJWTAuthentication, cache_usuarios
+from .progreso import (
+    rango_semana, rango_mes, rango_periodo, total_semanal, total_mensual, porcentaje,
+    completados_por_habito, calcular_progreso, calendario
+)
+
+# Máximo de elementos aceptados por RegistroHabitoViewSet.bulk_toggle
+MAX_BULK_REGISTROS = 1000
+# Máximo de días que cubre HabitoViewSet.calendario
+MAX_DIAS_CALENDARIO = 366 * 3
+
 
+def _completado(valor):
+    """
+    'completado' del body como bool con las reglas de DRF (true/false,
+    "true"/"false", 1/0, "1"/"0"...). Lanza ValidationError si no es booleano.
+    """
+    return serializers.BooleanField().to_internal_value(valor)
 
-class RolViewSet(viewsets.ModelViewSet):
+
+class RolViewSet(ListadoReferenciasMixin, viewsets.ModelViewSet):
     queryset = Rol.objects.all()
     serializer_class = RolSerializer
     permission_classes = [IsAuthenticated]
+    cache_referencias = roles
 
 
 class UsuarioViewSet(viewsets.ModelViewSet):
+    # El rol de cada usuario se resuelve con el cache de referencias (ver UsuarioSerializer)
     serializer_class = UsuarioSerializer
     permission_classes = [IsAuthenticated]
+    campos_ordenables = ['nombre', 'correo', 'apellido', 'tema']
     
     def get_queryset(self):
         queryset = Usuario.objects.all()
@@ -44,61 +84,139 @@ class UsuarioViewSet(viewsets.ModelViewSet):
         if rol:
             queryset = queryset.filter(rol=rol)
         
+        # Prefijos anclados sobre campos normalizados e indexados (correo ya se guarda en minúsculas)
         if correo:
-            queryset = queryset.filter(correo__icontains=correo) #Para buscar por palabras similares
+            queryset = queryset.filter(__raw__={'correo': filtro_prefijo(correo, normalizar_correo)})
        
         if tema:
             queryset = queryset.filter(tema=tema)
       
         if nombre:
-            queryset = queryset.filter(nombre__icontains=nombre)
+            queryset = queryset.filter(__raw__={'nombre_normalizado': filtro_prefijo(nombre)})
      
         if apellido:
-            queryset = queryset.filter(apellido__icontains=apellido)
+            queryset = queryset.filter(__raw__={'apellido_normalizado': filtro_prefijo(apellido)})
 
         #Ordenamiento
         ordering = self.request.query_params.get('ordering')  
         if ordering:
-            allowed_fields = ['nombre', 'correo', 'apellido', 'tema']
             field = ordering.lstrip('-')  # Quita el "-" si es descendente
 
-            if field in allowed_fields:
+            if field in self.campos_ordenables:
                 queryset = queryset.order_by(ordering)
             else:
                 pass
 
         return queryset
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(ListadoReferenciasMixin, viewsets.ModelViewSet):
     queryset = Categoria.objects.all()
     serializer_class = CategoriaSerializer
     permission_classes = [IsAuthenticated]
+    cache_referencias = categorias
 
-class RegistroHabitoViewSet(viewsets.ModelViewSet):
+class RegistroHabitoViewSet(SerializacionRapidaMixin, PrefetchReferenciasMixin, viewsets.ModelViewSet):
     #queryset = RegistroHabito.objects.all()
     serializer_class = RegistroHabitoSerializer
     permission_classes = [IsAuthenticated]
+    prefetch_referencias = {'habito': ('nombre', 'icono', 'color')}
+    modelo_rapido = RegistroHabito
 
     def get_queryset(self):
+        """
+        Filtros (query params):
+            habito: ID de un hábito
+            habitos: IDs de hábitos separados por coma
+            usuario: ID del usuario dueño de los hábitos
+            desde, hasta: rango de fechas YYYY-MM-DD (incluidos)
+            estado: true/false
+        Todos se resuelven en una sola consulta sobre el índice (habito, fecha).
+        """
         queryset = RegistroHabito.objects.all()
-        id_habito = self.request.query_params.get('habito')
+        params = self.request.query_params
+        id_habito = params.get('habito')
+        ids_habitos = params.get('habitos')
+        usuario = params.get('usuario')
+        desde = params.get('desde')
+        hasta = params.get('hasta')
+        estado = params.get('estado')
 
-        if id_habito:
-            try:
-                # Convertir string a ObjectId para MongoEngine
-                habito_obj = Habito.objects.get(id=ObjectId(id_habito))
-                queryset = queryset.filter(habito=habito_obj)
-            except (Habito.DoesNotExist, Exception):
-                # Si el hábito no existe o el ID es inválido, devolver queryset vacío
-                return RegistroHabito.objects.none()
-        
-        return queryset
+        try:
+            habito_ids = None
+            if id_habito:
+                habito_ids = {ObjectId(id_habito)}
+            if ids_habitos:
+                ids = {ObjectId(i.strip()) for i in ids_habitos.split(',') if i.strip()}
+                habito_ids = ids if habito_ids is None else habito_ids & ids
+            if usuario:
+                propios = set(Habito.objects(usuario=ObjectId(usuario)).scalar('id'))
+                habito_ids = propios if habito_ids is None else habito_ids & propios
+
+            if habito_ids is not None:
+                queryset = queryset.filter(habito__in=list(habito_ids))
+            if desde:
+                queryset = queryset.filter(fecha__gte=datetime.strptime(desde, '%Y-%m-%d').date())
+            if hasta:
+                queryset = queryset.filter(fecha__lte=datetime.strptime(hasta, '%Y-%m-%d').date())
+        except Exception:
+            # Si algún ID o fecha es inválido, devolver queryset vacío
+            return RegistroHabito.objects.none()
+
+        if estado is not None:
+            queryset = queryset.filter(estado=(estado.lower() == 'true'))
+
+        return queryset.only('id', 'habito', 'fecha', 'estado')
+
+    # El CRUD de registros también mantiene EstadisticaHabito
+    def perform_create(self, serializer):
+        registro = serializer.save()
+        actualizar_estadisticas([(_habito_de(registro), registro.fecha, None, registro.estado)])
+        _registros_cambiados([_habito_de(registro)])
+
+    def perform_update(self, serializer):
+        anterior = serializer.instance
+        habito_anterior, fecha_anterior, estado_anterior = _habito_de(anterior), anterior.fecha, anterior.estado
+        registro = serializer.save()
+        habito, fecha = _habito_de(registro), registro.fecha
+        if (habito, fecha) == (habito_anterior, fecha_anterior):
+            actualizar_estadisticas([(habito, fecha, estado_anterior, registro.estado)])
+        else:
+            actualizar_estadisticas([
+                (habito_anterior, fecha_anterior, estado_anterior, False),
+                (habito, fecha, None, registro.estado),
+            ])
+        _registros_cambiados({habito_anterior, habito})
+
+    def perform_destroy(self, instance):
+        habito, fecha, estado = _habito_de(instance), instance.fecha, instance.estado
+        instance.delete()
+        actualizar_estadisticas([(habito, fecha, estado, False)])
+        _registros_cambiados([habito])
+
+    @con_etag
+    def list(self, request, *args, **kwargs):
+        """
+        Con ?formato=mapa devuelve directamente {fecha: [habitoId, ...]} con los
+        registros completados (o con el estado indicado en ?estado=).
+        """
+        if request.query_params.get('formato') != 'mapa':
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.get_queryset()
+        if request.query_params.get('estado') is None:
+            queryset = queryset.filter(estado=True)
+
+        mapa = {}
+        for registro in queryset.only('habito', 'fecha').as_pymongo():
+            fecha = registro['fecha'].strftime('%Y-%m-%d')
+            mapa.setdefault(fecha, []).append(str(registro['habito']))
+        return Response(mapa)
     
     @action(detail=False, methods=['post'])
     def toggle_completado(self, request):
         """
         Marca o desmarca un hábito como completado para una fecha específica.
-        Previene duplicados.
+        Previene duplicados con un upsert atómico sobre (habito, fecha).
         
         Body: {
             "habito_id": "68ea57f5fc52f3058c8233ab",
@@ -108,13 +226,20 @@ class RegistroHabitoViewSet(viewsets.ModelViewSet):
         """
         habito_id = request.data.get('habito_id')
         fecha_str = request.data.get('fecha')
-        completado = request.data.get('completado', True)
         
         if not habito_id or not fecha_str:
             return Response(
                 {"error": "Se requieren habito_id y fecha"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        try:
+            completado = _completado(request.data.get('completado', True))
+        except serializers.ValidationError:
+            return Response(
+                {"error": "completado debe ser true o false"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Parsear fecha
         try:
@@ -125,58 +250,210 @@ class RegistroHabitoViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Buscar hábito
-        try:
-            habito = Habito.objects.get(id=ObjectId(habito_id))
-        except Habito.DoesNotExist:
+        # Verificar el hábito trayendo solo su nombre (sin cargar el documento)
+        habito = None
+        if ObjectId.is_valid(habito_id):
+            habito = Habito.objects(id=ObjectId(habito_id)).only('nombre', 'usuario').as_pymongo().first()
+        if not habito:
             return Response(
                 {"error": "Hábito no encontrado"},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Buscar o crear registro (prevenir duplicados)
-        registro_existente = RegistroHabito.objects(
-            habito=habito,
-            fecha=fecha
-        ).first()
+        # Upsert atómico: un único registro por (hábito, fecha)
+        registro_id, creado, anterior = marcar_registro(habito['_id'], fecha, completado)
+        actualizar_estadisticas([(habito['_id'], fecha, anterior, completado)])
+        _registros_cambiados([habito['_id']], [habito.get('usuario')])
         
-        if registro_existente:
-            # Actualizar registro existente
-            registro_existente.estado = completado
-            registro_existente.save()
-            
-            return Response({
-                "mensaje": "Registro actualizado",
-                "registro": {
-                    "id": str(registro_existente.id),
-                    "habito": habito.nombre,
-                    "fecha": str(fecha),
-                    "estado": completado
-                }
-            })
-        else:
-            # Crear nuevo registro
-            nuevo_registro = RegistroHabito(
-                habito=habito,
-                fecha=fecha,
-                estado=completado
+        return Response({
+            "mensaje": "Registro creado" if creado else "Registro actualizado",
+            "registro": {
+                "id": str(registro_id),
+                "habito": habito.get('nombre'),
+                "fecha": str(fecha),
+                "estado": completado
+            }
+        }, status=status.HTTP_201_CREATED if creado else status.HTTP_200_OK)
+
+
+    @action(detail=False, methods=['post'])
+    def bulk_toggle(self, request):
+        """
+        Marca o desmarca varios (hábito, fecha) en una sola petición.
+        Usado por el calendario y para reenviar cambios hechos sin conexión.
+
+        Body: [
+            {"habito_id": "68ea57f5fc52f3058c8233ab", "fecha": "2025-10-12", "completado": true},
+            ...
+        ]
+        (también se acepta {"registros": [...]})
+        Un "completado" que no es booleano devuelve 400 sin aplicar nada.
+        """
+        items = request.data.get('registros') if isinstance(request.data, dict) else request.data
+
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"error": "Se requiere una lista de registros"},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            nuevo_registro.save()
-            
-            return Response({
-                "mensaje": "Registro creado",
-                "registro": {
-                    "id": str(nuevo_registro.id),
-                    "habito": habito.nombre,
-                    "fecha": str(fecha),
-                    "estado": completado
+        if len(items) > MAX_BULK_REGISTROS:
+            return Response(
+                {"error": f"Máximo {MAX_BULK_REGISTROS} registros por petición"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Un 'completado' que no es booleano rechaza la petición completa: con
+        # bool() "false" o "0" marcarían el hábito como completado
+        completados = {}
+        for indice, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            try:
+                completados[indice] = _completado(item.get('completado', True))
+            except serializers.ValidationError:
+                return Response(
+                    {"error": f"completado debe ser true o false (registro {indice})"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        resultados = [None] * len(items)
+        validos = {}  # (habito_id, fecha) -> (índice, estado); el último gana
+
+        for indice, item in enumerate(items):
+            if not isinstance(item, dict):
+                resultados[indice] = {"indice": indice, "error": "Formato inválido"}
+                continue
+
+            habito_id = item.get('habito_id')
+            fecha_str = item.get('fecha')
+            completado = completados[indice]
+            base = {"indice": indice, "habito_id": habito_id, "fecha": fecha_str}
+
+            if not habito_id or not fecha_str:
+                resultados[indice] = {**base, "error": "Se requieren habito_id y fecha"}
+                continue
+            if not ObjectId.is_valid(habito_id):
+                resultados[indice] = {**base, "error": "Hábito no encontrado"}
+                continue
+            try:
+                fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+            except (TypeError, ValueError):
+                resultados[indice] = {**base, "error": "Formato de fecha inválido. Use YYYY-MM-DD"}
+                continue
+
+            clave = (ObjectId(habito_id), fecha)
+            if clave in validos:
+                anterior = validos[clave][0]
+                resultados[anterior] = {
+                    "indice": anterior, "habito_id": habito_id, "fecha": fecha_str,
+                    "error": "Duplicado en la petición (se aplicó el último)"
                 }
-            }, status=status.HTTP_201_CREATED)
+            validos[clave] = (indice, completado)
+
+        # Validar que todos los hábitos pertenecen al usuario con una sola consulta
+        habito_ids = {habito_id for habito_id, _ in validos}
+        propios = set(
+            Habito.objects(id__in=list(habito_ids), usuario=request.user.id).scalar('id')
+        ) if habito_ids else set()
+
+        cambios = []
+        indices = []
+        for (habito_id, fecha), (indice, completado) in validos.items():
+            if habito_id not in propios:
+                resultados[indice] = {
+                    "indice": indice, "habito_id": str(habito_id), "fecha": str(fecha),
+                    "error": "Hábito no encontrado"
+                }
+                continue
+            cambios.append((habito_id, fecha, completado))
+            indices.append(indice)
+
+        escritos = marcar_registros(cambios)
+        actualizar_estadisticas([
+            (habito_id, fecha, escrito["anterior"], completado)
+            for (habito_id, fecha, completado), escrito in zip(cambios, escritos)
+            if not escrito["error"]
+        ])
+        aplicados_ids = {
+            habito_id for (habito_id, _, _), escrito in zip(cambios, escritos) if not escrito["error"]
+        }
+        if aplicados_ids:
+            _registros_cambiados(aplicados_ids, [request.user.id])
+
+        for indice, (habito_id, fecha, completado), escrito in zip(indices, cambios, escritos):
+            resultado = {
+                "indice": indice,
+                "habito_id": str(habito_id),
+                "fecha": str(fecha),
+                "estado": completado,
+            }
+            if escrito["error"]:
+                resultado["error"] = escrito["error"]
+            else:
+                resultado["creado"] = escrito["creado"]
+                if escrito["id"]:
+                    resultado["id"] = str(escrito["id"])
+            resultados[indice] = resultado
+
+        aplicados = sum(1 for r in resultados if "error" not in r)
+        return Response({
+            "mensaje": f"{aplicados} de {len(items)} registros aplicados",
+            "aplicados": aplicados,
+            "errores": len(items) - aplicados,
+            "resultados": resultados
+        })
+
+
+    @action(detail=False, methods=['post'])
+    def inicializar_dia(self, request):
+        """
+        Crea los registros del día (en false) que falten para los hábitos
+        activos que aplican en la fecha (los mismos que /habitos/hoy/) y
+        devuelve el estado de cada uno.
+
+        Query params:
+            usuario: ID del usuario (por defecto, el usuario autenticado)
+            fecha: YYYY-MM-DD (por defecto hoy)
+        """
+        usuario_id = request.query_params.get('usuario') or str(request.user.id)
+        fecha_str = request.query_params.get('fecha')
+
+        if not ObjectId.is_valid(usuario_id):
+            return Response(
+                {"error": "ID de usuario inválido"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date() if fecha_str else date.today()
+        except ValueError:
+            return Response(
+                {"error": "Formato de fecha inválido. Use YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        # El índice de la programación normalizada resuelve el filtro en MongoDB
+        habito_ids = list(Habito.objects(
+            usuario=ObjectId(usuario_id), activo=True, __raw__=filtro_aplica_en(fecha)
+        ).scalar('id'))
+        estados, creados = inicializar_registros(habito_ids, fecha)
+        if creados:
+            _registros_cambiados(habito_ids, [usuario_id])
 
-class HabitoViewSet(viewsets.ModelViewSet):
+        return Response({
+            "fecha": str(fecha),
+            "habitos": len(habito_ids),
+            "estados": {str(habito_id): estado for habito_id, estado in estados.items()}
+        })
+
+
+class HabitoViewSet(SerializacionRapidaMixin, PrefetchReferenciasMixin, viewsets.ModelViewSet):
     serializer_class = HabitoSerializer
     permission_classes = [IsAuthenticated]
+    # La categoría se resuelve con el cache de referencias (ver HabitoSerializer)
+    prefetch_referencias = {'usuario': ('id',)}
+    modelo_rapido = Habito
+    campos_ordenables = ['nombre', 'dificultad', 'fecha_inicio']
     #pagination_class = HabitoPagination
 
     def get_queryset(self):
@@ -203,141 +480,510 @@ class HabitoViewSet(viewsets.ModelViewSet):
                 return Habito.objects.none()
         
         if categoria:
-            try:
-                # Convertir string a ObjectId para MongoEngine
-                categoria_obj = Categoria.objects.get(id=ObjectId(categoria))
+            categoria_obj = categorias.obtener(categoria)
+            if categoria_obj is not None:
                 queryset = queryset.filter(categoria=categoria_obj)
-            except (Categoria.DoesNotExist, Exception):
-                pass
+        # Igualdad/prefijo sobre las copias normalizadas (indexadas) en lugar de icontains
         if dificultad:
-            queryset = queryset.filter(dificultad__icontains=dificultad)
+            queryset = queryset.filter(__raw__={'dificultad_normalizada': filtro_prefijo(dificultad)})
         if publico is not None:
             queryset = queryset.filter(publico=(publico.lower() == 'true'))
         if activo is not None:
             queryset = queryset.filter(activo=(activo.lower() == 'true'))
         if tipo_frecuencia:
-            queryset = queryset.filter(tipo_frecuencia__icontains=tipo_frecuencia)
+            queryset = queryset.filter(__raw__={'tipo_frecuencia_normalizado': filtro_prefijo(tipo_frecuencia)})
         if nombre:
-            queryset = queryset.filter(nombre__icontains=nombre)
-        if descripcion:
-            queryset = queryset.filter(descripcion__icontains=descripcion)
+            queryset = queryset.filter(__raw__={'nombre_normalizado': filtro_prefijo(nombre)})
+
+        # Búsqueda por palabras en nombre y descripción con el índice de texto,
+        # ordenada por relevancia salvo que se pida otro orden
+        busqueda = ' '.join(texto for texto in (self.request.query_params.get('q'), descripcion) if texto)
+        if busqueda:
+            queryset = queryset.search_text(busqueda)
+            if self._orden_por_relevancia():
+                queryset = queryset.order_by('$text_score').limit(settings.PAGINACION_TAMANO_MAXIMO)
+
         ordering = self.request.query_params.get('ordering')  # Ejemplo: ?ordering=-fecha_inicio
         
         if ordering:
-            allowed_fields = [
-                'nombre',
-                'dificultad',
-                'fecha_inicio'
-            ]
             field = ordering.lstrip('-')
-            if field in allowed_fields:
+            if field in self.campos_ordenables:
                 queryset = queryset.order_by(ordering)
 
         return queryset
+
+    def _orden_por_relevancia(self):
+        """True si el listado es una búsqueda (?q= o ?descripcion=) sin ?ordering= válido"""
+        params = self.request.query_params
+        ordering = params.get('ordering') or ''
+        return bool(params.get('q') or params.get('descripcion')) and ordering.lstrip('-') not in self.campos_ordenables
+
+    def paginate_queryset(self, queryset):
+        # El orden por relevancia ($text_score) no se puede continuar con un
+        # cursor: la búsqueda devuelve la lista sin paginar, con los
+        # PAGINACION_TAMANO_MAXIMO resultados más relevantes
+        if self._orden_por_relevancia():
+            return None
+        return super().paginate_queryset(queryset)
+
+    @con_etag
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @con_etag
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
-    @action(detail=True, methods=['get'])
-    def progreso_semanal(self, request, id=None):
-        """Calcula el progreso del hábito en la semana actual (lunes a domingo)."""
-        habito = self.get_object()
+    @action(detail=False, methods=['get'])
+    @con_etag
+    def progreso(self, request):
+        """
+        Progreso semanal y/o mensual de todos los hábitos de un usuario
+        en una sola llamada.
+
+        Query params:
+            usuario: ID del usuario (por defecto, el usuario autenticado)
+            periodo: "semana", "mes" o "semana,mes" (por defecto ambos)
+        """
+        usuario_id = request.query_params.get('usuario') or str(request.user.id)
+        periodos = request.query_params.get('periodo', 'semana,mes').split(',')
+        periodos = [p.strip() for p in periodos if p.strip()]
+
+        if not periodos or any(p not in ('semana', 'mes') for p in periodos):
+            return Response(
+                {"error": "Periodo inválido. Use 'semana', 'mes' o 'semana,mes'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            usuario_oid = ObjectId(usuario_id)
+        except Exception:
+            return Response(
+                {"error": "ID de usuario inválido"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         hoy = date.today()
+        rangos = {}
+        if 'semana' in periodos:
+            rangos['semana'] = rango_semana(hoy)
+        if 'mes' in periodos:
+            rangos['mes'] = rango_mes(hoy)
+
+        habitos = list(
+            Habito.objects(usuario=usuario_oid).only('id', 'nombre', 'tipo_frecuencia', 'dias')
+        )
+        # Mismas entradas de cache que progreso_semanal y progreso_mensual
+        anclas = {'semana': rangos.get('semana', (None,))[0], 'mes': hoy}
+        entradas = [(habito.id, periodo, anclas[periodo]) for habito in habitos for periodo in rangos]
+        consulta = cache_progreso.consultar(entradas, generacion_datos(request))
+
+        # Solo se calculan los hábitos con algún periodo fuera del cache
+        faltantes = [habito.id for habito in habitos if any(
+            (habito.id, periodo, anclas[periodo]) not in consulta.encontradas for periodo in rangos
+        )]
+        completados = completados_por_habito(faltantes, rangos) if faltantes else {}
 
-        # Calcular lunes y domingo de esta semana
-        inicio_semana = hoy - timedelta(days=hoy.weekday())  # lunes
-        fin_semana = inicio_semana + timedelta(days=6)        # domingo
+        resultado = []
+        calculados = {}
+        for habito in habitos:
+            conteos = completados.get(habito.id, {})
+            item = {"habito_id": str(habito.id)}
+            if 'semana' in rangos:
+                entrada = (habito.id, 'semana', anclas['semana'])
+                if entrada not in consulta.encontradas:
+                    inicio_semana, fin_semana = rangos['semana']
+                    calculados[entrada] = _progreso_semanal(
+                        habito, inicio_semana, fin_semana, conteos.get('semana', 0)
+                    )
+                item["semanal"] = consulta.encontradas.get(entrada) or calculados[entrada]
+            if 'mes' in rangos:
+                entrada = (habito.id, 'mes', anclas['mes'])
+                if entrada not in consulta.encontradas:
+                    inicio_mes, fin_mes = rangos['mes']
+                    calculados[entrada] = _progreso_mensual(
+                        habito, hoy, inicio_mes, fin_mes, conteos.get('mes', 0)
+                    )
+                item["mensual"] = consulta.encontradas.get(entrada) or calculados[entrada]
+            resultado.append(item)
+        consulta.guardar(calculados)
+
+        return Response(resultado)
+
+    @action(detail=False, methods=['get'])
+    @con_etag
+    def hoy(self, request):
+        """
+        Hábitos activos de un usuario que aplican en una fecha, resueltos con
+        una sola consulta sobre el índice de la programación normalizada.
+
+        Query params:
+            usuario: ID del usuario (por defecto, el usuario autenticado)
+            fecha: YYYY-MM-DD (por defecto hoy)
+        """
+        usuario_id = request.query_params.get('usuario') or str(request.user.id)
+        fecha_str = request.query_params.get('fecha')
+
+        if not ObjectId.is_valid(usuario_id):
+            return Response(
+                {"error": "ID de usuario inválido"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date() if fecha_str else date.today()
+        except ValueError:
+            return Response(
+                {"error": "Formato de fecha inválido. Use YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        registros = RegistroHabito.objects(
-            habito=habito,
-            fecha__gte=inicio_semana,
-            fecha__lte=fin_semana
+        habitos = Habito.objects(
+            usuario=ObjectId(usuario_id), activo=True, __raw__=filtro_aplica_en(fecha)
         )
-        # Calcular total según la frecuencia del hábito
-        if(str.capitalize(habito.tipo_frecuencia) == "Diario"):
-            total = 7
+        serializer = self.get_serializer(habitos, many=True)
+        return Response(serializer.data)
 
-        elif(str.capitalize(habito.tipo_frecuencia) == "Semanal"):
-            total = len(habito.dias)
-        
-        elif(str.capitalize(habito.tipo_frecuencia) == "Mensual"):
-            # Para hábitos mensuales: contar cuántos días configurados caen en la semana actual
-            if habito.dias and len(habito.dias) > 0:
-                total = 0
-                # Recorrer cada día de la semana
-                current_day = inicio_semana
-                while current_day <= fin_semana:
-                    dia_del_mes = current_day.day
-                    # Verificar si este día del mes está configurado en el hábito
-                    if dia_del_mes in habito.dias:
-                        total += 1
-                    current_day += timedelta(days=1)
-            else:
-                total = 0  # No hay días configurados
-        
-        else:
-            total = 0
+    @action(detail=False, methods=['get'])
+    @con_etag
+    def calendario(self, request):
+        """
+        Días completados y días programados de cada hábito de un usuario en un
+        rango, como mapas de bits en base64 (bit i = desde + i días, el bit
+        menos significativo de cada byte primero). Un año de 30 hábitos ocupa
+        unos pocos KB.
+
+        Query params:
+            usuario: ID del usuario (por defecto, el usuario autenticado)
+            desde, hasta: rango YYYY-MM-DD (por defecto, el mes actual)
+        """
+        usuario_id = request.query_params.get('usuario') or str(request.user.id)
+        desde_str = request.query_params.get('desde')
+        hasta_str = request.query_params.get('hasta')
+
+        try:
+            usuario_oid = ObjectId(usuario_id)
+            desde, hasta = rango_mes(date.today())
+            if desde_str:
+                desde = datetime.strptime(desde_str, '%Y-%m-%d').date()
+            if hasta_str:
+                hasta = datetime.strptime(hasta_str, '%Y-%m-%d').date()
+        except Exception:
+            return Response(
+                {"error": "Parámetros inválidos. Use usuario=<id> y desde/hasta YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if hasta < desde:
+            return Response(
+                {"error": "La fecha 'hasta' debe ser posterior a 'desde'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        dias = (hasta - desde).days + 1
+        if dias > MAX_DIAS_CALENDARIO:
+            return Response(
+                {"error": f"El rango no puede superar {MAX_DIAS_CALENDARIO} días"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        habitos = list(
+            Habito.objects(usuario=usuario_oid).only('id', 'tipo_frecuencia', 'dias')
+        )
 
-        completados = registros.filter(estado=True).count()
-        progreso = (completados / total * 100) if total > 0 else 0 #Por si total llega a ser 0
-        
         return Response({
-            "habito_id":str(habito.id),
-            "habito": habito.nombre,
-            "inicio_semana": inicio_semana,
-            "fin_semana":fin_semana,
-            "progreso_semanal": round(progreso, 2),
-            "completados": completados,
-            "total": total
+            "desde": desde,
+            "hasta": hasta,
+            "dias": dias,
+            "habitos": calendario(habitos, desde, hasta),
         })
+
+    @action(detail=False, methods=['get'])
+    @con_etag
+    def estadisticas(self, request):
+        """
+        Rachas (actual y máxima), total de completados, último día completado
+        y tasa de los últimos 30 días de los hábitos de un usuario.
+        Se leen de EstadisticaHabito sin recorrer los registros.
+
+        Query params:
+            usuario: ID del usuario (por defecto, el usuario autenticado)
+        """
+        usuario_id = request.query_params.get('usuario') or str(request.user.id)
+        try:
+            usuario_oid = ObjectId(usuario_id)
+        except Exception:
+            return Response(
+                {"error": "ID de usuario inválido"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        habitos = list(
+            Habito.objects(usuario=usuario_oid).only('id', 'nombre', 'tipo_frecuencia', 'dias', 'fecha_inicio')
+        )
+        estadisticas = leer_estadisticas(habitos)
+
+        return Response([
+            {"habito_id": str(habito.id), "nombre": habito.nombre, **estadisticas[habito.id]}
+            for habito in habitos
+        ])
+
+    @action(detail=True, methods=['get'])
+    @con_etag
+    def progreso_semanal(self, request, id=None):
+        """Calcula el progreso del hábito en la semana actual (lunes a domingo)."""
+        inicio_semana, fin_semana = rango_semana(date.today())
+        entrada = (id, 'semana', inicio_semana)
+        consulta = cache_progreso.consultar([entrada] if ObjectId.is_valid(id) else [], generacion_datos(request))
+        if entrada in consulta.encontradas:
+            return Response(consulta.encontradas[entrada])
+
+        habito = self.get_object()
+        progreso = calcular_progreso(
+            [habito], inicio_semana, fin_semana,
+            total=lambda h: total_semanal(h, inicio_semana, fin_semana)
+        )[habito.id]
+
+        datos = _progreso_semanal(habito, inicio_semana, fin_semana, progreso["completados"])
+        consulta.guardar({entrada: datos})
+        return Response(datos)
     
     @action(detail=True, methods=['get'])
+    @con_etag
     def progreso_mensual(self, request, id=None):
         """Calcula el progreso del hábito en el mes actual."""
-        habito = self.get_object()
         hoy = date.today()
+        entrada = (id, 'mes', hoy)
+        consulta = cache_progreso.consultar([entrada] if ObjectId.is_valid(id) else [], generacion_datos(request))
+        if entrada in consulta.encontradas:
+            return Response(consulta.encontradas[entrada])
 
-        # Calcular primer y último día del mes actual
-        inicio_mes = hoy.replace(day=1)
-        semanas_mes = calendar.monthcalendar(hoy.year, hoy.month)
-        _, ultimo_dia = calendar.monthrange(hoy.year, hoy.month)
-        fin_mes = hoy.replace(day=ultimo_dia)
+        habito = self.get_object()
+        inicio_mes, fin_mes = rango_mes(hoy)
+        progreso = calcular_progreso(
+            [habito], inicio_mes, fin_mes,
+            total=lambda h: total_mensual(h, hoy)
+        )[habito.id]
 
-        registros = RegistroHabito.objects(
-            habito=habito,
-            fecha__gte=inicio_mes,
-            fecha__lte=fin_mes
-        )
+        datos = _progreso_mensual(habito, hoy, inicio_mes, fin_mes, progreso["completados"])
+        consulta.guardar({entrada: datos})
+        return Response(datos)
 
-        # Calcular total según la frecuencia del hábito
-        if(str.capitalize(habito.tipo_frecuencia) == "Diario"):
-            total = ultimo_dia
+    @action(detail=True, methods=['get'])
+    @con_etag
+    def progreso_rango(self, request, id=None):
+        """
+        Calcula el progreso del hábito en cualquier rango de fechas.
 
-        elif(str.capitalize(habito.tipo_frecuencia) == "Semanal"):
-            total = len(habito.dias) * len(semanas_mes)
-        
-        elif(str.capitalize(habito.tipo_frecuencia) == "Mensual"):
-            # Para hábitos mensuales: contar cuántos días configurados hay en el mes
-            if habito.dias and len(habito.dias) > 0:
-                # Filtrar días que sean válidos para el mes actual
-                dias_validos = [dia for dia in habito.dias if isinstance(dia, int) and 1 <= dia <= ultimo_dia]
-                total = len(dias_validos)
+        Query params:
+            periodo: "semana", "mes" o "trimestre" (relativo a `fecha`, por defecto hoy)
+            desde, hasta: rango personalizado YYYY-MM-DD (tiene prioridad sobre periodo)
+        """
+        habito = self.get_object()
+        desde_str = request.query_params.get('desde')
+        hasta_str = request.query_params.get('hasta')
+        periodo = request.query_params.get('periodo', 'semana')
+        fecha_str = request.query_params.get('fecha')
+
+        try:
+            if desde_str or hasta_str:
+                if not (desde_str and hasta_str):
+                    return Response(
+                        {"error": "Se requieren desde y hasta"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                desde = datetime.strptime(desde_str, '%Y-%m-%d').date()
+                hasta = datetime.strptime(hasta_str, '%Y-%m-%d').date()
+                periodo = 'personalizado'
             else:
-                total = 1  # Fallback si no hay días configurados
-        
-        else: 
-            total = 0
+                ancla = datetime.strptime(fecha_str, '%Y-%m-%d').date() if fecha_str else date.today()
+                desde, hasta = rango_periodo(periodo, ancla)
+        except ValueError:
+            return Response(
+                {"error": "Parámetros inválidos. Use periodo=semana|mes|trimestre o desde/hasta YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        completados = registros.filter(estado=True).count()
-        progreso = (completados / total * 100) if total > 0 else 0
+        if hasta < desde:
+            return Response(
+                {"error": "La fecha 'hasta' debe ser posterior a 'desde'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        entrada = (habito.id, 'rango', f'{desde}:{hasta}')
+        consulta = cache_progreso.consultar([entrada], generacion_datos(request))
+        progreso = consulta.encontradas.get(entrada)
+        if progreso is None:
+            progreso = calcular_progreso([habito], desde, hasta)[habito.id]
+            consulta.guardar({entrada: progreso})
 
         return Response({
+            "habito_id": str(habito.id),
             "habito": habito.nombre,
-            "inicio_mes": inicio_mes,
-            "fin_mes": fin_mes,
-            "progreso_mensual": round(progreso, 2),
-            "registros_totales": total,
-            "completados": completados,
-            "total": total
+            "periodo": periodo,
+            "desde": desde,
+            "hasta": hasta,
+            "progreso": progreso["progreso"],
+            "completados": progreso["completados"],
+            "total": progreso["total"]
         })
 
+
+def _progreso_semanal(habito, inicio_semana, fin_semana, completados):
+    total = total_semanal(habito, inicio_semana, fin_semana)
+    return {
+        "habito_id": str(habito.id),
+        "habito": habito.nombre,
+        "inicio_semana": inicio_semana,
+        "fin_semana": fin_semana,
+        "progreso_semanal": porcentaje(completados, total),
+        "completados": completados,
+        "total": total
+    }
+
+
+def _progreso_mensual(habito, hoy, inicio_mes, fin_mes, completados):
+    total = total_mensual(habito, hoy)
+    return {
+        "habito": habito.nombre,
+        "inicio_mes": inicio_mes,
+        "fin_mes": fin_mes,
+        "progreso_mensual": porcentaje(completados, total),
+        "registros_totales": total,
+        "completados": completados,
+        "total": total
+    }
+
+
+def _registros_cambiados(habito_ids, usuario_ids=None):
+    """
+    Tras escribir registros: incrementa la versión de datos de sus dueños,
+    que invalida su ETag y su progreso cacheado.
+    """
+    if usuario_ids is None:
+        incrementar_version_habitos(habito_ids)
+    else:
+        incrementar_version(usuario_ids)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def estadisticas_cache(request):
+    """Aciertos y fallos de los caches en memoria de este proceso"""
+    return Response({
+        "progreso": cache_progreso.estadisticas(),
+        "usuarios": cache_usuarios.estadisticas(),
+        "referencias": {
+            "categorias": categorias.estadisticas(),
+            "roles": roles.estadisticas(),
+            "tools": tools.estadisticas(),
+        },
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def exportar(request):
+    """
+    Descarga los hábitos y registros de un usuario sin cargarlos en memoria
+    (ver core/exportacion.py).
+
+    Query params:
+        usuario: ID del usuario (por defecto, el usuario autenticado)
+        formato: ndjson (por defecto) o csv
+        desde, hasta: rango de fechas de los registros YYYY-MM-DD (incluidos)
+    """
+    usuario_id = request.query_params.get('usuario') or str(request.user.id)
+    formato = request.query_params.get('formato', 'ndjson')
+
+    if not ObjectId.is_valid(usuario_id):
+        return Response(
+            {"error": "ID de usuario inválido"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if formato not in EXPORTADORES:
+        return Response(
+            {"error": f"Formato no soportado. Use: {', '.join(EXPORTADORES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    fechas = {}
+    for parametro in ('desde', 'hasta'):
+        valor = request.query_params.get(parametro)
+        try:
+            fechas[parametro] = datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+        except ValueError:
+            return Response(
+                {"error": "Formato de fecha inválido. Use YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+    if fechas['desde'] and fechas['hasta'] and fechas['desde'] > fechas['hasta']:
+        return Response(
+            {"error": "La fecha 'desde' no puede ser posterior a 'hasta'"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    contenido = EXPORTADORES[formato](ObjectId(usuario_id), fechas['desde'], fechas['hasta'])
+    if isinstance(request._request, ASGIRequest):
+        # Con ASGI un iterador síncrono se consumiría entero antes de enviarse
+        contenido = iterar_en_hilo(contenido)
+
+    respuesta = StreamingHttpResponse(contenido, content_type=FORMATOS[formato])
+    respuesta['Content-Disposition'] = (
+        f'attachment; filename="rutinia-{usuario_id}-{date.today()}.{formato}"'
+    )
+    respuesta['Cache-Control'] = 'no-store'
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def importar(request):
+    """
+    Importa hábitos y registros en NDJSON o CSV (los formatos de la
+    exportación) leyendo el cuerpo como stream (ver core/importacion.py).
+
+    Query params:
+        usuario: ID del usuario (por defecto, el usuario autenticado)
+        formato: ndjson o csv (por defecto según el Content-Type)
+
+    Responde NDJSON en streaming con líneas "error", "progreso" y "resumen".
+    """
+    usuario_id = request.query_params.get('usuario') or str(request.user.id)
+    formato = request.query_params.get('formato') or FORMATOS_IMPORTACION.get(request._request.content_type)
+
+    if not ObjectId.is_valid(usuario_id):
+        return Response(
+            {"error": "ID de usuario inválido"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if formato not in LECTORES:
+        return Response(
+            {"error": f"Formato no soportado. Use ?formato= o Content-Type: {', '.join(FORMATOS_IMPORTACION)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not Usuario.objects(id=ObjectId(usuario_id)).only('id').first():
+        return Response(
+            {"error": "Usuario no encontrado"},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    # Se lee el HttpRequest de Django línea a línea, sin pasar por los parsers de DRF
+    contenido = Importacion(ObjectId(usuario_id)).procesar(LECTORES[formato](request._request))
+    if isinstance(request._request, ASGIRequest):
+        contenido = iterar_en_hilo(contenido)
+
+    respuesta = StreamingHttpResponse(contenido, content_type='application/x-ndjson')
+    respuesta['Cache-Control'] = 'no-store'
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
+
+
+def _habito_de(registro):
+    """ID del hábito de un registro sin desreferenciarlo"""
+    valor = registro._data.get('habito')
+    return getattr(valor, 'id', valor)
+
 """
 class UsuarioViewSet(viewsets.ViewSet):
     
@@ -362,7 +1008,7 @@ class UsuarioViewSet(viewsets.ViewSet):
 
 """
 
-class ToolViewSet(viewsets.ModelViewSet):
+class ToolViewSet(ListadoReferenciasMixin, viewsets.ModelViewSet):
     '''
     Contains information about inputs/outputs of a single program
     that may be used in Universe workflows.
@@ -370,21 +1016,31 @@ class ToolViewSet(viewsets.ModelViewSet):
     lookup_field = 'id'
     serializer_class = ToolSerializer
     permission_classes = [IsAuthenticated]
+    cache_referencias = tools
 
     def get_queryset(self):
         return Tool.objects.all()
 
 
-class HistorialNotificacionViewSet(viewsets.ModelViewSet):
+class HistorialNotificacionViewSet(SerializacionRapidaMixin, PrefetchReferenciasMixin, viewsets.ModelViewSet):
     '''
     ViewSet para gestionar el historial de notificaciones de los usuarios.
     '''
     lookup_field = 'id'
     serializer_class = HistorialNotificacionSerializer
     permission_classes = [IsAuthenticated]
+    prefetch_referencias = {'usuario': ('id',), 'habito': ('nombre', 'icono', 'color')}
+    modelo_rapido = HistorialNotificacion
+    # El listado sin ?usuario= se limita al usuario autenticado (ver get_queryset)
+    listado_del_usuario = True
+    # Paginación por cursor sobre (fecha_hora, _id), más recientes primero
+    orden_paginacion = [('fecha_hora', -1), ('id', -1)]
 
     def get_queryset(self):
-        """Filtrar notificaciones por usuario si se proporciona el parámetro"""
+        """
+        Notificaciones del usuario del parámetro o, si no se indica, del
+        usuario autenticado; nunca el historial de todos los usuarios.
+        """
         queryset = HistorialNotificacion.objects.all()
         usuario_id = self.request.query_params.get('usuario', None)
         
@@ -393,11 +1049,23 @@ class HistorialNotificacionViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(usuario=ObjectId(usuario_id))
             except:
                 pass
+        elif self.action == 'list':
+            queryset = queryset.filter(usuario=self.request.user.id)
         
         # Ordenar por fecha_hora descendente (más recientes primero)
         return queryset.order_by('-fecha_hora')
+
+    @con_etag
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        usuario = instance._data.get('usuario')
+        instance.delete()
+        incrementar_version([usuario])
     
     @action(detail=False, methods=['get'])
+    @con_etag
     def no_leidas(self, request):
         """Obtener notificaciones no leídas del usuario"""
         usuario_id = request.query_params.get('usuario', None)
@@ -414,6 +1082,10 @@ class HistorialNotificacionViewSet(viewsets.ModelViewSet):
                 leida=False
             ).order_by('-fecha_hora')
             
+            page = self.paginate_queryset(notificaciones)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+            
             serializer = self.get_serializer(notificaciones, many=True)
             return Response(serializer.data)
         except Exception as e:
@@ -422,6 +1094,24 @@ class HistorialNotificacionViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['get'])
+    @con_etag
+    def contador(self, request):
+        """
+        Número de notificaciones no leídas del usuario (por defecto, el
+        autenticado). Se cuenta sobre el índice (usuario, leida, -fecha_hora)
+        sin leer documentos.
+        """
+        usuario_id = request.query_params.get('usuario') or str(request.user.id)
+        
+        if not ObjectId.is_valid(usuario_id):
+            return Response(
+                {"error": "El parámetro 'usuario' no es un id válido"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response({"no_leidas": contar_no_leidas(usuario_id)})
+    
     @action(detail=True, methods=['post'])
     def marcar_leida(self, request, id=None):
         """Marcar una notificación como leída"""
@@ -430,14 +1120,19 @@ class HistorialNotificacionViewSet(viewsets.ModelViewSet):
             notificacion.leida = True
             notificacion.fecha_lectura = datetime.now()
             notificacion.save()
-            
             serializer = self.get_serializer(notificacion)
-            return Response(serializer.data)
+            datos = serializer.data
         except Exception as e:
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+        # Fuera del try: la escritura ya se hizo y no debe responder 500
+        usuario = notificacion._data.get('usuario')
+        if usuario is not None:
+            canal().contador_cambiado(getattr(usuario, 'id', usuario))
+        return Response(datos)
     
     @action(detail=False, methods=['post'])
     def marcar_todas_leidas(self, request):
@@ -451,17 +1146,14 @@ class HistorialNotificacionViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            notificaciones = HistorialNotificacion.objects(
+            # Un solo update_many con la misma fecha de lectura para todas
+            count = HistorialNotificacion.objects(
                 usuario=ObjectId(usuario_id),
                 leida=False
-            )
-            
-            count = 0
-            for notif in notificaciones:
-                notif.leida = True
-                notif.fecha_lectura = datetime.now()
-                notif.save()
-                count += 1
+            ).update(set__leida=True, set__fecha_lectura=datetime.now())
+            if count:
+                incrementar_version([usuario_id])
+                canal().contador_cambiado(usuario_id)
             
             return Response({
                 "mensaje": f"{count} notificaciones marcadas como leídas",
@@ -497,6 +1189,7 @@ class HistorialNotificacionViewSet(viewsets.ModelViewSet):
                 leida=False
             )
             notificacion.save()
+            canal().notificaciones_creadas([notificacion])
             
             serializer = self.get_serializer(notificacion)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -504,4 +1197,92 @@ class HistorialNotificacionViewSet(viewsets.ModelViewSet):
             return Response(
                 {"error": str(e)},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
\ No newline at end of file
+            )
+
+
+def _mensaje_sse(evento, datos):
+    return b'event: ' + evento.encode() + b'\ndata: ' + datos + b'\n\n'
+
+
+async def _stream_notificaciones(suscripcion, no_leidas):
+    latido = getattr(settings, 'EVENTOS_HEARTBEAT', 20)
+    try:
+        # El cliente reintenta a los 5 s si se corta la conexión
+        yield b'retry: 5000\n\n' + _mensaje_sse('contador', b'{"no_leidas":%d}' % no_leidas)
+        while True:
+            try:
+                evento, datos = await asyncio.wait_for(suscripcion.cola.get(), timeout=latido)
+            except asyncio.TimeoutError:
+                # Comentario SSE para que proxies y balanceadores no cierren la conexión
+                yield b': ping\n\n'
+                continue
+            yield _mensaje_sse(evento, datos)
+    finally:
+        canal().desuscribir(suscripcion)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def ticket_eventos(request):
+    """
+    Ticket para abrir el stream de /notificaciones/eventos/?ticket=. Caduca a
+    los EVENTOS_TICKET_TTL segundos; si la conexión se corta después, el
+    cliente pide otro.
+    """
+    return Response({
+        "ticket": emitir_ticket(request.user.id),
+        "expira_en": getattr(settings, 'EVENTOS_TICKET_TTL', 60),
+    })
+
+
+async def eventos_notificaciones(request):
+    """
+    Stream SSE (text/event-stream) con las notificaciones del usuario.
+
+    Eventos:
+        notificacion: una notificación nueva (mismo formato que el listado)
+        contador: {"no_leidas": n} al conectar y cada vez que cambia
+
+    EventSource no permite cabeceras, así que se autentica con `?ticket=`
+    (POST /notificaciones/eventos/ticket/) en lugar del token de acceso, que
+    quedaría en los logs de acceso y en el historial del navegador. También
+    se acepta la cabecera Authorization. Requiere servir la app por ASGI
+    (ver Procfile): cada conexión abierta es una corrutina, no un hilo. Por
+    WSGI Django consume el generador entero antes de enviar nada y este no
+    termina, así que se responde 503 y el cliente pasa a consultar
+    periódicamente.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "El stream de eventos requiere servir la app por ASGI (uvicorn)"},
+            status=503
+        )
+
+    ticket = request.GET.get('ticket')
+    cabecera = request.headers.get('Authorization', '')
+    if ticket:
+        try:
+            usuario_id = usuario_de_ticket(ticket)
+        except signing.BadSignature:
+            return JsonResponse({"error": "Ticket inválido o expirado"}, status=401)
+    elif cabecera.startswith('Bearer '):
+        autenticacion = MongoJWTAuthentication()
+        autenticacion.metodo = request.method
+        try:
+            token = autenticacion.get_validated_token(cabecera[len('Bearer '):])
+            usuario_id = (await sync_to_async(autenticacion.get_user)(token)).id
+        except (InvalidToken, TokenError) as e:
+            return JsonResponse({"error": str(e)}, status=401)
+    else:
+        return JsonResponse({"error": "Se requiere un ticket o el token de acceso"}, status=401)
+
+    suscripcion = canal().suscribir(usuario_id)
+    no_leidas = await sync_to_async(contar_no_leidas)(usuario_id)
+
+    respuesta = StreamingHttpResponse(
+        _stream_notificaciones(suscripcion, no_leidas), content_type='text/event-stream'
+    )
+    respuesta['Cache-Control'] = 'no-cache'
+    # Desactiva el buffer de nginx para que los eventos salgan al momento
+    respuesta['X-Accel-Buffering'] = 'no'
+    return respuesta
@@ -3,6 +3,10 @@ ASGI config for rutinia project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Es el punto de entrada en producción (ver Procfile): el stream SSE de
+notificaciones (/api/notificaciones/eventos/) mantiene conexiones abiertas
+que bajo WSGI ocuparían un hilo cada una.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -192,8 +192,85 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',
     ),
+    # Paginación por cursor en todos los listados (ver core/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.CursorPaginacion',
+    # Mismo JSON que JSONRenderer, generado con orjson
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# Listados de hábitos, registros y notificaciones con extractores precompilados
+# en lugar de DocumentSerializer (mismo JSON de salida)
+SERIALIZACION_RAPIDA = config('SERIALIZACION_RAPIDA', default=True, cast=bool)
+
+# Paginación por cursor: tamaño por defecto y máximo de página (?page_size=)
+PAGINACION_TAMANO = config('PAGINACION_TAMANO', default=50, cast=int)
+PAGINACION_TAMANO_MAXIMO = config('PAGINACION_TAMANO_MAXIMO', default=200, cast=int)
+# Compatibilidad: sin ?cursor= ni ?page_size= los listados se devuelven completos
+PAGINACION_COMPATIBLE = config('PAGINACION_COMPATIBLE', default=True, cast=bool)
+
+# Cache por proceso de usuarios autenticados (segundos de vida y cantidad máxima)
+JWT_CACHE_USUARIOS_TTL = config('JWT_CACHE_USUARIOS_TTL', default=60, cast=int)
+JWT_CACHE_USUARIOS_MAXIMO = config('JWT_CACHE_USUARIOS_MAXIMO', default=10000, cast=int)
+# Si es True, en GET/HEAD/OPTIONS el usuario se arma con los claims del token sin consultar MongoDB
+JWT_CONFIAR_EN_TOKEN_LECTURA = config('JWT_CONFIAR_EN_TOKEN_LECTURA', default=False, cast=bool)
+
+# Zona horaria en la que se interpretan las horas de los recordatorios (manage.py recordatorios).
+# Los usuarios las eligen en su hora local (antes se disparaban en el navegador),
+# así que el valor por defecto es la zona de la app y no TIME_ZONE (UTC)
+RECORDATORIOS_ZONA_HORARIA = config('RECORDATORIOS_ZONA_HORARIA', default='America/Bogota')
+
+# Stream SSE de notificaciones (core/eventos.py). PubSubMongo también entrega lo
+# que generan otros procesos (recordatorios, otros workers) consultando MongoDB
+# cada EVENTOS_INTERVALO segundos mientras haya conexiones abiertas.
+EVENTOS_BACKEND = config('EVENTOS_BACKEND', default='core.eventos.PubSubMongo')
+EVENTOS_INTERVALO = config('EVENTOS_INTERVALO', default=2, cast=float)
+# Segundos entre comentarios de keep-alive en conexiones sin eventos
+EVENTOS_HEARTBEAT = config('EVENTOS_HEARTBEAT', default=20, cast=int)
+# Validez en segundos del ticket con el que se abre el stream (va en la URL y
+# queda en los logs de acceso, por eso no se usa el token de acceso)
+EVENTOS_TICKET_TTL = config('EVENTOS_TICKET_TTL', default=60, cast=int)
+
+# Cache de Django. Por defecto en memoria de cada proceso; con varios workers
+# conviene un backend compartido, p. ej.
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://host:6379/0
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='rutinia'),
+    }
 }
 
+# Categoria, Rol y Tool se cachean completas en cada proceso (core/referencias.py);
+# cada cuántos segundos, como máximo, se comprueba si otro proceso las modificó
+REFERENCIAS_CACHE_VERIFICACION = config('REFERENCIAS_CACHE_VERIFICACION', default=2, cast=float)
+
+# Filas por lote (batch_size del cursor y bloque enviado) en GET /api/export/
+EXPORTACION_LOTE = config('EXPORTACION_LOTE', default=2000, cast=int)
+
+# POST /api/import/: registros por bulk_write y máximo de errores detallados en la respuesta
+IMPORTACION_LOTE = config('IMPORTACION_LOTE', default=5000, cast=int)
+IMPORTACION_MAX_ERRORES = config('IMPORTACION_MAX_ERRORES', default=1000, cast=int)
+
+# Respuestas de progreso cacheadas por (hábito, periodo, fecha ancla), ver core/cache_progreso.py.
+# Las claves incluyen la versión de datos del usuario guardada en MongoDB, así una
+# escritura las invalida en todos los workers aun con LocMemCache; el TTL solo
+# acota la memoria que ocupan las entradas viejas (0 = sin cache)
+PROGRESO_CACHE_ALIAS = config('PROGRESO_CACHE_ALIAS', default='default')
+PROGRESO_CACHE_TTL = config('PROGRESO_CACHE_TTL', default=300, cast=int)
+
+# Retención de HistorialNotificacion: las leídas se conservan N días desde su
+# lectura y las no leídas N días desde su creación (0 = sin límite).
+#   'archivo': `manage.py archivar_notificaciones` (p. ej. diario por cron) las
+#              mueve por lotes a la colección historial_notificacion_archivada
+#   'ttl':     MongoDB las borra con índices TTL (creados por ensure_indexes)
+#   '':        sin retención
+NOTIFICACIONES_RETENCION_MODO = config('NOTIFICACIONES_RETENCION_MODO', default='archivo')
+NOTIFICACIONES_RETENCION_LEIDAS_DIAS = config('NOTIFICACIONES_RETENCION_LEIDAS_DIAS', default=90, cast=int)
+NOTIFICACIONES_RETENCION_NO_LEIDAS_DIAS = config('NOTIFICACIONES_RETENCION_NO_LEIDAS_DIAS', default=365, cast=int)
+
 # JWT Configuration
 from datetime import timedelta
 
@@ -1,5 +1,8 @@
 """
 WSGI config for Vercel deployment.
+
+Por WSGI el stream SSE de notificaciones responde 503 (ver
+core.views.eventos_notificaciones) y el frontend consulta periódicamente.
 """
 import os
 from django.core.wsgi import get_wsgi_application
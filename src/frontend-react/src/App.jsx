@@ -22,8 +22,7 @@ import * as localStorageService from './services/localStorage';
 import {
   verificarNotificacionesHabitos,
   mostrarNotificacion,
-  solicitarPermisoNotificaciones,
-  crearNotificacion
+  solicitarPermisoNotificaciones
 } from './services/notificationService';
 
 // 🔧 Función helper para normalizar nombres de días
@@ -321,28 +320,10 @@ function App() {
     try {
       console.log('🔍 Cargando registros de hábitos desde el backend...');
       
-      // Obtener todos los registros de todos los hábitos
-      const allRegistros = await api.getRegistros();
-      
-      console.log(`✅ Se encontraron ${allRegistros.length} registros`);
-      
-      // Convertir registros a formato { 'YYYY-MM-DD': [habitId1, habitId2, ...] }
-      const completedByDate = {};
-      
-      allRegistros.forEach(registro => {
-        if (registro.estado === true) {
-          const fecha = registro.fecha; // Ya viene en formato YYYY-MM-DD
-          const habitoId = typeof registro.habito === 'object' ? registro.habito.id : registro.habito;
-          
-          if (!completedByDate[fecha]) {
-            completedByDate[fecha] = [];
-          }
-          
-          if (!completedByDate[fecha].includes(habitoId)) {
-            completedByDate[fecha].push(habitoId);
-          }
-        }
-      });
+      // Obtener los registros completados del usuario ya organizados como
+      // { 'YYYY-MM-DD': [habitId1, habitId2, ...] }
+      const userId = usuario?.id || usuario?._id;
+      const completedByDate = await api.getRegistrosMapa({ usuarioId: userId });
       
       console.log('✅ Registros organizados por fecha:', completedByDate);
       
@@ -416,18 +397,8 @@ function App() {
         // Mostrar toast en la UI
         setNotificationToasts(prev => [...prev, notificationData]);
 
-        // Guardar en el historial del backend
-        try {
-          const userId = usuario.id || usuario._id;
-          await crearNotificacion({
-            usuario: userId,
-            habito: habito.id,
-            titulo: notificationData.titulo,
-            mensaje: notificationData.mensaje
-          });
-        } catch (error) {
-          console.error('Error al guardar notificación en historial:', error);
-        }
+        // El historial lo genera el servidor (manage.py recordatorios),
+        // aquí solo se avisa en la pestaña abierta
 
         // Mostrar notificación del navegador y reproducir sonido
         mostrarNotificacion(habito);
@@ -460,62 +431,29 @@ function App() {
       if (habitsData.length === 0) return; // Esperar a que carguen los hábitos
       
       const today = getCurrentDateString();
-      const currentDay = getDayOfWeek(new Date());
-      
-      // Obtener hábitos que aplican para hoy (misma lógica que habitAppliesToToday)
-      const todayHabitsToInit = habitsData.filter(habit => {
-        const frequency = (habit.frequency || '').toLowerCase();
-        
-        if (frequency === 'diario' || frequency === 'diaria') {
-          return true;
-        } else if (frequency === 'semanal') {
-          // Verificar que el hábito tenga días configurados y que hoy esté incluido
-          if (!habit.days || habit.days.length === 0) {
-            return false;
-          }
-          // 🔧 NORMALIZAR LOS DÍAS: Convertir 'lun' -> 'Lunes', etc.
-          const normalizedHabitDays = habit.days.map(day => normalizeDayName(day));
-          return normalizedHabitDays.includes(currentDay);
-        } else if (frequency === 'mensual') {
-          // Los hábitos mensuales aplican solo en los días del mes configurados
-          if (!habit.days || habit.days.length === 0) {
-            return false;
-          }
-          const today = new Date();
-          const dayOfMonth = today.getDate(); // Día del mes (1-31)
-          return habit.days.includes(dayOfMonth);
-        }
-        return false;
-      });
+      const userId = usuario?.id || usuario?._id;
+      if (!userId) return;
       
       console.log(`📅 Inicializando registros para ${today}...`);
-      console.log(`📋 Hábitos del día: ${todayHabitsToInit.length}`);
       
-      // Para cada hábito del día, verificar si ya tiene registro
-      for (const habit of todayHabitsToInit) {
-        const alreadyCompleted = completedHabits[today]?.includes(habit.id) || false;
+      // El backend determina los hábitos del día y crea los registros faltantes en false
+      try {
+        const { habitos, estados } = await api.inicializarDia(userId, today);
+        console.log(`📋 Hábitos del día: ${habitos}`);
         
-        // Verificar si el hábito ya tiene registro en el backend
-        try {
-          const registros = await api.getRegistros(habit.id);
-          const registroHoy = registros.find(r => r.fecha === today);
-          
-          if (!registroHoy) {
-            // No existe registro, crear uno en false
-            console.log(`➕ Creando registro en false para: ${habit.name}`);
-            await api.toggleHabitoCompletado(habit.id, today, false);
-          } else {
-            console.log(`✓ Registro ya existe para: ${habit.name} (estado: ${registroHoy.estado})`);
-            
-            // Sincronizar con localStorage si el backend tiene el registro en true
-            if (registroHoy.estado && !alreadyCompleted) {
-              const newCompletedHabits = localStorageService.toggleHabitCompletion(habit.id, today, true);
-              setCompletedHabits(newCompletedHabits);
-            }
+        // Sincronizar con localStorage los hábitos que el backend tiene en true
+        let newCompletedHabits = null;
+        Object.entries(estados).forEach(([habitId, estado]) => {
+          const alreadyCompleted = completedHabits[today]?.includes(habitId) || false;
+          if (estado && !alreadyCompleted) {
+            newCompletedHabits = localStorageService.toggleHabitCompletion(habitId, today, true);
           }
-        } catch (error) {
-          console.error(`Error al verificar registro de ${habit.name}:`, error);
+        });
+        if (newCompletedHabits) {
+          setCompletedHabits(newCompletedHabits);
         }
+      } catch (error) {
+        console.error('Error al inicializar registros del día:', error);
       }
     };
     
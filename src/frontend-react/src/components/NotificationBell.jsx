@@ -1,26 +1,59 @@
 import { useState, useEffect, useRef } from 'react';
 import {
   getNotificacionesNoLeidas,
+  getContadorNoLeidas,
   marcarNotificacionLeida,
+  suscribirEventosNotificaciones,
   formatearFechaNotificacion
 } from '../services/notificationService';
 
 const NotificationBell = ({ usuario }) => {
   const [notificacionesNoLeidas, setNotificacionesNoLeidas] = useState([]);
+  const [noLeidas, setNoLeidas] = useState(0);
   const [showDropdown, setShowDropdown] = useState(false);
   const [loading, setLoading] = useState(false);
   const dropdownRef = useRef(null);
+  const abiertoRef = useRef(false);
+  abiertoRef.current = showDropdown;
 
   useEffect(() => {
     if (usuario?.id || usuario?._id) {
-      cargarNotificacionesNoLeidas();
-      
-      // Actualizar cada minuto
-      const interval = setInterval(cargarNotificacionesNoLeidas, 60000);
-      return () => clearInterval(interval);
+      cargarContador();
+
+      // Sin EventSource, o si el stream se cierra: actualizar el contador cada minuto
+      let interval = null;
+      const consultarPeriodicamente = () => {
+        cargarContador();
+        interval = setInterval(cargarContador, 60000);
+      };
+
+      // El servidor empuja las notificaciones nuevas y el contador; la lista
+      // solo se descarga al abrir el menú
+      const cerrar = suscribirEventosNotificaciones({
+        onNotificacion: (notificacion) => {
+          setNotificacionesNoLeidas(prev =>
+            prev.some(n => n.id === notificacion.id) ? prev : [notificacion, ...prev]
+          );
+        },
+        onContador: (total) => {
+          setNoLeidas(total);
+          if (abiertoRef.current) cargarNotificacionesNoLeidas();
+        },
+        onCerrado: consultarPeriodicamente
+      });
+      if (!cerrar) interval = setInterval(cargarContador, 60000);
+
+      return () => {
+        cerrar?.();
+        clearInterval(interval);
+      };
     }
   }, [usuario]);
 
+  useEffect(() => {
+    if (showDropdown) cargarNotificacionesNoLeidas();
+  }, [showDropdown]);
+
   useEffect(() => {
     // Cerrar dropdown al hacer click fuera
     const handleClickOutside = (event) => {
@@ -33,6 +66,17 @@ const NotificationBell = ({ usuario }) => {
     return () => document.removeEventListener('mousedown', handleClickOutside);
   }, []);
 
+  const cargarContador = async () => {
+    if (!usuario?.id && !usuario?._id) return;
+
+    try {
+      const userId = usuario.id || usuario._id;
+      setNoLeidas(await getContadorNoLeidas(userId));
+    } catch (error) {
+      console.error('Error al cargar el contador de notificaciones:', error);
+    }
+  };
+
   const cargarNotificacionesNoLeidas = async () => {
     if (!usuario?.id && !usuario?._id) return;
 
@@ -51,6 +95,7 @@ const NotificationBell = ({ usuario }) => {
     try {
       await marcarNotificacionLeida(notifId);
       setNotificacionesNoLeidas(prev => prev.filter(n => n.id !== notifId));
+      setNoLeidas(prev => Math.max(0, prev - 1));
     } catch (error) {
       console.error('Error al marcar notificación:', error);
     }
@@ -76,7 +121,7 @@ const NotificationBell = ({ usuario }) => {
     return colorMap[color] || 'bg-blue-500';
   };
 
-  const count = notificacionesNoLeidas.length;
+  const count = noLeidas;
   const recentNotifications = notificacionesNoLeidas.slice(0, 5);
 
   return (
@@ -71,13 +71,15 @@ export const updateUsuario = async (id, userData) => {
  * @param {number} options.page - Número de página
  * @param {number} options.pageSize - Hábitos por página
  * @param {string} options.ordering - Campo para ordenar (ej: '-fecha_inicio')
+ * @param {string} options.busqueda - Palabras a buscar en nombre y descripción (ordena por relevancia)
  * @returns {Promise<Array|Object>} Lista de hábitos o objeto con paginación
  */
 export const getHabitos = async (options = {}) => {
-  const { usuarioId, page, pageSize, ordering } = options;
+  const { usuarioId, page, pageSize, ordering, busqueda } = options;
   
   const params = {};
   if (usuarioId) params.usuario = usuarioId;
+  if (busqueda) params.q = busqueda;
   if (page) params.page = page;
   if (pageSize) params.page_size = pageSize;
   if (ordering) params.ordering = ordering;
@@ -96,6 +98,21 @@ export const getHabito = async (id) => {
   return response.data;
 };
 
+/**
+ * Obtener los hábitos activos que aplican en una fecha (resuelto en el servidor)
+ * @param {string} usuarioId - ID del usuario
+ * @param {string} fecha - Fecha en formato 'YYYY-MM-DD' (por defecto hoy)
+ * @returns {Promise<Array>} Hábitos del día
+ */
+export const getHabitosHoy = async (usuarioId, fecha) => {
+  const params = {};
+  if (usuarioId) params.usuario = usuarioId;
+  if (fecha) params.fecha = fecha;
+
+  const response = await apiClient.get('/habitos/hoy/', { params });
+  return response.data;
+};
+
 /**
  * Crear un nuevo hábito
  * @param {Object} habitoData - Datos del hábito
@@ -164,26 +181,25 @@ export const getProgresoMensual = async (habitoId) => {
 
 /**
  * Obtener progreso de múltiples hábitos
+ * Usa el endpoint por lotes /habitos/progreso/ (una sola petición para todos
+ * los hábitos del usuario autenticado)
  * @param {Array<string>} habitoIds - Array de IDs de hábitos
  * @returns {Promise<Array>} Array de progresos semanales y mensuales
  */
 export const getProgresosMultiples = async (habitoIds) => {
   try {
-    const progresos = await Promise.all(
-      habitoIds.map(async (id) => {
-        try {
-          const [semanal, mensual] = await Promise.all([
-            getProgresoSemanal(id),
-            getProgresoMensual(id)
-          ]);
-          return { id, semanal, mensual };
-        } catch (error) {
-          console.error(`Error obteniendo progreso para hábito ${id}:`, error);
-          return { id, semanal: null, mensual: null, error: error.message };
-        }
-      })
-    );
-    return progresos;
+    const response = await apiClient.get('/habitos/progreso/', {
+      params: { periodo: 'semana,mes' }
+    });
+    const porHabito = new Map(response.data.map(p => [p.habito_id, p]));
+
+    return habitoIds.map((id) => {
+      const progreso = porHabito.get(id);
+      if (!progreso) {
+        return { id, semanal: null, mensual: null, error: 'Sin progreso para el hábito' };
+      }
+      return { id, semanal: progreso.semanal, mensual: progreso.mensual };
+    });
   } catch (error) {
     console.error('Error obteniendo progresos múltiples:', error);
     throw error;
@@ -203,6 +219,71 @@ export const getRegistros = async (habitoId = null) => {
   return response.data;
 };
 
+/**
+ * Obtener los registros completados como mapa { 'YYYY-MM-DD': [habitoId, ...] }
+ * @param {Object} options - Opciones de consulta
+ * @param {string} options.usuarioId - ID del usuario
+ * @param {string} options.desde - Fecha inicial 'YYYY-MM-DD' (opcional)
+ * @param {string} options.hasta - Fecha final 'YYYY-MM-DD' (opcional)
+ * @returns {Promise<Object>} Mapa de fechas a IDs de hábitos completados
+ */
+export const getRegistrosMapa = async (options = {}) => {
+  const { usuarioId, desde, hasta } = options;
+
+  const params = { formato: 'mapa' };
+  if (usuarioId) params.usuario = usuarioId;
+  if (desde) params.desde = desde;
+  if (hasta) params.hasta = hasta;
+
+  const response = await apiClient.get('/registros/', { params });
+  return response.data;
+};
+
+/**
+ * Obtener el calendario compacto de los hábitos de un usuario: por hábito,
+ * mapas de bits en base64 de los días completados y de los días programados
+ * @param {Object} options - Opciones de consulta
+ * @param {string} options.usuarioId - ID del usuario
+ * @param {string} options.desde - Fecha inicial 'YYYY-MM-DD' (por defecto, inicio del mes)
+ * @param {string} options.hasta - Fecha final 'YYYY-MM-DD' (por defecto, fin del mes)
+ * @returns {Promise<Object>} { desde, hasta, dias, habitos: [{ habito_id, completados, programados }] }
+ */
+export const getCalendario = async (options = {}) => {
+  const { usuarioId, desde, hasta } = options;
+
+  const params = {};
+  if (usuarioId) params.usuario = usuarioId;
+  if (desde) params.desde = desde;
+  if (hasta) params.hasta = hasta;
+
+  const response = await apiClient.get('/habitos/calendario/', { params });
+  return response.data;
+};
+
+/**
+ * Convertir la respuesta de getCalendario al mapa { 'YYYY-MM-DD': [habitoId, ...] }
+ * de días completados (el mismo formato que getRegistrosMapa)
+ * @param {Object} calendario - Respuesta de getCalendario
+ * @returns {Object} Mapa de fechas a IDs de hábitos completados
+ */
+export const calendarioAMapa = (calendario) => {
+  const [anio, mes, dia] = calendario.desde.split('-').map(Number);
+  const mapa = {};
+
+  calendario.habitos.forEach(({ habito_id, completados }) => {
+    const bytes = atob(completados);
+    for (let i = 0; i < calendario.dias; i++) {
+      if (bytes.charCodeAt(i >> 3) & (1 << (i & 7))) {
+        const fecha = new Date(anio, mes - 1, dia + i);
+        const clave = `${fecha.getFullYear()}-${String(fecha.getMonth() + 1).padStart(2, '0')}-${String(fecha.getDate()).padStart(2, '0')}`;
+        (mapa[clave] = mapa[clave] || []).push(habito_id);
+      }
+    }
+  });
+
+  return mapa;
+};
+
 /**
  * Marcar o desmarcar un hábito como completado (toggle)
  * Previene duplicados y actualiza si ya existe
@@ -220,6 +301,31 @@ export const toggleHabitoCompletado = async (habitoId, fecha, completado = true)
   return response.data;
 };
 
+/**
+ * Marcar o desmarcar varios hábitos/fechas en una sola petición
+ * (marcar una semana en el calendario, reenviar cambios sin conexión)
+ * @param {Array<Object>} cambios - [{ habito_id, fecha: 'YYYY-MM-DD', completado }]
+ * @returns {Promise<Object>} { aplicados, errores, resultados: [...] }
+ */
+export const bulkToggleRegistros = async (cambios) => {
+  const response = await apiClient.post('/registros/bulk_toggle/', cambios);
+  return response.data;
+};
+
+/**
+ * Crear (en false) los registros del día que falten para los hábitos que
+ * aplican en la fecha y obtener su estado
+ * @param {string} usuarioId - ID del usuario
+ * @param {string} fecha - Fecha en formato 'YYYY-MM-DD'
+ * @returns {Promise<Object>} { fecha, habitos, estados: { habitoId: boolean } }
+ */
+export const inicializarDia = async (usuarioId, fecha) => {
+  const response = await apiClient.post('/registros/inicializar_dia/', null, {
+    params: { usuario: usuarioId, fecha }
+  });
+  return response.data;
+};
+
 /**
  * Crear un registro de hábito (marcar como completado)
  * @param {Object} registroData - { habito: id, fecha: 'YYYY-MM-DD', estado: true }
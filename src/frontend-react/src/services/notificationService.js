@@ -57,6 +57,97 @@ export const getNotificacionesNoLeidas = async (usuarioId) => {
   }
 };
 
+/**
+ * Obtener solo el número de notificaciones no leídas
+ */
+export const getContadorNoLeidas = async (usuarioId) => {
+  try {
+    const response = await apiClient.get(`/notificaciones/contador/?usuario=${usuarioId}`);
+    return response.data.no_leidas;
+  } catch (error) {
+    console.error('Error al obtener el contador de notificaciones:', error);
+    throw error;
+  }
+};
+
+// Reconexiones seguidas (con un ticket nuevo) antes de pasar a consultar periódicamente
+const MAXIMO_RECONEXIONES = 3;
+
+/**
+ * Suscribirse al stream SSE de notificaciones del usuario autenticado.
+ * Llama a onNotificacion con cada notificación nueva y a onContador con el
+ * número de no leídas (al conectar y cada vez que cambia).
+ * EventSource no permite cabeceras, así que la URL lleva un ticket de corta
+ * duración (POST /notificaciones/eventos/ticket/) y no el token de acceso,
+ * que quedaría en los logs del servidor y en el historial. EventSource se
+ * reconecta solo si se corta la conexión; si el servidor la rechaza (por
+ * ejemplo, porque el ticket expiró) se pide otro ticket y se vuelve a
+ * suscribir. Si tampoco así se conecta, llama a onCerrado para que el
+ * componente pase a consultar periódicamente.
+ * Devuelve una función para cerrar la suscripción, o null si el navegador
+ * no soporta EventSource (en ese caso conviene consultar periódicamente).
+ */
+export const suscribirEventosNotificaciones = ({ onNotificacion, onContador, onCerrado } = {}) => {
+  if (!window.EventSource || !localStorage.getItem('access_token')) return null;
+
+  let fuente = null;
+  let cerrada = false;
+  let intentos = 0;
+  let reintento = null;
+
+  const reintentar = () => {
+    if (cerrada) return;
+    if (intentos >= MAXIMO_RECONEXIONES) {
+      cerrada = true;
+      onCerrado?.();
+      return;
+    }
+    intentos += 1;
+    reintento = setTimeout(conectar, 1000 * 2 ** intentos);
+  };
+
+  const conectar = async () => {
+    let ticket;
+    try {
+      // apiClient refresca el token de acceso si expiró
+      const response = await apiClient.post('/notificaciones/eventos/ticket/');
+      ticket = response.data.ticket;
+    } catch (error) {
+      console.error('No se pudo obtener el ticket de las notificaciones:', error);
+      reintentar();
+      return;
+    }
+    if (cerrada) return;
+
+    const url = `${apiClient.defaults.baseURL}/notificaciones/eventos/?ticket=${encodeURIComponent(ticket)}`;
+    fuente = new EventSource(url);
+
+    fuente.addEventListener('open', () => {
+      intentos = 0;
+    });
+    fuente.addEventListener('notificacion', (evento) => {
+      onNotificacion?.(JSON.parse(evento.data));
+    });
+    fuente.addEventListener('contador', (evento) => {
+      onContador?.(JSON.parse(evento.data).no_leidas);
+    });
+    fuente.onerror = () => {
+      // CONNECTING: EventSource reintenta solo. CLOSED: no lo hará nunca
+      if (cerrada || fuente.readyState !== EventSource.CLOSED) return;
+      fuente.close();
+      reintentar();
+    };
+  };
+
+  conectar();
+
+  return () => {
+    cerrada = true;
+    clearTimeout(reintento);
+    fuente?.close();
+  };
+};
+
 /**
  * Marcar una notificación como leída
  */
@@ -252,8 +343,10 @@ export const formatearFechaNotificacion = (fechaStr) => {
 export default {
   getNotificaciones,
   getNotificacionesNoLeidas,
+  getContadorNoLeidas,
   marcarNotificacionLeida,
   marcarTodasLeidas,
+  suscribirEventosNotificaciones,
   crearNotificacion,
   verificarNotificacionesHabitos,
   mostrarNotificacion,